@@ -0,0 +1,85 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from activitylogs.models import ActivityLog, ActivityFeedEntry
+from organizations.models import OrganizationMember
+from projects.models import ProjectMember
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the personal activity feeds from the activity log'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=30,
+            help='Only replay activity from the last N days (default: 30).',
+        )
+        parser.add_argument(
+            '--keep',
+            type=int,
+            default=200,
+            help='Maximum number of entries kept per user (default: 200).',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of feed rows inserted per query (default: 1000).',
+        )
+
+    def handle(self, *args, **options):
+        since = timezone.now() - timedelta(days=options['days'])
+        keep = options['keep']
+
+        # Resolve membership once up front instead of once per activity
+        project_members = defaultdict(set)
+        for project_id, user_id in ProjectMember.objects.values_list('project_id', 'user_id'):
+            project_members[project_id].add(user_id)
+
+        org_members = defaultdict(set)
+        for org_id, user_id in OrganizationMember.objects.values_list('organization_id', 'user_id'):
+            org_members[org_id].add(user_id)
+
+        # Walk newest first so each user's cap keeps their most recent entries
+        feeds = defaultdict(list)
+        activities = ActivityLog.objects.filter(timestamp__gte=since).select_related(
+            'content_type'
+        ).order_by('-timestamp', '-id')
+        replayed = 0
+        for activity in activities.iterator(chunk_size=2000):
+            recipients = set()
+            if activity.user_id:
+                recipients.add(activity.user_id)
+            if activity.project_id:
+                recipients |= project_members.get(activity.project_id, set())
+            elif (activity.content_type.app_label, activity.content_type.model) == ('organizations', 'organization'):
+                recipients |= org_members.get(activity.object_id, set())
+
+            for user_id in recipients:
+                if len(feeds[user_id]) < keep:
+                    feeds[user_id].append((activity.timestamp, activity.pk))
+            replayed += 1
+
+        # Insert oldest first so primary key order matches activity order
+        rows = sorted(
+            (timestamp, str(activity_id), user_id, activity_id)
+            for user_id, entries in feeds.items()
+            for timestamp, activity_id in entries
+        )
+
+        with transaction.atomic():
+            ActivityFeedEntry.objects.all().delete()
+            ActivityFeedEntry.objects.bulk_create(
+                [ActivityFeedEntry(user_id=user_id, activity_id=activity_id) for _, _, user_id, activity_id in rows],
+                batch_size=options['batch_size'],
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Replayed {replayed} activities into {len(rows)} feed entries for {len(feeds)} users"
+        ))
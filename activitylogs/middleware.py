@@ -1,13 +1,24 @@
-class ActivityLogMiddleware:
+from projectmanagement.middleware import HybridMiddleware
+
+
+class ActivityLogMiddleware(HybridMiddleware):
     """
     Middleware to capture user's IP address for activity logging
     and store it in the request object
     """
-    
-    def __init__(self, get_response):
-        self.get_response = get_response
         
     def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        self.set_client_ip(request)
+        response = self.get_response(request)
+        return response
+    
+    async def __acall__(self, request):
+        self.set_client_ip(request)
+        return await self.get_response(request)
+    
+    def set_client_ip(self, request):
         # Get the client IP address
         x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
         if x_forwarded_for:
@@ -17,6 +28,3 @@ class ActivityLogMiddleware:
             
         # Add it to the request object for later use
         request.client_ip = ip
-        
-        response = self.get_response(request)
-        return response 
\ No newline at end of file
@@ -0,0 +1,24 @@
+# Generated by Django 5.0.8 on 2026-10-19 07:39
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activitylogs', '0002_rename_activitylog_user_id_idx_activitylog_user_id_784699_idx_and_more'),
+        ('contenttypes', '0002_remove_content_type_name'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='activitylog',
+            name='activitylog_project_9a873d_idx',
+        ),
+        migrations.AddIndex(
+            model_name='activitylog',
+            index=models.Index(fields=['project_id', 'timestamp'], name='activitylog_project_cfe466_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.0.8 on 2026-10-19 07:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activitylogs', '0003_remove_activitylog_activitylog_project_9a873d_idx_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivityFeedEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('activity', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to='activitylogs.activitylog')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='activity_feed', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Activity Feed Entry',
+                'verbose_name_plural': 'Activity Feed Entries',
+                'ordering': ['-id'],
+                'unique_together': {('user', 'activity')},
+            },
+        ),
+    ]
@@ -49,7 +49,8 @@ class ActivityLog(models.Model):
             models.Index(fields=['action_type']),
             models.Index(fields=['timestamp']),
             models.Index(fields=['content_type', 'object_id']),
-            models.Index(fields=['project_id']),
+            # Serves the per-project feed: equality on project_id, then newest first
+            models.Index(fields=['project_id', 'timestamp']),
         ]
         verbose_name = 'Activity Log'
         verbose_name_plural = 'Activity Logs'
@@ -96,4 +97,64 @@ class ActivityLog(models.Model):
             metadata=metadata or {},
             ip_address=ip_address,
             project_id=project_id
-        ) 
\ No newline at end of file
+        ) 
+
+class ActivityFeedEntry(models.Model):
+    """
+    Personal activity feed: one row per (user, activity) pushed at write time.
+
+    Every new ActivityLog is fanned out to the users who care about it, so a
+    user's recent activity is a primary-key range read on their own rows
+    instead of a query across all the projects and organizations they
+    belong to.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='activity_feed')
+    activity = models.ForeignKey(ActivityLog, on_delete=models.CASCADE, related_name='feed_entries')
+    
+    class Meta:
+        ordering = ['-id']
+        unique_together = ['user', 'activity']
+        verbose_name = 'Activity Feed Entry'
+        verbose_name_plural = 'Activity Feed Entries'
+    
+    def __str__(self):
+        return f"{self.user} <- {self.activity_id}"
+    
+    @classmethod
+    def recipient_ids(cls, activity):
+        """
+        Return the ids of the users whose feed should receive an activity:
+        the actor, plus every member of the project (or organization) it
+        happened in.
+        """
+        user_ids = set()
+        if activity.user_id:
+            user_ids.add(activity.user_id)
+        
+        if activity.project_id:
+            from projects.models import ProjectMember
+            user_ids.update(
+                ProjectMember.objects.filter(project_id=activity.project_id).values_list('user_id', flat=True)
+            )
+        elif (activity.content_type.app_label, activity.content_type.model) == ('organizations', 'organization'):
+            from organizations.models import OrganizationMember
+            user_ids.update(
+                OrganizationMember.objects.filter(organization_id=activity.object_id).values_list('user_id', flat=True)
+            )
+        
+        return user_ids
+    
+    @classmethod
+    def fan_out(cls, activity):
+        """Push an activity into the feed of every interested user"""
+        entries = [cls(user_id=user_id, activity=activity) for user_id in cls.recipient_ids(activity)]
+        cls.objects.bulk_create(entries, ignore_conflicts=True)
+        return len(entries)
+    
+    @classmethod
+    def latest_for_user(cls, user, limit=10):
+        """Return the user's newest activity log entries, newest first"""
+        entries = cls.objects.filter(user=user).select_related(
+            'activity__user', 'activity__content_type'
+        ).order_by('-id')[:limit]
+        return [entry.activity for entry in entries]
@@ -1,10 +1,11 @@
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
+from projectmanagement.metrics import timed_handler
 from django.contrib.contenttypes.models import ContentType
 from projects.models import Project, Board, Column, ProjectMember
 from tasks.models import Task, Comment, Attachment, Label
 from organizations.models import Organization, OrganizationMember
-from .models import ActivityLog
+from .models import ActivityLog, ActivityFeedEntry
 
 # Helper function to determine if signal was triggered by model creation
 def is_create(instance, created=None, **kwargs):
@@ -14,6 +15,7 @@ def is_create(instance, created=None, **kwargs):
     return False
 
 @receiver(post_save, sender=Project)
+@timed_handler
 def log_project_activity(sender, instance, created, **kwargs):
     if created:
         action_type = ActivityLog.CREATED
@@ -29,6 +31,7 @@ def log_project_activity(sender, instance, created, **kwargs):
     )
 
 @receiver(post_delete, sender=Project)
+@timed_handler
 def log_project_delete(sender, instance, **kwargs):
     if not hasattr(instance, 'created_by') or not instance.created_by:
         return  # Skip if we don't have a user
@@ -42,6 +45,7 @@ def log_project_delete(sender, instance, **kwargs):
     )
 
 @receiver(post_save, sender=Board)
+@timed_handler
 def log_board_activity(sender, instance, created, **kwargs):
     if created:
         action_type = ActivityLog.CREATED
@@ -57,6 +61,7 @@ def log_board_activity(sender, instance, created, **kwargs):
     )
 
 @receiver(post_save, sender=Task)
+@timed_handler
 def log_task_activity(sender, instance, created, **kwargs):
     if created:
         action_type = ActivityLog.CREATED
@@ -72,6 +77,7 @@ def log_task_activity(sender, instance, created, **kwargs):
     )
 
 @receiver(post_save, sender=Comment)
+@timed_handler
 def log_comment_activity(sender, instance, created, **kwargs):
     if created:
         action_type = ActivityLog.COMMENTED
@@ -89,4 +95,11 @@ def log_comment_activity(sender, instance, created, **kwargs):
         project_id=board.project.id
     )
 
-# Connect the signals to the app's ready method in apps.py 
\ No newline at end of file
+# Connect the signals to the app's ready method in apps.py 
+
+@receiver(post_save, sender=ActivityLog)
+@timed_handler
+def push_activity_to_feeds(sender, instance, created, **kwargs):
+    """Fan each new activity out to the personal feeds of interested users"""
+    if created:
+        ActivityFeedEntry.fan_out(instance)
@@ -0,0 +1,193 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient, APITestCase
+from rest_framework import status
+
+from activitylogs.models import ActivityLog, ActivityFeedEntry
+from organizations.models import Organization, OrganizationMember
+from projects.models import Project, ProjectMember
+
+User = get_user_model()
+
+
+def index_name(model, fields):
+    """Return the name Django generated for the index over ``fields``"""
+    for index in model._meta.indexes:
+        if list(index.fields) == fields:
+            return index.name
+    raise AssertionError(f"No index on {fields} for {model.__name__}")
+
+
+def query_plan(queryset):
+    """Run EXPLAIN QUERY PLAN for a queryset and return the plan text"""
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+        return "\n".join(str(row[-1]) for row in cursor.fetchall())
+
+
+class ActivityFeedQueryPlanTests(TestCase):
+    """The activity feeds must be served from the composite timestamp indexes"""
+
+    def test_project_feed_uses_project_timestamp_index(self):
+        queryset = ActivityLog.objects.filter(
+            project_id__in=ProjectMember.objects.filter(user_id=1).values_list('project_id', flat=True)
+        ).order_by('-timestamp', '-id')[:11]
+
+        plan = query_plan(queryset)
+
+        self.assertIn(index_name(ActivityLog, ['project_id', 'timestamp']), plan)
+
+    def test_analytics_feeds_use_timestamp_indexes(self):
+        from analytics.models import ActivityLog as AnalyticsActivityLog
+
+        by_org = AnalyticsActivityLog.objects.filter(organization_id=1).order_by('-timestamp', '-id')[:11]
+        by_project = AnalyticsActivityLog.objects.filter(project_id=1).order_by('-timestamp', '-id')[:11]
+
+        self.assertIn(index_name(AnalyticsActivityLog, ['organization', 'timestamp']), query_plan(by_org))
+        self.assertIn(index_name(AnalyticsActivityLog, ['project', 'timestamp']), query_plan(by_project))
+
+
+class ActivityFeedPaginationTests(APITestCase):
+    """Test cases for cursor pagination of the activity log API"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='testpassword'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+        self.organization = Organization.objects.create(name='Test Organization')
+        OrganizationMember.objects.create(
+            organization=self.organization, user=self.user, role=OrganizationMember.ADMIN
+        )
+        self.project = Project.objects.create(
+            name='Test Project',
+            organization=self.organization,
+            created_by=self.user
+        )
+        ProjectMember.objects.get_or_create(project=self.project, user=self.user, defaults={'role': 'owner'})
+
+        # Replace whatever the signals logged with a known set of entries,
+        # several of which share a timestamp to exercise the id tie-break
+        ActivityLog.objects.all().delete()
+        content_type = ContentType.objects.get_for_model(Project)
+        base = timezone.now()
+        for i in range(7):
+            log = ActivityLog.objects.create(
+                user=self.user,
+                action_type=ActivityLog.UPDATED,
+                content_type=content_type,
+                object_id=self.project.id,
+                description=f"Update {i}",
+                project_id=self.project.id,
+            )
+            ActivityLog.objects.filter(pk=log.pk).update(timestamp=base - timedelta(minutes=i // 2))
+
+        self.expected = list(
+            ActivityLog.objects.order_by('-timestamp', '-id').values_list('id', flat=True)
+        )
+
+    def test_cursor_walks_feed_without_gaps_or_duplicates(self):
+        """Following next links visits every entry exactly once, newest first"""
+        url = '/api/v1/activity-logs/?limit=3'
+        seen = []
+        pages = 0
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            seen.extend(entry['id'] for entry in response.data['results'])
+            url = response.data['next']
+            pages += 1
+
+        self.assertEqual(pages, 3)
+        self.assertEqual([str(pk) for pk in self.expected], [str(pk) for pk in seen])
+
+    def test_previous_link_returns_preceding_page(self):
+        first = self.client.get('/api/v1/activity-logs/?limit=3')
+        second = self.client.get(first.data['next'])
+        back = self.client.get(second.data['previous'])
+
+        self.assertEqual(
+            [entry['id'] for entry in back.data['results']],
+            [entry['id'] for entry in first.data['results']]
+        )
+        self.assertIsNone(back.data['previous'])
+
+    def test_invalid_cursor_returns_404(self):
+        response = self.client.get('/api/v1/activity-logs/?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ActivityFeedFanOutTests(APITestCase):
+    """Test cases for the fan-out-on-write personal activity feed"""
+
+    def setUp(self):
+        self.owner = User.objects.create_user(
+            username='owner', email='owner@example.com', password='testpassword'
+        )
+        self.member = User.objects.create_user(
+            username='member', email='member@example.com', password='testpassword'
+        )
+        self.outsider = User.objects.create_user(
+            username='outsider', email='outsider@example.com', password='testpassword'
+        )
+        self.organization = Organization.objects.create(name='Test Organization')
+        for user in (self.owner, self.member):
+            OrganizationMember.objects.create(organization=self.organization, user=user)
+        self.project = Project.objects.create(
+            name='Test Project', organization=self.organization, created_by=self.owner
+        )
+        ProjectMember.objects.get_or_create(project=self.project, user=self.owner, defaults={'role': 'owner'})
+        ProjectMember.objects.get_or_create(project=self.project, user=self.member, defaults={'role': 'member'})
+
+    def log(self, description):
+        return ActivityLog.log_activity(
+            user=self.owner,
+            action_type=ActivityLog.UPDATED,
+            content_object=self.project,
+            description=description,
+            project_id=self.project.id,
+        )
+
+    def test_new_activity_is_pushed_to_project_members(self):
+        activity = self.log('Renamed project')
+
+        recipients = set(
+            ActivityFeedEntry.objects.filter(activity=activity).values_list('user_id', flat=True)
+        )
+        self.assertEqual(recipients, {self.owner.id, self.member.id})
+
+    def test_feed_endpoint_returns_newest_entries(self):
+        first = self.log('First')
+        second = self.log('Second')
+        self.client.force_authenticate(user=self.member)
+
+        response = self.client.get('/api/v1/activity-logs/feed/?limit=2')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [entry['id'] for entry in response.data['results']],
+            [str(second.id), str(first.id)]
+        )
+
+    def test_rebuild_command_backfills_feeds(self):
+        activity = self.log('Before the feed existed')
+        ActivityFeedEntry.objects.all().delete()
+
+        call_command('rebuild_activity_feeds', '--keep', '5', stdout=StringIO())
+
+        self.assertTrue(ActivityFeedEntry.objects.filter(user=self.member, activity=activity).exists())
+        self.assertFalse(ActivityFeedEntry.objects.filter(user=self.outsider, activity=activity).exists())
+        self.assertLessEqual(ActivityFeedEntry.objects.filter(user=self.owner).count(), 5)
@@ -1,13 +1,16 @@
 from rest_framework import viewsets, filters
+from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
 from django.utils import timezone
 from datetime import timedelta
 import django_filters
 
-from .models import ActivityLog
+from .models import ActivityLog, ActivityFeedEntry
 from .serializers import ActivityLogSerializer
 from organizations.permissions import IsOrgMemberReadOnly
+from projectmanagement.pagination import ActivityFeedPagination
 
 class ActivityLogFilter(django_filters.FilterSet):
     """Filter for activity logs"""
@@ -49,25 +52,46 @@ class ActivityLogFilter(django_filters.FilterSet):
 class ActivityLogViewSet(viewsets.ReadOnlyModelViewSet):
     """
     API endpoint for viewing activity logs
+
+    Results are always newest first and paginated with a (timestamp, id)
+    cursor; pass ``limit`` to change the page size and follow ``next`` /
+    ``previous`` to move through the feed.
     """
     serializer_class = ActivityLogSerializer
     permission_classes = [IsAuthenticated, IsOrgMemberReadOnly]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    query_budget = {'default': 5}
+    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
     filterset_class = ActivityLogFilter
     search_fields = ['description']
-    ordering_fields = ['timestamp', 'action_type', 'user__username']
-    ordering = ['-timestamp']  # Default ordering
+    pagination_class = ActivityFeedPagination
     
     def get_queryset(self):
         user = self.request.user
         
         # If the user is a superuser, they can see all activity logs
         if user.is_superuser:
-            return ActivityLog.objects.all()
+            return ActivityLog.objects.select_related('user', 'content_type')
         
         # Otherwise, users can only see activity logs for projects they are a member of
         # Get all projects the user is a member of
         from projects.models import ProjectMember
         project_ids = ProjectMember.objects.filter(user=user).values_list('project_id', flat=True)
         
-        return ActivityLog.objects.filter(project_id__in=project_ids) 
\ No newline at end of file
+        return ActivityLog.objects.filter(
+            project_id__in=project_ids
+        ).select_related('user', 'content_type') 
+    
+    @action(detail=False, methods=['get'])
+    def feed(self, request):
+        """
+        Return the newest entries of the current user's personal activity
+        feed, read by primary key from the fan-out table.
+        """
+        try:
+            limit = min(max(int(request.query_params.get('limit', 10)), 1), 50)
+        except ValueError:
+            limit = 10
+        
+        activities = ActivityFeedEntry.latest_for_user(request.user, limit=limit)
+        serializer = self.get_serializer(activities, many=True)
+        return Response({'results': serializer.data})
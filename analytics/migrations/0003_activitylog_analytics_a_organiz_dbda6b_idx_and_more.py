@@ -0,0 +1,25 @@
+# Generated by Django 5.0.8 on 2026-10-19 07:39
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0002_alter_activitylog_user'),
+        ('organizations', '0002_alter_organization_id_and_more'),
+        ('projects', '0005_board_one_default_board_per_project_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='activitylog',
+            index=models.Index(fields=['organization', 'timestamp'], name='analytics_a_organiz_dbda6b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='activitylog',
+            index=models.Index(fields=['project', 'timestamp'], name='analytics_a_project_49d56c_idx'),
+        ),
+    ]
@@ -63,6 +63,10 @@ class ActivityLog(models.Model):
     
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['organization', 'timestamp']),
+            models.Index(fields=['project', 'timestamp']),
+        ]
         
     def __str__(self):
         return f"{self.user.username} {self.action_type} {self.entity_type} at {self.timestamp}"
@@ -167,7 +171,7 @@ class UserProductivity(models.Model):
             project=project,
             action_type=ActivityLog.MOVE,
             entity_type=ActivityLog.TASK,
-            details__contains={'destination_column': completed_column.id},
+            details__destination_column=str(completed_column.id),
             timestamp__date=date
         ).count()
         
@@ -1,11 +1,13 @@
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
+from projectmanagement.metrics import timed_handler
 from projects.models import Project
 from tasks.models import Task
 from .models import ProjectMetric, UserProductivity
 from django.utils import timezone
 
 @receiver(post_save, sender=Task)
+@timed_handler
 def update_project_metrics_on_task_change(sender, instance, **kwargs):
     """
     When a task is saved, update the project metrics
@@ -19,6 +21,7 @@ def update_project_metrics_on_task_change(sender, instance, **kwargs):
         UserProductivity.update_for_user_and_project(assignee, project, today)
 
 @receiver(post_delete, sender=Task)
+@timed_handler
 def update_project_metrics_on_task_delete(sender, instance, **kwargs):
     """
     When a task is deleted, update the project metrics
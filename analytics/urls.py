@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework_nested import routers
-from .views import ActivityLogViewSet, ProjectMetricViewSet, UserProductivityViewSet, RecentBoardsView, UpcomingTasksView
+from .views import ActivityLogViewSet, ProjectMetricViewSet, UserProductivityViewSet, recent_boards, upcoming_tasks
 
 # Activity logs for organizations
 org_router = routers.SimpleRouter()
@@ -15,6 +15,6 @@ urlpatterns = [
     path('', include(org_router.urls)),
     path('', include(project_router.urls)),
     # Add routes for recent boards and upcoming tasks
-    path('boards/recent/', RecentBoardsView.as_view(), name='recent-boards'),
-    path('tasks/upcoming/', UpcomingTasksView.as_view(), name='upcoming-tasks'),
+    path('boards/recent/', recent_boards, name='recent-boards'),
+    path('tasks/upcoming/', upcoming_tasks, name='upcoming-tasks'),
 ]
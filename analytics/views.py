@@ -1,10 +1,11 @@
 from django.shortcuts import get_object_or_404
-from rest_framework import viewsets, status, views, permissions
+from rest_framework import viewsets, permissions
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from django.utils import timezone
 from django.contrib.auth import get_user_model
-from django.db.models import Count, Sum, Avg
+from django.db.models import Count, Sum, Avg, Prefetch
+from django.db.models.functions import TruncDate
 from datetime import timedelta
 try:
     from django_filters.rest_framework import DjangoFilterBackend
@@ -14,28 +15,34 @@ from rest_framework import filters
 
 from .models import ActivityLog, ProjectMetric, UserProductivity
 from .serializers import ActivityLogSerializer, ProjectMetricSerializer, UserProductivitySerializer
-from projects.models import Project, Board
+from projects.models import Project, Board, Column, live_projects
 from projects.serializers import BoardSerializer
 from tasks.models import Task
 from tasks.serializers import TaskSerializer
 from users.models import User
+from projectmanagement.asyncviews import APIJsonResponse, async_api_view
+from projectmanagement.pagination import ActivityFeedPagination
+from projectmanagement.querybudget import query_budget
 
 class ActivityLogViewSet(viewsets.ReadOnlyModelViewSet):
     """
     API endpoint for activity logs
+    
+    Paginated newest first with a (timestamp, id) cursor so deep pages cost
+    the same as the first one.
     """
     serializer_class = ActivityLogSerializer
     permission_classes = [permissions.IsAuthenticated]
+    query_budget = {'default': 4}
+    pagination_class = ActivityFeedPagination
     
     # Only add filter backends if they're available
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [filters.SearchFilter]
     if DjangoFilterBackend:
         filter_backends.append(DjangoFilterBackend)
         
     filterset_fields = ['action_type', 'entity_type', 'user', 'project']
     search_fields = ['entity_name']
-    ordering_fields = ['timestamp']
-    ordering = ['-timestamp']
     
     def get_queryset(self):
         # First check for organization path parameter
@@ -43,7 +50,7 @@ class ActivityLogViewSet(viewsets.ReadOnlyModelViewSet):
             org_id = self.kwargs['organization_pk']
             return ActivityLog.objects.filter(
                 organization_id=org_id
-            ).select_related('user').order_by('-timestamp')
+            ).select_related('user')
         
         # Check for project path parameter
         project_id = self.kwargs.get('project_pk')
@@ -57,17 +64,18 @@ class ActivityLogViewSet(viewsets.ReadOnlyModelViewSet):
         if project_id:
             return ActivityLog.objects.filter(
                 project_id=project_id
-            ).select_related('user').order_by('-timestamp')
+            ).select_related('user')
             
         return ActivityLog.objects.none()
 
 class ProjectMetricViewSet(viewsets.ViewSet):
     """View set for project metrics"""
     permission_classes = [permissions.IsAuthenticated]
+    query_budget = {'default': 8}
     
     def list(self, request, project_pk=None):
         """Get all metrics for a project"""
-        project = get_object_or_404(Project, id=project_pk)
+        project = get_object_or_404(Project.objects.filter(live_projects()), id=project_pk)
         metrics = ProjectMetric.objects.filter(project=project)
         serializer = ProjectMetricSerializer(metrics, many=True)
         return Response(serializer.data)
@@ -75,7 +83,7 @@ class ProjectMetricViewSet(viewsets.ViewSet):
     @action(detail=False, methods=['get'], url_path='summary')
     def get_summary(self, request, project_pk=None):
         """Get latest metrics for a project"""
-        project = get_object_or_404(Project, id=project_pk)
+        project = get_object_or_404(Project.objects.filter(live_projects()), id=project_pk)
         metric = ProjectMetric.objects.filter(project=project).first()
         
         if not metric:
@@ -86,7 +94,7 @@ class ProjectMetricViewSet(viewsets.ViewSet):
                 'tasks_in_progress': 0,
                 'tasks_overdue': 0,
                 'active_users': 0,
-                'total_projects': Project.objects.count()
+                'total_projects': Project.objects.filter(live_projects()).count()
             })
             
         return Response({
@@ -95,32 +103,28 @@ class ProjectMetricViewSet(viewsets.ViewSet):
             'tasks_in_progress': metric.tasks_in_progress,
             'tasks_overdue': metric.tasks_overdue,
             'active_users': metric.active_users,
-            'total_projects': Project.objects.count()
+            'total_projects': Project.objects.filter(live_projects()).count()
         })
     
     @action(detail=False, methods=['get'], url_path='task-distribution')
     def get_task_distribution(self, request, project_pk=None):
         """Get task distribution by status"""
-        project = get_object_or_404(Project, id=project_pk)
+        project = get_object_or_404(Project.objects.filter(live_projects()), id=project_pk)
         
-        # Get boards and columns for this project
-        boards = project.boards.all()
+        # Get boards and columns for this project, with their task counts
+        boards = project.boards.prefetch_related(
+            Prefetch('columns', queryset=Column.objects.annotate(num_tasks=Count('tasks')))
+        )
         
         distribution = []
         for board in boards:
-            columns = board.columns.all()
             board_data = {
                 'board_name': board.name,
-                'columns': []
+                'columns': [
+                    {'column_name': column.name, 'task_count': column.num_tasks}
+                    for column in board.columns.all()
+                ]
             }
-            
-            for column in columns:
-                column_data = {
-                    'column_name': column.name,
-                    'task_count': column.tasks.count()
-                }
-                board_data['columns'].append(column_data)
-                
             distribution.append(board_data)
             
         return Response(distribution)
@@ -128,7 +132,7 @@ class ProjectMetricViewSet(viewsets.ViewSet):
     @action(detail=False, methods=['get'], url_path='burndown')
     def get_burndown_data(self, request, project_pk=None):
         """Get burndown chart data for a project"""
-        project = get_object_or_404(Project, id=project_pk)
+        project = get_object_or_404(Project.objects.filter(live_projects()), id=project_pk)
         
         # Get date range from request parameters
         days = int(request.query_params.get('days', 30))
@@ -147,27 +151,32 @@ class ProjectMetricViewSet(viewsets.ViewSet):
         burndown_data = []
         remaining_tasks = total_tasks
         
-        # Get completed tasks by day
+        # Get completed tasks by day: the first "done" column of each board,
+        # or failing that, the last column of each board
+        columns_by_board = {}
+        for column in Column.objects.filter(board__project=project).order_by('board_id', 'order'):
+            columns_by_board.setdefault(column.board_id, []).append(column)
         done_columns = []
-        for board in project.boards.all():
-            done_column = board.columns.filter(name__icontains='done').first()
+        for columns in columns_by_board.values():
+            done_column = next((column for column in columns if 'done' in column.name.lower()), None)
             if done_column:
                 done_columns.append(done_column.id)
         
         if not done_columns:  # If no "done" columns found, use last column as fallback
-            for board in project.boards.all():
-                last_column = board.columns.order_by('-order').first()
-                if last_column:
-                    done_columns.append(last_column.id)
+            done_columns = [columns[-1].id for columns in columns_by_board.values()]
+        
+        completed_by_day = dict(
+            Task.objects.filter(
+                column_id__in=done_columns,
+                updated_at__date__gte=start_date,
+                updated_at__date__lte=end_date
+            ).annotate(day=TruncDate('updated_at')).values('day').annotate(count=Count('id')).values_list('day', 'count')
+        )
         
         # Create data points
         current_date = start_date
         while current_date <= end_date:
-            # For demo purposes, simulate some completed tasks each day
-            completed_tasks = Task.objects.filter(
-                column_id__in=done_columns,
-                updated_at__date=current_date
-            ).count()
+            completed_tasks = completed_by_day.get(current_date, 0)
             
             remaining_tasks -= completed_tasks
             
@@ -194,49 +203,52 @@ class ProjectMetricViewSet(viewsets.ViewSet):
 class UserProductivityViewSet(viewsets.ViewSet):
     """View set for user productivity metrics"""
     permission_classes = [permissions.IsAuthenticated]
+    query_budget = {'default': 8}
     
     @action(detail=False, methods=['get'], url_path='rankings')
     def get_user_rankings(self, request, project_pk=None):
         """Get user productivity rankings"""
-        project = get_object_or_404(Project, id=project_pk)
+        project = get_object_or_404(Project.objects.filter(live_projects()), id=project_pk)
         
         # Get project members
-        members = project.members.all()
+        members = project.members.select_related('user')
         
         # Calculate activity metrics for the last 30 days
         thirty_days_ago = timezone.now() - timezone.timedelta(days=30)
         
-        rankings = []
-        for member in members:
-            user = member.user
-            
-            # Count tasks created
-            tasks_created = Task.objects.filter(
+        # Tasks created and completed per user, counted in one query each
+        tasks_created = dict(
+            Task.objects.filter(
                 column__board__project=project,
-                created_by=user,
                 created_at__gte=thirty_days_ago
-            ).count()
-            
-            # Count tasks completed
-            try:
-                done_columns = project.boards.first().columns.filter(name__icontains='done')
-                tasks_completed = Task.objects.filter(
+            ).values('created_by').annotate(count=Count('id')).values_list('created_by', 'count')
+        )
+        first_board = project.boards.first()
+        tasks_completed = {}
+        if first_board is not None:
+            done_columns = first_board.columns.filter(name__icontains='done')
+            tasks_completed = dict(
+                Task.objects.filter(
                     column__in=done_columns,
-                    assignees=user,
                     updated_at__gte=thirty_days_ago
-                ).count()
-            except:
-                tasks_completed = 0
-                
+                ).values('assignees').annotate(count=Count('id')).values_list('assignees', 'count')
+            )
+        
+        rankings = []
+        for member in members:
+            user = member.user
+            created = tasks_created.get(user.id, 0)
+            completed = tasks_completed.get(user.id, 0)
+            
             # Calculate score (simple formula for now)
-            productivity_score = tasks_created + (tasks_completed * 2)
+            productivity_score = created + (completed * 2)
             
             rankings.append({
                 'user_id': user.id,
                 'username': user.username,
                 'full_name': user.get_full_name(),
-                'tasks_created': tasks_created,
-                'tasks_completed': tasks_completed,
+                'tasks_created': created,
+                'tasks_completed': completed,
                 'productivity_score': productivity_score
             })
             
@@ -246,54 +258,38 @@ class UserProductivityViewSet(viewsets.ViewSet):
         return Response(rankings)
 
 # Add new views for recent boards and upcoming tasks
-class RecentBoardsView(views.APIView):
-    """API view to fetch the user's recent boards"""
-    permission_classes = [permissions.IsAuthenticated]
+# Both load on every dashboard view, so they are async views (see
+# projectmanagement.asyncviews) reading with the async ORM; everything the
+# serializers touch is fetched up front, as no query may run lazily on the
+# event loop.
+@query_budget(4)
+@async_api_view()
+async def recent_boards(request):
+    """Get recent boards for the current user"""
+    # Get recent boards (we'll use updated_at as a proxy for "recently visited")
+    recent_boards = Board.objects.filter(
+        live_projects('project'),
+        project__members__user=request.user,
+    ).prefetch_related('columns').order_by('-updated_at')[:5]  # Limit to 5 recent boards
     
-    def get(self, request):
-        """Get recent boards for the current user"""
-        user = request.user
-        
-        try:
-            # Get boards from projects where the user is a member
-            user_project_ids = user.project_memberships.values_list('project_id', flat=True)
-            
-            # Get recent boards (we'll use updated_at as a proxy for "recently visited")
-            recent_boards = Board.objects.filter(
-                project_id__in=user_project_ids
-            ).order_by('-updated_at')[:5]  # Limit to 5 recent boards
-            
-            serializer = BoardSerializer(recent_boards, many=True, context={'request': request})
-            return Response(serializer.data)
-        except Exception as e:
-            return Response(
-                {"error": str(e)}, 
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
+    boards = [board async for board in recent_boards]
+    serializer = BoardSerializer(boards, many=True, context={'request': request})
+    return APIJsonResponse(serializer.data)
 
-class UpcomingTasksView(views.APIView):
-    """API view to fetch the user's upcoming tasks"""
-    permission_classes = [permissions.IsAuthenticated]
+@query_budget(5)
+@async_api_view()
+async def upcoming_tasks(request):
+    """Get upcoming tasks for the current user"""
+    # Get upcoming tasks (due in the next 7 days)
+    now = timezone.now()
+    upcoming_tasks = Task.objects.filter(
+        live_projects('column__board__project'),
+        assignees=request.user,
+        due_date__isnull=False,
+        due_date__lte=now + timedelta(days=7),
+        due_date__gt=now,
+    ).select_related('column', 'created_by').prefetch_related('labels', 'assignees').order_by('due_date')[:10]  # Limit to 10 upcoming tasks
     
-    def get(self, request):
-        """Get upcoming tasks for the current user"""
-        user = request.user
-        
-        try:
-            # Get upcoming tasks (due in the next 7 days)
-            seven_days_from_now = timezone.now() + timezone.timedelta(days=7)
-            
-            upcoming_tasks = Task.objects.filter(
-                assignees=user,
-                due_date__isnull=False,
-                due_date__lte=seven_days_from_now,
-                due_date__gt=timezone.now()
-            ).order_by('due_date')[:10]  # Limit to 10 upcoming tasks
-            
-            serializer = TaskSerializer(upcoming_tasks, many=True, context={'request': request})
-            return Response(serializer.data)
-        except Exception as e:
-            return Response(
-                {"error": str(e)}, 
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
+    tasks = [task async for task in upcoming_tasks]
+    serializer = TaskSerializer(tasks, many=True, context={'request': request})
+    return APIJsonResponse(serializer.data)
@@ -263,6 +263,22 @@ main() {
             exec gunicorn projectmanagement.wsgi:application --bind 0.0.0.0:${PORT:-8000}
             ;;
         
+        # Like django, but served over ASGI: a few uvicorn worker processes
+        # keep the async views (unread count, dashboard, board snapshot,
+        # notification stream) on their event loops, so they take high
+        # concurrency without a thread per request
+        "asgi")
+            test_email_configuration
+            setup_database "render"
+            collect_static_files "render"
+            create_superuser
+            echo -e "${GREEN}Starting Django application (ASGI)...${NC}"
+            exec gunicorn projectmanagement.asgi:application \
+                --worker-class uvicorn.workers.UvicornWorker \
+                --workers ${WEB_CONCURRENCY:-2} \
+                --bind 0.0.0.0:${PORT:-8000}
+            ;;
+        
         # Celery worker and beat modes have been removed
         
         # Development mode
@@ -298,6 +314,7 @@ main() {
             echo "Modes:"
             echo "  build, render   - Build for Render.com deployment"
             echo "  docker, django  - Initialize and start Django in Docker"
+            echo "  asgi            - Like django, but served by uvicorn workers (ASGI)"
             echo "  # Celery worker and beat modes have been removed"
             echo "  dev             - Run in development mode"
             echo "  staticfiles     - Collect and manage static files"
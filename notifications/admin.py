@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Notification, NotificationSetting
+from .models import Notification, NotificationSetting, OutboundEmail
 
 @admin.register(Notification)
 class NotificationAdmin(admin.ModelAdmin):
@@ -13,3 +13,10 @@ class NotificationSettingAdmin(admin.ModelAdmin):
     list_display = ('user', 'task_assigned', 'deadline_approaching', 'comment_added')
     list_filter = ('task_assigned', 'deadline_approaching', 'comment_added')
     search_fields = ('user__email',)
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ('to', 'subject', 'status', 'attempts', 'created_at', 'sent_at')
+    list_filter = ('status', 'created_at')
+    search_fields = ('to', 'subject', 'idempotency_key')
+    date_hierarchy = 'created_at'
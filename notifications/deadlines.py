@@ -0,0 +1,155 @@
+"""
+Deadline reminders.
+
+Each run of ``scan_deadlines`` reads its candidate tasks as a bounded
+range over the ``due_date`` index instead of scanning every task:
+
+* approaching - due within DEADLINE_APPROACHING_WINDOW_HOURS (24) of now
+* missed      - due date passed since the previous missed scan, whose
+                boundary is remembered in DeadlineScan (tasks in a "Done"
+                column are skipped)
+
+Tasks of projects (or organizations) pending deletion are never reminded about.
+
+Reminders already sent are recorded in the DeadlineReminder ledger, so
+overlapping or repeated runs never notify anyone twice for the same
+deadline. Notifications, ledger
+rows and emails for a run are written in bulk. Run it periodically with
+``manage.py scan_deadlines``.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.utils import timezone
+
+from projects.models import live_projects
+from tasks.models import Task
+from .delivery import build_email, enqueue_emails
+from .models import DeadlineReminder, DeadlineScan, Notification, NotificationReadState
+from .utils import deadline_email, send_realtime_notification, wants_email
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+NOTIFICATION_TYPES = {
+    DeadlineReminder.APPROACHING: Notification.DEADLINE_APPROACHING,
+    DeadlineReminder.MISSED: Notification.DEADLINE_MISSED,
+}
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def scan_window(kind, now, last_run_at=None):
+    """
+    The (lower, upper] range of due dates a ``kind`` scan at ``now`` has
+    to look at, given when the previous scan ran.
+    """
+    if kind == DeadlineReminder.APPROACHING:
+        # The whole upcoming window is re-read rather than only the slice
+        # that entered it since the last run, so tasks created or
+        # rescheduled into the window are not skipped. It is a short index
+        # range and the ledger filters out the reminders already sent.
+        window = timedelta(hours=_setting('DEADLINE_APPROACHING_WINDOW_HOURS', 24))
+        return now, now + window
+
+    # On the very first run look back a limited distance instead of
+    # reminding people about every overdue task ever created
+    lookback = timedelta(hours=_setting('DEADLINE_MISSED_LOOKBACK_HOURS', 24))
+    return last_run_at or now - lookback, now
+
+
+def scan_deadlines(kind, now=None):
+    """
+    Send the ``kind`` reminders that became due since the last scan.
+
+    Returns the number of notifications created.
+    """
+    now = now or timezone.now()
+    scan = DeadlineScan.objects.filter(kind=kind).first()
+    lower, upper = scan_window(kind, now, scan.last_run_at if scan else None)
+
+    tasks = Task.objects.filter(
+        live_projects('column__board__project'), due_date__gt=lower, due_date__lte=upper
+    ).select_related('column__board')
+    if kind == DeadlineReminder.MISSED:
+        tasks = tasks.exclude(column__name__iexact='Done')
+    tasks = {task.id: task for task in tasks}
+
+    pending = []
+    if tasks:
+        already_sent = {
+            (task_id, user_id): due_date
+            for task_id, user_id, due_date in DeadlineReminder.objects.filter(
+                kind=kind, task_id__in=list(tasks)
+            ).values_list('task_id', 'user_id', 'due_date')
+        }
+        pending = [
+            (task_id, user_id)
+            for task_id, user_id in Task.assignees.through.objects.filter(
+                task_id__in=list(tasks)
+            ).values_list('task_id', 'user_id')
+            if already_sent.get((task_id, user_id)) != tasks[task_id].due_date
+        ]
+
+    with transaction.atomic():
+        notifications = _send_reminders(kind, tasks, pending) if pending else []
+        DeadlineScan.objects.update_or_create(kind=kind, defaults={'last_run_at': now})
+
+    if notifications:
+        logger.info("Sent %s %s deadline reminders for %s tasks", len(notifications), kind, len(tasks))
+    return len(notifications)
+
+
+def _send_reminders(kind, tasks, pending):
+    notification_type = NOTIFICATION_TYPES[kind]
+    is_missed = kind == DeadlineReminder.MISSED
+    users = User.objects.select_related('notification_settings').in_bulk({user_id for _, user_id in pending})
+    content_type = ContentType.objects.get_for_model(Task)
+
+    notifications = Notification.objects.bulk_create([
+        Notification(
+            recipient=users[user_id],
+            notification_type=notification_type,
+            title=f"{'Missed' if is_missed else 'Approaching'} deadline: {tasks[task_id].title}",
+            message=(
+                f"The deadline for task '{tasks[task_id].title}' has passed" if is_missed
+                else f"Task '{tasks[task_id].title}' is due in less than 24 hours"
+            ),
+            content_type=content_type,
+            object_id=str(task_id),
+        )
+        for task_id, user_id in pending
+    ])
+    NotificationReadState.record_new_notifications([user_id for _, user_id in pending])
+
+    DeadlineReminder.objects.bulk_create(
+        [
+            DeadlineReminder(task_id=task_id, user_id=user_id, kind=kind, due_date=tasks[task_id].due_date)
+            for task_id, user_id in pending
+        ],
+        update_conflicts=True,
+        unique_fields=['task', 'user', 'kind'],
+        update_fields=['due_date', 'sent_at'],
+    )
+
+    emails = []
+    for task_id, user_id in pending:
+        task, user = tasks[task_id], users[user_id]
+        if user.email and wants_email(user, notification_type):
+            subject, body = deadline_email(task, is_missed)
+            emails.append(build_email(
+                subject, body, user.email,
+                idempotency_key=f"deadline:{kind}:{task.id}:{user.id}:{task.due_date.isoformat()}"
+            ))
+    enqueue_emails(emails)
+
+    for notification in notifications:
+        send_realtime_notification(notification)
+    return notifications
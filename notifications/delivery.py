@@ -0,0 +1,260 @@
+"""
+Email delivery through a durable outbox.
+
+Code that sends email queues OutboundEmail rows instead of talking to the
+mail server inside the request. Rows are written in the caller's
+transaction, so an email exists exactly when the change that caused it
+was committed, and a unique idempotency key makes queuing the same email
+twice a no-op.
+
+A background sender drains due rows in batches over a single backend
+connection. Failed messages are retried with exponential backoff until
+EMAIL_OUTBOX_MAX_ATTEMPTS is reached. The sender runs in a daemon thread
+inside the web process (woken when new mail is committed) and can also be
+run on its own with ``manage.py send_outbox``.
+"""
+import logging
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import close_old_connections, transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+_wake = threading.Event()
+_worker = None
+_worker_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_stats = Counter()
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def build_email(subject, body, recipient, html_body=None, from_email=None, idempotency_key=None):
+    """
+    Build an unsaved outbox row. Without an idempotency key the email is
+    never treated as a duplicate.
+    """
+    return OutboundEmail(
+        idempotency_key=idempotency_key or f"uuid:{uuid.uuid4()}",
+        to=recipient,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL or '',
+        subject=subject[:255],
+        body=body,
+        html_body=html_body,
+    )
+
+
+def enqueue_emails(emails):
+    """
+    Write outbox rows, skipping any whose idempotency key is already known,
+    and wake the sender once the surrounding transaction commits.
+
+    Returns the number of emails actually queued.
+    """
+    if not emails:
+        return 0
+
+    keys = [email.idempotency_key for email in emails]
+    existing = set(
+        OutboundEmail.objects.filter(idempotency_key__in=keys).values_list('idempotency_key', flat=True)
+    )
+    unique = {}
+    for email in emails:
+        if email.idempotency_key not in existing:
+            unique.setdefault(email.idempotency_key, email)
+
+    OutboundEmail.objects.bulk_create(list(unique.values()), ignore_conflicts=True)
+    _count(queued=len(unique), deduplicated=len(emails) - len(unique))
+
+    if unique:
+        transaction.on_commit(wake)
+    return len(unique)
+
+
+def enqueue_email(subject, body, recipient, html_body=None, from_email=None, idempotency_key=None):
+    """Queue a single email for background delivery"""
+    return enqueue_emails([build_email(subject, body, recipient, html_body, from_email, idempotency_key)])
+
+
+def send_pending(batch_size=None, connection=None):
+    """
+    Deliver up to ``batch_size`` due outbox rows over one connection.
+
+    Rows are claimed with a conditional UPDATE first, so several senders
+    (threads or processes) never deliver the same row twice. Returns the
+    number of messages sent.
+    """
+    batch_size = batch_size or _setting('EMAIL_OUTBOX_BATCH_SIZE', 50)
+    now = timezone.now()
+    _release_stale_claims(now)
+
+    due_ids = list(
+        OutboundEmail.objects.filter(
+            status=OutboundEmail.PENDING, next_attempt_at__lte=now
+        ).order_by('next_attempt_at').values_list('id', flat=True)[:batch_size]
+    )
+    if not due_ids:
+        return 0
+
+    claim = uuid.uuid4()
+    OutboundEmail.objects.filter(id__in=due_ids, status=OutboundEmail.PENDING).update(
+        status=OutboundEmail.SENDING, claim=claim, claimed_at=now
+    )
+    batch = list(OutboundEmail.objects.filter(claim=claim, status=OutboundEmail.SENDING))
+    if not batch:
+        return 0
+
+    started = time.monotonic()
+    own_connection = connection is None
+    connection = connection or get_connection(fail_silently=False)
+    sent = 0
+    try:
+        connection.open()
+    except Exception as exc:
+        # The server is unreachable: put the whole batch back with backoff
+        logger.warning("Email outbox could not connect: %s", exc)
+        for email in batch:
+            _schedule_retry(email, exc)
+        return 0
+
+    try:
+        for email in batch:
+            try:
+                connection.send_messages([_to_message(email)])
+            except Exception as exc:
+                _schedule_retry(email, exc)
+                continue
+            email.status = OutboundEmail.SENT
+            email.sent_at = timezone.now()
+            email.claim = None
+            email.save(update_fields=['status', 'sent_at', 'claim'])
+            sent += 1
+    finally:
+        if own_connection:
+            try:
+                connection.close()
+            except Exception:
+                pass
+
+    elapsed = time.monotonic() - started
+    _count(batches=1, sent=sent)
+    with _stats_lock:
+        _stats['last_batch_ms'] = int(elapsed * 1000)
+    logger.info("Email outbox sent %s of %s messages in %.3fs", sent, len(batch), elapsed)
+    return sent
+
+
+def drain(batch_size=None):
+    """Send due messages batch after batch over one connection until none remain"""
+    total = 0
+    connection = get_connection(fail_silently=False)
+    try:
+        while True:
+            sent = send_pending(batch_size, connection=connection)
+            if not sent:
+                break
+            total += sent
+    finally:
+        try:
+            connection.close()
+        except Exception:
+            pass
+    return total
+
+
+def delivery_metrics():
+    """Outbox row counts by status plus this process's sender counters"""
+    by_status = dict(
+        OutboundEmail.objects.values_list('status').annotate(total=Count('id')).order_by()
+    )
+    with _stats_lock:
+        counters = dict(_stats)
+    return {
+        'outbox': {status: by_status.get(status, 0) for status, _ in OutboundEmail.STATUS_CHOICES},
+        'sender': counters,
+    }
+
+
+def wake():
+    """Start the background sender if needed and tell it there is new mail"""
+    if not _setting('EMAIL_OUTBOX_BACKGROUND_SENDER', True):
+        return
+    _ensure_worker()
+    _wake.set()
+
+
+def _ensure_worker():
+    global _worker
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_run, name='email-outbox', daemon=True)
+            _worker.start()
+
+
+def _run():
+    poll_interval = _setting('EMAIL_OUTBOX_POLL_INTERVAL', 30)
+    while True:
+        _wake.wait(poll_interval)
+        _wake.clear()
+        try:
+            drain()
+        except Exception:
+            logger.exception("Email outbox sender failed")
+        finally:
+            close_old_connections()
+
+
+def _to_message(email):
+    message = EmailMultiAlternatives(
+        subject=email.subject,
+        body=email.body,
+        from_email=email.from_email or settings.DEFAULT_FROM_EMAIL,
+        to=[email.to],
+        headers={'X-Idempotency-Key': email.idempotency_key},
+    )
+    if email.html_body:
+        message.attach_alternative(email.html_body, 'text/html')
+    return message
+
+
+def _schedule_retry(email, exc):
+    email.attempts += 1
+    email.last_error = str(exc)[:1000]
+    email.claim = None
+    if email.attempts >= _setting('EMAIL_OUTBOX_MAX_ATTEMPTS', 5):
+        email.status = OutboundEmail.FAILED
+        _count(failed=1)
+        logger.error("Giving up on email %s to %s: %s", email.idempotency_key, email.to, exc)
+    else:
+        base = _setting('EMAIL_OUTBOX_RETRY_BASE_SECONDS', 30)
+        delay = base * (2 ** (email.attempts - 1))
+        email.status = OutboundEmail.PENDING
+        email.next_attempt_at = timezone.now() + timedelta(seconds=delay * random.uniform(1, 1.25))
+        _count(retried=1)
+    email.save(update_fields=['attempts', 'last_error', 'claim', 'status', 'next_attempt_at'])
+
+
+def _release_stale_claims(now):
+    # A sender that died mid-batch leaves rows in SENDING; hand them back
+    timeout = timedelta(seconds=_setting('EMAIL_OUTBOX_CLAIM_TIMEOUT', 600))
+    OutboundEmail.objects.filter(
+        status=OutboundEmail.SENDING, claimed_at__lt=now - timeout
+    ).update(status=OutboundEmail.PENDING, claim=None)
+
+
+def _count(**increments):
+    with _stats_lock:
+        _stats.update(increments)
@@ -0,0 +1,109 @@
+"""
+Periodic notification digests.
+
+Users whose NotificationSetting.email_digest is hourly or daily do not get
+an email per notification. Instead ``send_digests`` collects everything
+they were notified about since their last digest, renders one email per
+recipient and writes all of them to the outbox in a single batch. Run it
+periodically with ``manage.py send_notification_digests``.
+"""
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.html import strip_tags
+
+from .delivery import build_email, enqueue_emails
+from .models import Notification, NotificationSetting
+
+logger = logging.getLogger(__name__)
+
+DIGEST_PERIODS = {
+    NotificationSetting.HOURLY: timedelta(hours=1),
+    NotificationSetting.DAILY: timedelta(days=1),
+}
+
+# Recipients handled per round of queries
+CHUNK_SIZE = 500
+
+
+def send_digests(frequency, now=None):
+    """
+    Queue digests for every user on ``frequency`` whose period has elapsed.
+
+    Returns the number of digest emails queued.
+    """
+    period = DIGEST_PERIODS[frequency]
+    now = now or timezone.now()
+
+    due = list(
+        NotificationSetting.objects.filter(email_digest=frequency).filter(
+            Q(last_digest_sent_at__isnull=True) | Q(last_digest_sent_at__lte=now - period)
+        ).select_related('user')
+    )
+
+    queued = 0
+    for start in range(0, len(due), CHUNK_SIZE):
+        queued += _send_chunk(due[start:start + CHUNK_SIZE], frequency, period, now)
+
+    if due:
+        logger.info("Queued %s %s digests for %s due users", queued, frequency, len(due))
+    return queued
+
+
+def _send_chunk(chunk, frequency, period, now):
+    since = {
+        setting.user_id: setting.last_digest_sent_at or now - period
+        for setting in chunk
+    }
+    settings_by_user = {setting.user_id: setting for setting in chunk}
+
+    # One query for the whole chunk, narrowed per user below
+    pending = defaultdict(list)
+    notifications = Notification.objects.filter(
+        recipient_id__in=list(since),
+        created_at__gt=min(since.values()),
+        created_at__lte=now,
+    ).order_by('created_at')
+    for notification in notifications:
+        setting = settings_by_user[notification.recipient_id]
+        if notification.created_at > since[notification.recipient_id] and setting.email_enabled(notification.notification_type):
+            pending[notification.recipient_id].append(notification)
+
+    emails = []
+    for user_id, items in pending.items():
+        user = settings_by_user[user_id].user
+        if user.email:
+            emails.append(_render_digest(user, items, frequency, now))
+
+    with transaction.atomic():
+        enqueue_emails(emails)
+        # Advance everyone's window, including users with nothing to report
+        NotificationSetting.objects.filter(pk__in=[setting.pk for setting in chunk]).update(last_digest_sent_at=now)
+
+    return len(emails)
+
+
+def _render_digest(user, notifications, frequency, now):
+    site_name = getattr(settings, 'SITE_NAME', 'Project Management')
+    context = {
+        'user': user,
+        'notifications': notifications,
+        'frequency': frequency,
+        'site_name': site_name,
+        'site_url': getattr(settings, 'SITE_URL', ''),
+    }
+    html_content = render_to_string('email/notification_digest.html', context)
+    subject = f"Your {frequency} {site_name} digest: {len(notifications)} update{'s' if len(notifications) != 1 else ''}"
+    return build_email(
+        subject,
+        strip_tags(html_content),
+        user.email,
+        html_body=html_content,
+        idempotency_key=f"digest:{frequency}:{user.id}:{now.isoformat()}",
+    )
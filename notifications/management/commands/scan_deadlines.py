@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from notifications.deadlines import scan_deadlines
+from notifications.models import DeadlineReminder
+
+
+class Command(BaseCommand):
+    help = 'Send approaching and missed deadline reminders for tasks that crossed a threshold since the last scan'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--kind',
+            choices=[kind for kind, _ in DeadlineReminder.KIND_CHOICES],
+            help='Only scan for this kind of reminder (default: all).',
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep running and scan every --interval seconds.',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=300,
+            help='Seconds between scans when running with --loop (default: 300).',
+        )
+
+    def handle(self, *args, **options):
+        kinds = [options['kind']] if options['kind'] else [kind for kind, _ in DeadlineReminder.KIND_CHOICES]
+        while True:
+            for kind in kinds:
+                sent = scan_deadlines(kind)
+                if sent:
+                    self.stdout.write(f"Sent {sent} {kind} deadline reminders")
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
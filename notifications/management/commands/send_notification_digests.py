@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from notifications.digest import DIGEST_PERIODS, send_digests
+
+
+class Command(BaseCommand):
+    help = 'Queue hourly and daily notification digest emails that are due'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--frequency',
+            choices=sorted(DIGEST_PERIODS),
+            help='Only send digests of this frequency (default: all).',
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep running and check for due digests every --interval seconds.',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=300,
+            help='Seconds between checks when running with --loop (default: 300).',
+        )
+
+    def handle(self, *args, **options):
+        frequencies = [options['frequency']] if options['frequency'] else sorted(DIGEST_PERIODS)
+        while True:
+            for frequency in frequencies:
+                queued = send_digests(frequency)
+                if queued:
+                    self.stdout.write(f"Queued {queued} {frequency} digests")
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
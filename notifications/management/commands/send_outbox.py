@@ -0,0 +1,40 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+
+from notifications import delivery
+
+
+class Command(BaseCommand):
+    help = 'Deliver pending emails from the outbox'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep running and poll the outbox instead of exiting when it is empty.',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5,
+            help='Seconds between polls when running with --loop (default: 5).',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=None,
+            help='Messages sent per batch (default: EMAIL_OUTBOX_BATCH_SIZE).',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            sent = delivery.drain(options['batch_size'])
+            if sent:
+                self.stdout.write(f"Sent {sent} emails")
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(json.dumps(delivery.delivery_metrics(), indent=2))
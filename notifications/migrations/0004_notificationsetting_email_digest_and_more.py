@@ -0,0 +1,23 @@
+# Generated by Django 5.0.8 on 2026-10-19 07:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0003_outboundemail'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificationsetting',
+            name='email_digest',
+            field=models.CharField(choices=[('immediate', 'Immediately'), ('hourly', 'Hourly digest'), ('daily', 'Daily digest')], default='immediate', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='notificationsetting',
+            name='last_digest_sent_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.0.8 on 2026-10-19 07:48
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def create_read_states(apps, schema_editor):
+    User = apps.get_model('users', 'User')
+    Notification = apps.get_model('notifications', 'Notification')
+    NotificationReadState = apps.get_model('notifications', 'NotificationReadState')
+    unread = dict(
+        Notification.objects.filter(read=False).values_list('recipient_id').annotate(total=Count('id')).order_by()
+    )
+    NotificationReadState.objects.bulk_create(
+        [
+            NotificationReadState(user_id=user_id, unread_count=unread.get(user_id, 0))
+            for user_id in User.objects.values_list('id', flat=True)
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0004_notificationsetting_email_digest_and_more'),
+        ('users', '0004_alter_user_groups_alter_user_user_permissions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationReadState',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='notification_read_state', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('last_read_at', models.DateTimeField(blank=True, null=True)),
+                ('unread_count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(create_read_states, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.0.8 on 2026-10-19 07:51
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0005_notificationreadstate'),
+        ('tasks', '0003_alter_attachment_file_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeadlineScan',
+            fields=[
+                ('kind', models.CharField(choices=[('approaching', 'Approaching'), ('missed', 'Missed')], max_length=20, primary_key=True, serialize=False)),
+                ('last_run_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DeadlineReminder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('approaching', 'Approaching'), ('missed', 'Missed')], max_length=20)),
+                ('due_date', models.DateTimeField()),
+                ('sent_at', models.DateTimeField(auto_now=True)),
+                ('task', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deadline_reminders', to='tasks.task')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='deadline_reminders', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('task', 'user', 'kind')},
+            },
+        ),
+    ]
@@ -1,4 +1,8 @@
+from collections import Counter, defaultdict
+
 from django.db import models
+from django.db.models import Case, Count, F, Value, When
+from django.utils import timezone
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
 from users.models import User
@@ -47,6 +51,17 @@ class Notification(models.Model):
 
 class NotificationSetting(models.Model):
     """Settings for user notifications"""
+    # Email delivery modes
+    IMMEDIATE = 'immediate'
+    HOURLY = 'hourly'
+    DAILY = 'daily'
+    
+    DIGEST_CHOICES = [
+        (IMMEDIATE, 'Immediately'),
+        (HOURLY, 'Hourly digest'),
+        (DAILY, 'Daily digest'),
+    ]
+    
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='notification_settings')
     task_assigned = models.BooleanField(default=True)
     task_updated = models.BooleanField(default=True)
@@ -67,5 +82,190 @@ class NotificationSetting(models.Model):
     email_project_added = models.BooleanField(default=True)
     email_invitation = models.BooleanField(default=True)
     
+    # Whether emails go out one per notification or grouped into a digest
+    email_digest = models.CharField(max_length=20, choices=DIGEST_CHOICES, default=IMMEDIATE)
+    last_digest_sent_at = models.DateTimeField(null=True, blank=True)
+    
     def __str__(self):
         return f"Notification settings for {self.user.email}"
+    
+    def email_enabled(self, notification_type):
+        """Whether the user wants email for this notification type at all"""
+        return getattr(self, f'email_{notification_type}', True)
+
+class NotificationReadState(models.Model):
+    """
+    Per-user read state for notifications
+    
+    A notification counts as read when it was created at or before
+    ``last_read_at`` or when its own ``read`` flag is set. The flag is only
+    written for notifications read individually after the watermark, so
+    marking everything read is a single-row update. ``unread_count`` is a
+    running counter: incremented when notifications are created, decremented
+    when one is read individually and reset when the watermark moves.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='notification_read_state')
+    last_read_at = models.DateTimeField(null=True, blank=True)
+    unread_count = models.PositiveIntegerField(default=0)
+    
+    def __str__(self):
+        return f"Read state for {self.user_id} ({self.unread_count} unread)"
+    
+    def is_read(self, notification):
+        """Whether a notification is read under this watermark"""
+        return notification.read or bool(self.last_read_at and notification.created_at <= self.last_read_at)
+    
+    @classmethod
+    def for_user(cls, user):
+        """Return the user's read state, creating it from their existing notifications if needed"""
+        try:
+            return cls.objects.get(user=user)
+        except cls.DoesNotExist:
+            cls._initialise([user.pk])
+            return cls.objects.get(user=user)
+    
+    @classmethod
+    def record_new_notifications(cls, user_ids):
+        """
+        Account for newly created notifications, one entry in ``user_ids``
+        per notification. Runs a constant number of queries however many
+        recipients there are.
+        """
+        counts = Counter(user_ids)
+        if not counts:
+            return
+        
+        existing = set(cls.objects.filter(user_id__in=list(counts)).values_list('user_id', flat=True))
+        missing = [user_id for user_id in counts if user_id not in existing]
+        if missing:
+            # Counted from the notification rows, which already include the new ones
+            cls._initialise(missing)
+        
+        by_increment = defaultdict(list)
+        for user_id, count in counts.items():
+            if user_id in existing:
+                by_increment[count].append(user_id)
+        for count, ids in by_increment.items():
+            cls.objects.filter(user_id__in=ids).update(unread_count=F('unread_count') + count)
+    
+    @classmethod
+    def mark_all_read(cls, user, when=None):
+        """Move the watermark to now and zero the counter"""
+        when = when or timezone.now()
+        cls.objects.update_or_create(user=user, defaults={'last_read_at': when, 'unread_count': 0})
+        return when
+    
+    @classmethod
+    def mark_read(cls, notification, when=None):
+        """
+        Record a single notification as read. Returns False if it already
+        was read, either by its own flag or by the watermark.
+        """
+        state = cls.for_user(notification.recipient)
+        if state.is_read(notification):
+            return False
+        
+        notification.read = True
+        notification.read_at = when or timezone.now()
+        notification.save(update_fields=['read', 'read_at'])
+        cls.objects.filter(pk=state.pk).update(unread_count=Case(
+            When(unread_count__gt=0, then=F('unread_count') - 1),
+            default=Value(0),
+        ))
+        return True
+    
+    @classmethod
+    def _initialise(cls, user_ids):
+        unread = {
+            recipient_id: total
+            for recipient_id, total in Notification.objects.filter(
+                recipient_id__in=user_ids, read=False
+            ).values_list('recipient_id').annotate(total=Count('id')).order_by()
+        }
+        cls.objects.bulk_create(
+            [cls(user_id=user_id, unread_count=unread.get(user_id, 0)) for user_id in user_ids],
+            ignore_conflicts=True
+        )
+
+class OutboundEmail(models.Model):
+    """
+    Durable email outbox
+    
+    Every outgoing email is written here first (in the same transaction as
+    whatever caused it) and delivered later by the background sender in
+    notifications.delivery. The idempotency key makes queuing the same
+    email twice a no-op.
+    """
+    PENDING = 'pending'
+    SENDING = 'sending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (SENDING, 'Sending'),
+        (SENT, 'Sent'),
+        (FAILED, 'Failed'),
+    ]
+    
+    idempotency_key = models.CharField(max_length=255, unique=True)
+    to = models.EmailField()
+    from_email = models.CharField(max_length=255, blank=True)
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(blank=True, null=True)
+    
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    claim = models.UUIDField(null=True, blank=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.subject} -> {self.to} ({self.status})"
+
+
+class DeadlineReminder(models.Model):
+    """
+    Ledger of deadline reminders already sent
+    
+    One row per (task, user, kind). ``due_date`` records the deadline the
+    reminder was sent for, so moving a task's due date makes it eligible
+    for a fresh reminder.
+    """
+    APPROACHING = 'approaching'
+    MISSED = 'missed'
+    
+    KIND_CHOICES = [
+        (APPROACHING, 'Approaching'),
+        (MISSED, 'Missed'),
+    ]
+    
+    task = models.ForeignKey('tasks.Task', on_delete=models.CASCADE, related_name='deadline_reminders')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='deadline_reminders')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    due_date = models.DateTimeField()
+    sent_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ['task', 'user', 'kind']
+    
+    def __str__(self):
+        return f"{self.kind} reminder for {self.task_id} to {self.user_id}"
+
+class DeadlineScan(models.Model):
+    """How far each kind of deadline scan has got, so the next run only looks at new ground"""
+    kind = models.CharField(max_length=20, choices=DeadlineReminder.KIND_CHOICES, primary_key=True)
+    last_run_at = models.DateTimeField()
+    
+    def __str__(self):
+        return f"{self.kind} deadlines scanned up to {self.last_run_at}"
@@ -0,0 +1,81 @@
+"""
+In-process notification fan-out to waiting stream requests.
+
+``publish`` is called (after commit) by the code that creates
+notifications; ``subscribe`` is used by the async stream view to wait for
+the next notification for a user. Subscribers live on the event loop that
+serves the request, publishers may run in any thread, so messages are
+handed over with ``loop.call_soon_threadsafe``.
+
+Only waiters in the same process are woken. With several worker
+processes a waiter still finds notifications created elsewhere when its
+timeout expires and it re-reads the database.
+"""
+import asyncio
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+_lock = threading.Lock()
+_subscribers = defaultdict(set)
+
+
+class Subscription:
+    """A queue of notification payloads for one waiting request"""
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+
+    def deliver(self, payload):
+        # Called from any thread; the queue is only touched on its own loop
+        try:
+            self.loop.call_soon_threadsafe(self.queue.put_nowait, payload)
+        except RuntimeError:
+            # The loop has already closed
+            pass
+
+    async def get(self, timeout):
+        """Wait up to ``timeout`` seconds for the next payload, or return None"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def get_nowait(self):
+        """Everything already delivered, without waiting"""
+        payloads = []
+        while not self.queue.empty():
+            payloads.append(self.queue.get_nowait())
+        return payloads
+
+
+@contextmanager
+def subscribe(user_id):
+    """Register a subscription for ``user_id`` for the duration of the block"""
+    subscription = Subscription(user_id)
+    with _lock:
+        _subscribers[user_id].add(subscription)
+    try:
+        yield subscription
+    finally:
+        with _lock:
+            _subscribers[user_id].discard(subscription)
+            if not _subscribers[user_id]:
+                del _subscribers[user_id]
+
+
+def publish(user_id, payload):
+    """Hand ``payload`` to every request waiting on ``user_id``. Returns how many there were."""
+    with _lock:
+        subscriptions = list(_subscribers.get(user_id, ()))
+    for subscription in subscriptions:
+        subscription.deliver(payload)
+    return len(subscriptions)
+
+
+def waiting_count():
+    """Number of open subscriptions in this process"""
+    with _lock:
+        return sum(len(subscriptions) for subscriptions in _subscribers.values())
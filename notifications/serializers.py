@@ -2,12 +2,29 @@ from rest_framework import serializers
 from .models import Notification, NotificationSetting
 
 class NotificationSerializer(serializers.ModelSerializer):
+    # Read state combines the row's own flag with the user's read watermark,
+    # passed in the serializer context as ``read_state``
+    read = serializers.SerializerMethodField()
+    read_at = serializers.SerializerMethodField()
+    
     class Meta:
         model = Notification
         fields = ['id', 'recipient', 'notification_type', 'title', 'message', 
                   'created_at', 'read', 'read_at', 'content_type', 'object_id']
         read_only_fields = ['recipient', 'notification_type', 'title', 'message', 
                            'created_at', 'content_type', 'object_id']
+    
+    def get_read(self, obj):
+        read_state = self.context.get('read_state')
+        return read_state.is_read(obj) if read_state else obj.read
+    
+    def get_read_at(self, obj):
+        if obj.read_at:
+            return serializers.DateTimeField().to_representation(obj.read_at)
+        read_state = self.context.get('read_state')
+        if read_state and read_state.is_read(obj):
+            return serializers.DateTimeField().to_representation(read_state.last_read_at)
+        return None
 
 class NotificationSettingSerializer(serializers.ModelSerializer):
     class Meta:
@@ -18,6 +35,6 @@ class NotificationSettingSerializer(serializers.ModelSerializer):
             'invitation', 'email_task_assigned', 'email_task_updated',
             'email_deadline_approaching', 'email_deadline_missed',
             'email_comment_added', 'email_mentioned', 'email_project_added',
-            'email_invitation'
+            'email_invitation', 'email_digest', 'last_digest_sent_at'
         ]
-        read_only_fields = ['user']
+        read_only_fields = ['user', 'last_digest_sent_at']
@@ -1,14 +1,32 @@
 from django.db.models.signals import post_save, m2m_changed
 from django.dispatch import receiver
+from projectmanagement.metrics import timed_handler
+from django.contrib.auth import get_user_model
 from django.contrib.contenttypes.models import ContentType
 from tasks.models import Task, Comment
 from projects.models import ProjectMember
+from .models import Notification, NotificationReadState
 from .utils import (
-    send_task_assigned_notification,
+    send_task_assigned_notifications,
     send_comment_notification
 )
 
+@receiver(post_save, sender=get_user_model())
+@timed_handler
+def user_created_read_state(sender, instance, created, **kwargs):
+    """Give every new user a read state so the unread counter is a plain update"""
+    if created:
+        NotificationReadState.objects.get_or_create(user=instance)
+
+@receiver(post_save, sender=Notification)
+@timed_handler
+def notification_created(sender, instance, created, **kwargs):
+    """Keep the recipient's unread counter in step with single inserts (bulk fan-out updates it itself)"""
+    if created:
+        NotificationReadState.record_new_notifications([instance.recipient_id])
+
 @receiver(post_save, sender=Comment)
+@timed_handler
 def comment_created_notification(sender, instance, created, **kwargs):
     """Trigger notification when a new comment is created"""
     if created:
@@ -16,6 +34,7 @@ def comment_created_notification(sender, instance, created, **kwargs):
         send_comment_notification(instance.id)
 
 @receiver(m2m_changed, sender=Task.assignees.through)
+@timed_handler
 def task_assignee_changed(sender, instance, action, pk_set, **kwargs):
     """Trigger notification when a user is assigned to a task"""
     if action == 'post_add' and pk_set:
@@ -26,23 +45,22 @@ def task_assignee_changed(sender, instance, action, pk_set, **kwargs):
         # Default to the task creator if we can't determine
         assigned_by = getattr(task, '_current_user', task.created_by)
         
-        for user_id in pk_set:
-            # Don't notify users who assign themselves
-            if assigned_by and user_id == assigned_by.id:
-                continue
-                
-            # Send notification synchronously
-            send_task_assigned_notification(
+        # Don't notify users who assign themselves
+        user_ids = [user_id for user_id in pk_set if not (assigned_by and user_id == assigned_by.id)]
+        
+        if user_ids:
+            # Send all notifications for this change in one batch
+            send_task_assigned_notifications(
                 task_id=task.id,
-                user_id=user_id,
+                user_ids=user_ids,
                 assigned_by_id=assigned_by.id if assigned_by else None
             )
 
 @receiver(post_save, sender=ProjectMember)
+@timed_handler
 def project_member_added(sender, instance, created, **kwargs):
     """Trigger notification when a user is added to a project"""
     if created:
-        from .models import Notification
         from .utils import send_realtime_notification
         
         # Create notification for the added user
@@ -1,3 +1,554 @@
-from django.test import TestCase
+import asyncio
+import base64
+import json
+import socketserver
+import threading
+from datetime import timedelta
+from io import StringIO
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.management import call_command
+from django.core.mail.backends.base import BaseEmailBackend
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from rest_framework import status
+
+from notifications import delivery, notifier
+from notifications.deadlines import scan_deadlines
+from notifications.models import (
+    DeadlineReminder, Notification, NotificationSetting, NotificationReadState, OutboundEmail
+)
+from notifications.digest import send_digests
+from notifications.utils import send_comment_notification, fan_out_notification
+from organizations.models import Organization, OrganizationMember
+from projects.models import Project, Board, Column
+from tasks.models import Task, Comment
+
+User = get_user_model()
+
+
+class NotificationTestMixin:
+    """Shared fixtures: a task inside a project board"""
+
+    def create_task(self, creator, assignees=()):
+        organization = Organization.objects.create(name='Test Organization')
+        project = Project.objects.create(name='Test Project', organization=organization, created_by=creator)
+        board = Board.objects.create(name='Test Board', project=project, created_by=creator)
+        column = Column.objects.create(name='To Do', board=board)
+        task = Task.objects.create(title='Test Task', column=column, created_by=creator)
+        if assignees:
+            task.assignees.add(*assignees)
+        return task
+
+    def create_users(self, count, prefix='user'):
+        return [
+            User.objects.create_user(
+                username=f'{prefix}{i}',
+                email=f'{prefix}{i}@example.com',
+                password='testpassword'
+            )
+            for i in range(count)
+        ]
+
+
+@override_settings(EMAIL_OUTBOX_BACKGROUND_SENDER=False)
+class CommentNotificationFanOutTests(NotificationTestMixin, TestCase):
+    """Test cases for batched comment notification fan-out"""
+
+    def setUp(self):
+        self.creator, self.author = self.create_users(2, prefix='owner')
+
+    def comment_on(self, task, content='Looks good'):
+        # Create the comment without signals so the fan-out can be measured on its own
+        return Comment.objects.bulk_create([Comment(task=task, author=self.author, content=content)])[0]
+
+    def test_recipients_exclude_author_and_include_creator(self):
+        assignees = self.create_users(3)
+        task = self.create_task(self.creator, assignees + [self.author])
+        comment = self.comment_on(task)
+        Notification.objects.all().delete()
+
+        notifications = send_comment_notification(comment.id)
+
+        self.assertEqual(
+            {notification.recipient_id for notification in notifications},
+            {user.id for user in assignees} | {self.creator.id}
+        )
+        self.assertFalse(Notification.objects.filter(recipient=self.author).exists())
+
+    def test_query_count_does_not_grow_with_recipients(self):
+        small_task = self.create_task(self.creator, self.create_users(2, prefix='small'))
+        large_task = self.create_task(self.creator, self.create_users(12, prefix='large'))
+        small_comment = self.comment_on(small_task)
+        large_comment = self.comment_on(large_task)
+
+        with CaptureQueriesContext(connection) as small:
+            send_comment_notification(small_comment.id)
+        with CaptureQueriesContext(connection) as large:
+            notifications = send_comment_notification(large_comment.id)
+
+        self.assertEqual(len(notifications), 13)
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+
+    def test_emails_are_queued_after_commit_and_respect_settings(self):
+        wants_mail, opted_out = self.create_users(2)
+        NotificationSetting.objects.create(user=wants_mail, email_comment_added=True)
+        NotificationSetting.objects.create(user=opted_out, email_comment_added=False)
+        task = self.create_task(self.creator, [wants_mail, opted_out])
+        comment = self.comment_on(task)
+        OutboundEmail.objects.all().delete()  # drop the assignment emails
+
+        with self.captureOnCommitCallbacks(execute=True):
+            send_comment_notification(comment.id)
+        self.assertEqual(len(mail.outbox), 0)
+        delivery.send_pending()
+
+        # The creator has no settings row and defaults to receiving email
+        self.assertEqual(
+            sorted(message.to[0] for message in mail.outbox),
+            sorted([wants_mail.email, self.creator.email])
+        )
+
+    def test_comment_signal_notifies_each_recipient_once(self):
+        assignee = self.create_users(1)[0]
+        task = self.create_task(self.creator, [assignee])
+
+        Comment.objects.create(task=task, author=self.author, content='Ping')
+
+        self.assertEqual(
+            Notification.objects.filter(recipient=assignee, notification_type=Notification.COMMENT_ADDED).count(),
+            1
+        )
+
+
+class SMTPStandInHandler(socketserver.StreamRequestHandler):
+    """Just enough of SMTP for Django's SMTP backend to deliver messages"""
+
+    def reply(self, text):
+        self.wfile.write(text.encode('ascii') + b'\r\n')
+
+    def handle(self):
+        self.server.connections += 1
+        self.reply('220 localhost SMTP stand-in')
+        in_data, lines = False, []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                break
+            if in_data:
+                if line.rstrip(b'\r\n') == b'.':
+                    self.server.messages.append(b''.join(lines))
+                    in_data, lines = False, []
+                    self.reply('250 OK')
+                else:
+                    lines.append(line)
+                continue
+
+            command = line[:4].upper()
+            if command in (b'EHLO', b'HELO'):
+                self.reply('250 localhost')
+            elif command == b'DATA':
+                in_data = True
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+            elif command == b'QUIT':
+                self.reply('221 Bye')
+                break
+            else:
+                self.reply('250 OK')
+
+
+class SMTPStandIn(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), SMTPStandInHandler)
+        self.connections = 0
+        self.messages = []
+
+
+class FailingEmailBackend(BaseEmailBackend):
+    """Mail backend that rejects every message"""
+
+    def send_messages(self, email_messages):
+        raise ConnectionRefusedError('mail server unavailable')
+
+
+@override_settings(EMAIL_OUTBOX_BACKGROUND_SENDER=False)
+class EmailOutboxTests(TestCase):
+    """Test cases for the durable email outbox"""
+
+    def test_idempotency_key_deduplicates(self):
+        delivery.enqueue_email('Hello', 'Body', 'a@example.com', idempotency_key='greeting:a')
+        delivery.enqueue_email('Hello', 'Body', 'a@example.com', idempotency_key='greeting:a')
+
+        self.assertEqual(OutboundEmail.objects.count(), 1)
+        self.assertEqual(delivery.send_pending(), 1)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(delivery.send_pending(), 0)
+
+    def test_batch_is_delivered_over_one_smtp_connection(self):
+        server = SMTPStandIn()
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+        for i in range(5):
+            delivery.enqueue_email(f'Message {i}', 'Body', f'user{i}@example.com', from_email='noreply@example.com')
+
+        with override_settings(
+            EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+            EMAIL_HOST='127.0.0.1',
+            EMAIL_PORT=server.server_address[1],
+            EMAIL_USE_TLS=False,
+            EMAIL_HOST_USER='',
+            EMAIL_HOST_PASSWORD='',
+        ):
+            self.assertEqual(delivery.drain(), 5)
+
+        self.assertEqual(server.connections, 1)
+        self.assertEqual(len(server.messages), 5)
+        self.assertEqual(OutboundEmail.objects.filter(status=OutboundEmail.SENT).count(), 5)
+
+    @override_settings(
+        EMAIL_BACKEND='notifications.tests.FailingEmailBackend',
+        EMAIL_OUTBOX_MAX_ATTEMPTS=2,
+        EMAIL_OUTBOX_RETRY_BASE_SECONDS=60,
+    )
+    def test_failed_delivery_is_retried_with_backoff_then_abandoned(self):
+        delivery.enqueue_email('Hello', 'Body', 'a@example.com')
+
+        self.assertEqual(delivery.send_pending(), 0)
+        email = OutboundEmail.objects.get()
+        self.assertEqual(email.status, OutboundEmail.PENDING)
+        self.assertEqual(email.attempts, 1)
+        self.assertGreaterEqual(email.next_attempt_at, timezone.now() + timedelta(seconds=59))
+
+        # Not due yet, so nothing is attempted
+        self.assertEqual(delivery.send_pending(), 0)
+        self.assertEqual(OutboundEmail.objects.get().attempts, 1)
+
+        OutboundEmail.objects.update(next_attempt_at=timezone.now())
+        delivery.send_pending()
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutboundEmail.FAILED)
+        self.assertIn('unavailable', email.last_error)
+
+
+@override_settings(EMAIL_OUTBOX_BACKGROUND_SENDER=False)
+class InvitationEmailTests(APITestCase):
+    """Invitations are queued exactly once"""
+
+    def test_invite_queues_a_single_email(self):
+        admin = User.objects.create_user(username='admin', email='admin@example.com', password='testpassword')
+        organization = Organization.objects.create(name='Test Organization')
+        OrganizationMember.objects.create(organization=organization, user=admin, role=OrganizationMember.ADMIN)
+        self.client.force_authenticate(user=admin)
+
+        response = self.client.post(
+            f'/api/v1/organizations/{organization.id}/invite/',
+            {'email': 'new@example.com', 'role': 'member'},
+            format='json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(OutboundEmail.objects.filter(to='new@example.com').count(), 1)
+
+
+@override_settings(EMAIL_OUTBOX_BACKGROUND_SENDER=False)
+class NotificationDigestTests(TestCase):
+    """Test cases for hourly and daily digest emails"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='digest', email='digest@example.com', password='testpassword')
+        self.setting = NotificationSetting.objects.create(
+            user=self.user,
+            email_digest=NotificationSetting.HOURLY,
+            email_comment_added=True,
+            email_task_updated=False,
+        )
+
+    def notify(self, notification_type, title):
+        return fan_out_notification(
+            User.objects.filter(id=self.user.id),
+            notification_type=notification_type,
+            title=title,
+            message=f'{title} message',
+            email=(title, 'body')
+        )
+
+    def test_digest_users_get_one_email_per_period(self):
+        self.notify(Notification.COMMENT_ADDED, 'First comment')
+        self.notify(Notification.TASK_ASSIGNED, 'Assigned to you')
+        self.notify(Notification.TASK_UPDATED, 'Opted out type')
+
+        # Nothing is emailed immediately in digest mode
+        self.assertEqual(OutboundEmail.objects.count(), 0)
+
+        now = timezone.now()
+        self.assertEqual(send_digests(NotificationSetting.HOURLY, now=now), 1)
+
+        digest = OutboundEmail.objects.get()
+        self.assertEqual(digest.to, self.user.email)
+        self.assertIn('First comment', digest.html_body)
+        self.assertIn('Assigned to you', digest.html_body)
+        self.assertNotIn('Opted out type', digest.html_body)
+
+        # The period has not elapsed yet, so nothing more is queued
+        self.notify(Notification.COMMENT_ADDED, 'Second comment')
+        self.assertEqual(send_digests(NotificationSetting.HOURLY, now=now + timedelta(minutes=5)), 0)
+
+        self.assertEqual(send_digests(NotificationSetting.HOURLY, now=timezone.now() + timedelta(hours=1)), 1)
+        latest = OutboundEmail.objects.order_by('-id').first()
+        self.assertIn('Second comment', latest.html_body)
+        self.assertNotIn('First comment', latest.html_body)
+
+    def test_daily_digest_ignores_hourly_users(self):
+        self.notify(Notification.COMMENT_ADDED, 'First comment')
+
+        self.assertEqual(send_digests(NotificationSetting.DAILY, now=timezone.now() + timedelta(seconds=1)), 0)
+
+
+class NotificationReadStateTests(NotificationTestMixin, APITestCase):
+    """Test cases for the per-user read watermark and unread counter"""
+
+    def setUp(self):
+        self.user = self.create_users(1, prefix='reader')[0]
+        self.client.force_authenticate(user=self.user)
+
+    def notify(self, count):
+        return [
+            fan_out_notification(
+                User.objects.filter(id=self.user.id),
+                notification_type=Notification.TASK_UPDATED,
+                title=f'Update {i}',
+                message='Something changed'
+            )[0]
+            for i in range(count)
+        ]
+
+    def unread_count(self):
+        return self.client.get('/api/v1/notifications/unread_count/').data['unread_count']
+
+    def test_counter_tracks_new_notifications(self):
+        self.notify(3)
+        Notification.objects.create(
+            recipient=self.user, notification_type=Notification.TASK_UPDATED, title='Direct', message='Direct'
+        )
+
+        self.assertEqual(NotificationReadState.objects.get(user=self.user).unread_count, 4)
+        self.assertEqual(self.unread_count(), 4)
+
+    def test_mark_all_as_read_is_constant_time(self):
+        self.notify(5)
+        self.client.get('/api/v1/notifications/unread_count/')
+
+        with CaptureQueriesContext(connection) as few:
+            self.client.post('/api/v1/notifications/mark_all_as_read/')
+        self.notify(20)
+        with CaptureQueriesContext(connection) as many:
+            self.client.post('/api/v1/notifications/mark_all_as_read/')
+
+        self.assertEqual(len(few.captured_queries), len(many.captured_queries))
+        self.assertEqual(self.unread_count(), 0)
+        # Individual rows are left untouched; the watermark covers them
+        self.assertEqual(Notification.objects.filter(recipient=self.user, read=True).count(), 0)
+
+    def test_list_and_filter_respect_watermark(self):
+        old = self.notify(2)
+        self.client.post('/api/v1/notifications/mark_all_as_read/')
+        Notification.objects.filter(id__in=[n.id for n in old]).update(created_at=timezone.now() - timedelta(minutes=1))
+        new = self.notify(1)[0]
+
+        response = self.client.get('/api/v1/notifications/')
+        results = response.data['results'] if isinstance(response.data, dict) else response.data
+        read_by_id = {item['id']: item['read'] for item in results}
+        self.assertFalse(read_by_id[new.id])
+        self.assertTrue(all(read_by_id[n.id] for n in old))
+
+        unread = self.client.get('/api/v1/notifications/?read=false')
+        unread = unread.data['results'] if isinstance(unread.data, dict) else unread.data
+        self.assertEqual([item['id'] for item in unread], [new.id])
+        self.assertEqual(self.unread_count(), 1)
+
+    def test_reading_one_notification_decrements_once(self):
+        first, second = self.notify(2)
+
+        self.client.post(f'/api/v1/notifications/{first.id}/mark_as_read/')
+        self.client.post(f'/api/v1/notifications/{first.id}/mark_as_read/')
+
+        self.assertEqual(self.unread_count(), 1)
+        first.refresh_from_db()
+        self.assertTrue(first.read)
+
+
+@override_settings(EMAIL_OUTBOX_BACKGROUND_SENDER=False)
+class DeadlineScannerTests(NotificationTestMixin, TestCase):
+    """Test cases for the index-driven deadline scanner"""
+
+    def setUp(self):
+        self.creator = self.create_users(1, prefix='creator')[0]
+        self.assignees = self.create_users(2)
+        self.task = self.create_task(self.creator, self.assignees)
+        Notification.objects.all().delete()
+        OutboundEmail.objects.all().delete()
+
+    def reminders(self, notification_type):
+        return Notification.objects.filter(notification_type=notification_type, object_id=str(self.task.id))
+
+    def set_due(self, due_date):
+        Task.objects.filter(pk=self.task.pk).update(due_date=due_date)
+
+    def test_approaching_deadline_notifies_each_assignee_once(self):
+        self.set_due(timezone.now() + timedelta(hours=2))
+
+        self.assertEqual(scan_deadlines(DeadlineReminder.APPROACHING), 2)
+        self.assertEqual(scan_deadlines(DeadlineReminder.APPROACHING), 0)
+
+        self.assertEqual(self.reminders(Notification.DEADLINE_APPROACHING).count(), 2)
+        self.assertEqual(DeadlineReminder.objects.filter(task=self.task).count(), 2)
+        self.assertEqual(OutboundEmail.objects.count(), 2)
+
+    def test_rescheduled_task_gets_a_fresh_reminder(self):
+        self.set_due(timezone.now() + timedelta(hours=2))
+        scan_deadlines(DeadlineReminder.APPROACHING)
+
+        self.set_due(timezone.now() + timedelta(hours=5))
+
+        self.assertEqual(scan_deadlines(DeadlineReminder.APPROACHING), 2)
+        self.assertEqual(DeadlineReminder.objects.filter(task=self.task).count(), 2)
+
+    def test_missed_scan_only_reads_deadlines_passed_since_last_run(self):
+        now = timezone.now()
+        self.set_due(now - timedelta(days=10))
+
+        # Long-overdue tasks are outside the first run's lookback
+        self.assertEqual(scan_deadlines(DeadlineReminder.MISSED, now=now), 0)
+
+        self.set_due(now + timedelta(minutes=30))
+        self.assertEqual(scan_deadlines(DeadlineReminder.MISSED, now=now + timedelta(hours=1)), 2)
+        self.assertEqual(scan_deadlines(DeadlineReminder.MISSED, now=now + timedelta(hours=2)), 0)
+        self.assertEqual(self.reminders(Notification.DEADLINE_MISSED).count(), 2)
+
+    def test_missed_scan_skips_done_tasks(self):
+        now = timezone.now()
+        self.task.column.name = 'Done'
+        self.task.column.save()
+        self.set_due(now - timedelta(minutes=30))
+
+        self.assertEqual(scan_deadlines(DeadlineReminder.MISSED, now=now), 0)
+
+    def test_query_count_does_not_grow_with_tasks(self):
+        due = timezone.now() + timedelta(hours=3)
+        scan_deadlines(DeadlineReminder.APPROACHING)  # records the first scan
+        self.set_due(due)
+        with CaptureQueriesContext(connection) as one_task:
+            scan_deadlines(DeadlineReminder.APPROACHING)
+
+        for _ in range(5):
+            task = self.create_task(self.creator, self.create_users(3, prefix=f'extra{Task.objects.count()}_'))
+            Task.objects.filter(pk=task.pk).update(due_date=due)
+        with CaptureQueriesContext(connection) as many_tasks:
+            self.assertEqual(scan_deadlines(DeadlineReminder.APPROACHING), 15)
+
+        self.assertEqual(len(one_task.captured_queries), len(many_tasks.captured_queries))
+
+    def test_command_runs_both_scans(self):
+        self.set_due(timezone.now() + timedelta(hours=2))
+
+        out = StringIO()
+        call_command('scan_deadlines', stdout=out)
+
+        self.assertIn('Sent 2 approaching deadline reminders', out.getvalue())
+
+
+class NotificationStreamTests(TestCase):
+    """Test cases for the long-poll / server-sent events notification stream"""
+
+    url = '/api/v1/notifications/stream/'
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='listener', email='listener@example.com', password='testpassword')
+
+    def notify(self, title='Hello'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return fan_out_notification(
+                User.objects.filter(id=self.user.id),
+                notification_type=Notification.TASK_UPDATED,
+                title=title,
+                message=f'{title} message'
+            )[0]
+
+    async def test_requires_authentication(self):
+        response = await self.async_client.get(self.url)
+        self.assertEqual(response.status_code, 403)
+
+    async def test_basic_auth_is_accepted(self):
+        notification = await sync_to_async(self.notify)()
+        credentials = base64.b64encode(b'listener@example.com:testpassword').decode()
+
+        response = await self.async_client.get(
+            self.url, {'after': 0, 'timeout': 5}, headers={'Authorization': f'Basic {credentials}'}
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['id'] for item in response.json()['notifications']], [notification.id])
+
+    async def test_returns_backlog_without_waiting(self):
+        notification = await sync_to_async(self.notify)()
+        await self.async_client.aforce_login(self.user)
+
+        response = await self.async_client.get(self.url, {'after': 0, 'timeout': 5})
+
+        data = response.json()
+        self.assertEqual([item['id'] for item in data['notifications']], [notification.id])
+        self.assertEqual(data['last_id'], notification.id)
+        self.assertEqual(data['unread_count'], 1)
+
+    async def test_long_poll_wakes_when_notification_is_committed(self):
+        await self.async_client.aforce_login(self.user)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+
+        request = asyncio.ensure_future(self.async_client.get(self.url, {'timeout': 10}))
+        while not notifier.waiting_count():
+            await asyncio.sleep(0.01)
+        notification = await sync_to_async(self.notify)('Wake up')
+        response = await request
+
+        self.assertLess(loop.time() - started, 5)
+        self.assertEqual([item['title'] for item in response.json()['notifications']], ['Wake up'])
+        self.assertEqual(response.json()['last_id'], notification.id)
+
+    async def test_long_poll_times_out_empty(self):
+        await self.async_client.aforce_login(self.user)
+
+        response = await self.async_client.get(self.url, {'timeout': 0.1})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['notifications'], [])
+        self.assertEqual(notifier.waiting_count(), 0)
+
+    async def test_event_stream_pushes_notifications(self):
+        await self.async_client.aforce_login(self.user)
+
+        response = await self.async_client.get(self.url, {'timeout': 10}, headers={'Accept': 'text/event-stream'})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        chunks = aiter(response.streaming_content)
+
+        self.assertTrue((await anext(chunks)).startswith(b'retry:'))
+        pending = asyncio.ensure_future(anext(chunks))
+        while not notifier.waiting_count():
+            await asyncio.sleep(0.01)
+        notification = await sync_to_async(self.notify)('Streamed')
+        event = (await pending).decode()
+
+        self.assertIn(f'id: {notification.id}', event)
+        self.assertEqual(json.loads(event.split('data: ', 1)[1])['title'], 'Streamed')
+        await chunks.aclose()
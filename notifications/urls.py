@@ -1,11 +1,14 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import NotificationViewSet, NotificationSettingView
+from .views import NotificationViewSet, NotificationSettingView, notification_stream, unread_count
 
 router = DefaultRouter()
 router.register(r'', NotificationViewSet, basename='notifications')
 
 urlpatterns = [
+    # Before the router so 'stream' and 'unread_count' are not taken for a notification id
+    path('stream/', notification_stream, name='notification-stream'),
+    path('unread_count/', unread_count, name='notifications-unread-count'),
     path('', include(router.urls)),
     path('settings/', NotificationSettingView.as_view(), name='notification-settings'),
 ]
@@ -1,8 +1,9 @@
 from django.utils import timezone
 from django.contrib.auth import get_user_model
-from django.core.mail import send_mail
 from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import Q
 try:
     from channels.layers import get_channel_layer
     from asgiref.sync import async_to_sync
@@ -10,49 +11,122 @@ try:
 except ImportError:
     CHANNELS_AVAILABLE = False
 import json
+import logging
 
-from .models import Notification, NotificationSetting
+from .models import Notification, NotificationSetting, NotificationReadState
+from . import notifier
+from .delivery import build_email, enqueue_email, enqueue_emails
 import datetime
 
 User = get_user_model()
+logger = logging.getLogger(__name__)
 
-def send_task_assigned_notification(task_id, user_id, assigned_by_id):
+def fan_out_notification(recipients, notification_type, title, message, content_object=None, email=None):
     """
-    Send notification synchronously when a task is assigned to a user
+    Create the same notification for many users at once
+    
+    ``recipients`` is a User queryset. It is evaluated in a single query
+    together with every recipient's NotificationSetting, the notifications
+    are written with one bulk insert, and ``email`` - an optional
+    ``(subject, body)`` pair - is written to the outbox for each recipient
+    whose settings allow email for this notification type.
+    """
+    recipients = [user for user in recipients.select_related('notification_settings')]
+    if not recipients:
+        return []
+    
+    content_type = ContentType.objects.get_for_model(content_object) if content_object is not None else None
+    object_id = str(content_object.pk) if content_object is not None else None
+    
+    notifications = Notification.objects.bulk_create([
+        Notification(
+            recipient=recipient,
+            notification_type=notification_type,
+            title=title,
+            message=message,
+            content_type=content_type,
+            object_id=object_id
+        )
+        for recipient in recipients
+    ])
+    NotificationReadState.record_new_notifications([recipient.id for recipient in recipients])
+    
+    if email:
+        subject, body = email
+        enqueue_emails([
+            build_email(subject, body, recipient.email, idempotency_key=f"notification:{notification.id}")
+            for recipient, notification in zip(recipients, notifications)
+            if recipient.email and wants_email(recipient, notification_type)
+        ])
+    
+    for notification in notifications:
+        send_realtime_notification(notification)
+    
+    return notifications
+
+def wants_email(user, notification_type):
+    """
+    Check whether a notification should be emailed to a user right away,
+    using the NotificationSetting already loaded by select_related. Users
+    in digest mode get these notifications in their next digest instead.
+    """
+    try:
+        notification_settings = user.notification_settings
+    except NotificationSetting.DoesNotExist:
+        # Default to sending email if settings don't exist
+        return True
+    if notification_settings.email_digest != NotificationSetting.IMMEDIATE:
+        return False
+    return notification_settings.email_enabled(notification_type)
+
+def task_url(task):
+    """Absolute URL of a task's detail page"""
+    return f"{settings.SITE_URL}/projects/{task.column.board.project_id}/tasks/{task.id}/"
+
+def send_task_assigned_notifications(task_id, user_ids, assigned_by_id):
+    """
+    Send notifications synchronously when a task is assigned to one or more users
     """
     from tasks.models import Task
     
     try:
-        task = Task.objects.get(id=task_id)
-        user = User.objects.get(id=user_id)
+        task = Task.objects.select_related('column__board').get(id=task_id)
         assigned_by = User.objects.get(id=assigned_by_id) if assigned_by_id else None
+        assigner_name = assigned_by.get_full_name() if assigned_by else 'Someone'
         
-        # Create notification in database
-        notification = Notification.objects.create(
-            recipient=user,
+        return fan_out_notification(
+            User.objects.filter(id__in=user_ids),
             notification_type=Notification.TASK_ASSIGNED,
             title=f"New task assigned: {task.title}",
-            message=f"{assigned_by.get_full_name() if assigned_by else 'Someone'} assigned you a task: {task.title}",
-            content_type=ContentType.objects.get_for_model(task),
-            object_id=task.id
+            message=f"{assigner_name} assigned you a task: {task.title}",
+            content_object=task,
+            email=task_assignment_email(task, assigned_by)
         )
-        
-        # Check if user wants email notifications for task assignments
-        try:
-            settings = NotificationSetting.objects.get(user=user)
-            if settings.email_task_assigned:
-                send_task_assignment_email(user.email, task, assigned_by)
-        except NotificationSetting.DoesNotExist:
-            # Default to sending email if settings don't exist
-            send_task_assignment_email(user.email, task, assigned_by)
-        
-        # Send real-time notification via WebSocket
-        send_realtime_notification(notification)
-        
-        return notification
     except Exception as e:
-        print(f"Error sending task assignment notification: {str(e)}")
-        return None
+        logger.exception("Error sending task assignment notification: %s", e)
+        return []
+
+def send_task_assigned_notification(task_id, user_id, assigned_by_id):
+    """
+    Send notification synchronously when a task is assigned to a user
+    """
+    notifications = send_task_assigned_notifications(task_id, [user_id], assigned_by_id)
+    return notifications[0] if notifications else None
+
+def comment_recipients(comment):
+    """
+    Users to notify about a comment: the task's assignees and creator, plus
+    everyone in the comment's reply thread, excluding the author. Returned
+    as a single queryset so it resolves in one query.
+    """
+    task = comment.task
+    involved = Q(assigned_tasks=task)
+    if task.created_by_id:
+        involved |= Q(id=task.created_by_id)
+    if comment.parent_id:
+        involved |= Q(id=comment.parent.author_id) | Q(comments__parent_id=comment.parent_id)
+    
+    return User.objects.filter(involved).exclude(id=comment.author_id).distinct()
 
 def send_comment_notification(comment_id):
     """
@@ -61,56 +135,25 @@ def send_comment_notification(comment_id):
     from tasks.models import Comment
     
     try:
-        comment = Comment.objects.get(id=comment_id)
+        comment = Comment.objects.select_related('task__column__board', 'author', 'parent').get(id=comment_id)
         task = comment.task
+        content = comment.content
         
-        # Get task assignees and other commenters (excluding the comment creator)
-        recipients = set()
-        
-        # Add task assignees
-        for assignee in task.assignees.all():
-            if assignee != comment.user:
-                recipients.add(assignee)
-        
-        # Add other commenters
-        for other_comment in task.comments.all():
-            if other_comment.user != comment.user:
-                recipients.add(other_comment.user)
-        
-        notifications = []
-        
-        # Create a notification for each recipient
-        for recipient in recipients:
-            notification = Notification.objects.create(
-                recipient=recipient,
-                notification_type=Notification.COMMENT_ADDED,
-                title=f"New comment on task: {task.title}",
-                message=f"{comment.user.get_full_name()} commented: {comment.text[:50]}{'...' if len(comment.text) > 50 else ''}",
-                content_type=ContentType.objects.get_for_model(task),
-                object_id=task.id
-            )
-            notifications.append(notification)
-            
-            # Check if user wants email notifications for comments
-            try:
-                settings = NotificationSetting.objects.get(user=recipient)
-                if settings.email_comment_added:
-                    send_comment_email(recipient.email, task, comment)
-            except NotificationSetting.DoesNotExist:
-                # Default to sending email if settings don't exist
-                send_comment_email(recipient.email, task, comment)
-            
-            # Send real-time notification via WebSocket
-            send_realtime_notification(notification)
-            
-        return notifications
+        return fan_out_notification(
+            comment_recipients(comment),
+            notification_type=Notification.COMMENT_ADDED,
+            title=f"New comment on task: {task.title}",
+            message=f"{comment.author.get_full_name()} commented: {content[:50]}{'...' if len(content) > 50 else ''}",
+            content_object=task,
+            email=comment_email(task, comment)
+        )
     except Exception as e:
-        print(f"Error sending comment notification: {str(e)}")
+        logger.exception("Error sending comment notification: %s", e)
         return []
 
-def send_task_assignment_email(email, task, assigned_by):
+def task_assignment_email(task, assigned_by):
     """
-    Send email notification for task assignment
+    Subject and body of the task assignment email
     """
     subject = f"New Task Assigned: {task.title}"
     message = (
@@ -118,44 +161,79 @@ def send_task_assignment_email(email, task, assigned_by):
         f"Task: {task.title}\n"
         f"Description: {task.description}\n"
         f"Due Date: {task.due_date if task.due_date else 'Not set'}\n\n"
-        f"View task details at: {settings.BASE_URL}/projects/{task.column.board.project.id}/tasks/{task.id}/"
-    )
-    send_mail(
-        subject,
-        message,
-        settings.DEFAULT_FROM_EMAIL,
-        [email],
-        fail_silently=True,
+        f"View task details at: {task_url(task)}"
     )
+    return subject, message
 
-def send_comment_email(email, task, comment):
+def comment_email(task, comment):
     """
-    Send email notification for new comment
+    Subject and body of the new comment email
     """
     subject = f"New Comment on Task: {task.title}"
     message = (
-        f"{comment.user.get_full_name()} commented on task '{task.title}':\n\n"
-        f'"{comment.text}"\n\n'
-        f"View task and respond at: {settings.BASE_URL}/projects/{task.column.board.project.id}/tasks/{task.id}/"
+        f"{comment.author.get_full_name()} commented on task '{task.title}':\n\n"
+        f'"{comment.content}"\n\n'
+        f"View task and respond at: {task_url(task)}"
     )
-    send_mail(
-        subject,
-        message,
-        settings.DEFAULT_FROM_EMAIL,
-        [email],
-        fail_silently=True,
+    return subject, message
+
+def deadline_email(task, is_missed=False):
+    """
+    Subject and body of the approaching or missed deadline email
+    """
+    if is_missed:
+        subject = f"Deadline Missed: {task.title}"
+        intro = f"The deadline for task '{task.title}' has passed."
+    else:
+        subject = f"Approaching Deadline: {task.title}"
+        intro = f"The deadline for task '{task.title}' is approaching (within 24 hours)."
+    message = (
+        f"{intro}\n\n"
+        f"Description: {task.description}\n"
+        f"Due Date: {task.due_date.strftime('%Y-%m-%d %H:%M')}\n"
+        f"Priority: {task.get_priority_display()}\n\n"
+        f"View task details at: {task_url(task)}"
     )
+    return subject, message
+
+def send_task_assignment_email(email, task, assigned_by):
+    """
+    Queue email notification for task assignment
+    """
+    subject, message = task_assignment_email(task, assigned_by)
+    enqueue_email(subject, message, email)
+
+def send_comment_email(email, task, comment):
+    """
+    Queue email notification for new comment
+    """
+    subject, message = comment_email(task, comment)
+    enqueue_email(subject, message, email)
+
+def notification_payload(notification):
+    """
+    The notification as the API returns it, for pushing to stream clients
+    """
+    from .serializers import NotificationSerializer
+    
+    return dict(NotificationSerializer(notification).data)
 
 def send_realtime_notification(notification):
     """
-    Send a real-time notification via WebSocket
+    Push a notification to the recipient's open stream requests once the
+    surrounding transaction commits, and to the WebSocket group if
+    channels is installed
     """
+    payload = notification_payload(notification)
+    recipient_id = notification.recipient_id
+    transaction.on_commit(lambda: notifier.publish(recipient_id, payload))
+    
     if not CHANNELS_AVAILABLE:
         return  # Skip WebSocket notifications if channels not available
         
     try:
         channel_layer = get_channel_layer()
-        user_channel = f"notifications_{notification.recipient.id}"
+        user_channel = f"notifications_{recipient_id}"
         
         async_to_sync(channel_layer.group_send)(
             user_channel,
@@ -172,4 +250,4 @@ def send_realtime_notification(notification):
             }
         )
     except Exception as e:
-        print(f"Error sending realtime notification: {str(e)}")
+        logger.exception("Error sending realtime notification: %s", e)
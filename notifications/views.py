@@ -1,20 +1,56 @@
 from rest_framework import viewsets, generics, permissions, status, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.utils import timezone
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.http import JsonResponse, StreamingHttpResponse
 from django_filters.rest_framework import DjangoFilterBackend
+import django_filters
 
-from .models import Notification, NotificationSetting
+from . import notifier
+from projectmanagement.asyncviews import APIJsonResponse, async_api_view, authenticate
+from projectmanagement.conditional import ConditionalGetMixin
+from projectmanagement.querybudget import query_budget
+from .models import Notification, NotificationSetting, NotificationReadState
 from .serializers import NotificationSerializer, NotificationSettingSerializer
+from .utils import notification_payload
+
+class NotificationFilter(django_filters.FilterSet):
+    """Filter for notifications, with ``read`` evaluated against the read watermark"""
+    read = django_filters.BooleanFilter(method='filter_read')
+    
+    def filter_read(self, queryset, name, value):
+        read_state = NotificationReadState.for_user(self.request.user)
+        is_read = Q(read=True)
+        if read_state.last_read_at:
+            is_read |= Q(created_at__lte=read_state.last_read_at)
+        return queryset.filter(is_read) if value else queryset.exclude(is_read)
+    
+    class Meta:
+        model = Notification
+        fields = ['read', 'notification_type']
 
-class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
+class NotificationViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     """
     API endpoint for user notifications
+    
+    Read state is tracked with a per-user watermark (see
+    NotificationReadState): marking everything read moves the watermark and
+    the unread count comes from a counter instead of a COUNT query.
     """
     serializer_class = NotificationSerializer
     permission_classes = [permissions.IsAuthenticated]
+    # One of the list's queries computes its ETag
+    query_budget = {'list': 6, 'default': 10}
+    etag_fields = ('created_at', 'read_at')
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
-    filterset_fields = ['read', 'notification_type']
+    filterset_class = NotificationFilter
     ordering_fields = ['created_at']
     ordering = ['-created_at']
     
@@ -26,43 +62,36 @@ class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
         # Only show notifications for the current user
         return Notification.objects.filter(recipient=self.request.user)
     
+    def read_state(self):
+        if not hasattr(self, '_read_state'):
+            self._read_state = NotificationReadState.for_user(self.request.user)
+        return self._read_state
+    
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if not getattr(self, 'swagger_fake_view', False) and self.request.user.is_authenticated:
+            context['read_state'] = self.read_state()
+        return context
+    
+    def etag_extra(self):
+        # Marking everything read moves the watermark, not the rows
+        read_state = self.read_state()
+        return (read_state.last_read_at, read_state.unread_count)
+    
     @action(detail=True, methods=['post'])
     def mark_as_read(self, request, pk=None):
         """Mark a notification as read"""
         notification = self.get_object()
+        NotificationReadState.mark_read(notification)
         
-        if not notification.read:
-            notification.read = True
-            notification.read_at = timezone.now()
-            notification.save()
-            
-        return Response(NotificationSerializer(notification).data)
+        return Response(self.get_serializer(notification).data)
     
     @action(detail=False, methods=['post'])
     def mark_all_as_read(self, request):
         """Mark all notifications as read"""
-        unread_notifications = Notification.objects.filter(
-            recipient=request.user,
-            read=False
-        )
+        NotificationReadState.mark_all_read(request.user)
         
-        now = timezone.now()
-        for notification in unread_notifications:
-            notification.read = True
-            notification.read_at = now
-            notification.save()
-            
         return Response({"status": "All notifications marked as read"})
-    
-    @action(detail=False, methods=['get'])
-    def unread_count(self, request):
-        """Get count of unread notifications"""
-        count = Notification.objects.filter(
-            recipient=request.user,
-            read=False
-        ).count()
-        
-        return Response({"unread_count": count})
 
 class NotificationSettingView(generics.RetrieveUpdateAPIView):
     """
@@ -75,3 +104,113 @@ class NotificationSettingView(generics.RetrieveUpdateAPIView):
         # Get or create notification settings for the user
         settings, created = NotificationSetting.objects.get_or_create(user=self.request.user)
         return settings
+
+
+# Three queries once the read state exists; building it takes three more
+@query_budget(6)
+@async_api_view()
+async def unread_count(request):
+    """
+    Get count of unread notifications
+    
+    Polled by every open page, so it is an async view: under ASGI it is
+    one indexed read on the event loop instead of a worker thread.
+    """
+    count = await NotificationReadState.objects.filter(
+        user=request.user
+    ).values_list('unread_count', flat=True).afirst()
+    if count is None:
+        count = (await sync_to_async(NotificationReadState.for_user)(request.user)).unread_count
+    return APIJsonResponse({"unread_count": count})
+
+
+# Most notifications returned by one stream request when catching up
+STREAM_BACKLOG_LIMIT = 50
+
+async def notification_stream(request):
+    """
+    Wait for new notifications instead of polling
+    
+    Served as an async view so a waiting client holds no thread or
+    database connection. Without ``Accept: text/event-stream`` this is a
+    long poll: it returns as soon as the user has notifications newer than
+    ``after`` (a notification id), or an empty list once ``timeout``
+    seconds have passed. With it, the response is a server-sent event
+    stream that stays open for ``timeout`` seconds; reconnecting clients
+    resume from the ``Last-Event-ID`` header.
+    
+    Waiting is driven by the in-process notifier, which
+    send_realtime_notification signals when a notification is committed.
+    """
+    # The session, or failing that the API's authentication classes (Basic auth)
+    user = await authenticate(request)
+    if user is None:
+        return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=403)
+    
+    event_stream = 'text/event-stream' in request.headers.get('Accept', '')
+    default_timeout = getattr(settings, 'NOTIFICATION_STREAM_TIMEOUT', 25)
+    max_timeout = getattr(settings, 'NOTIFICATION_STREAM_MAX_DURATION', 300) if event_stream else 60
+    try:
+        timeout = min(max(float(request.GET.get('timeout', default_timeout)), 0), max_timeout)
+        after = request.GET.get('after') or request.headers.get('Last-Event-ID')
+        after = int(after) if after else None
+    except ValueError:
+        return JsonResponse({'detail': 'timeout and after must be numbers.'}, status=400)
+    
+    if event_stream:
+        response = StreamingHttpResponse(_event_stream(user, after, timeout), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+    
+    # Subscribe before reading the database so nothing committed in between is missed
+    with notifier.subscribe(user.pk) as subscription:
+        if after is None:
+            after = await _latest_notification_id(user)
+            notifications = []
+        else:
+            notifications = await _notifications_after(user, after)
+        
+        if not notifications:
+            payload = await subscription.get(timeout)
+            if payload is not None:
+                notifications = [payload] + subscription.get_nowait()
+            else:
+                # Picks up notifications created by other worker processes
+                notifications = await _notifications_after(user, after)
+    
+    unread_count = await NotificationReadState.objects.filter(user=user).values_list('unread_count', flat=True).afirst()
+    return JsonResponse({
+        'notifications': notifications,
+        'last_id': notifications[-1]['id'] if notifications else after,
+        'unread_count': unread_count or 0,
+    })
+
+async def _event_stream(user, after, duration):
+    heartbeat = getattr(settings, 'NOTIFICATION_STREAM_HEARTBEAT', 15)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + duration
+    
+    with notifier.subscribe(user.pk) as subscription:
+        yield 'retry: 3000\n\n'
+        if after is not None:
+            for payload in await _notifications_after(user, after):
+                yield _format_event(payload)
+        
+        while (remaining := deadline - loop.time()) > 0:
+            payload = await subscription.get(min(heartbeat, remaining))
+            if payload is None:
+                yield ': keep-alive\n\n'
+            else:
+                yield _format_event(payload)
+
+def _format_event(payload):
+    data = json.dumps(payload, cls=DjangoJSONEncoder)
+    return f"id: {payload['id']}\nevent: notification\ndata: {data}\n\n"
+
+async def _latest_notification_id(user):
+    return await Notification.objects.filter(recipient=user).order_by('-id').values_list('id', flat=True).afirst() or 0
+
+async def _notifications_after(user, after):
+    queryset = Notification.objects.filter(recipient=user, id__gt=after).order_by('id')[:STREAM_BACKLOG_LIMIT]
+    return [notification_payload(notification) async for notification in queryset]
@@ -1,27 +1,22 @@
 import os
 import logging
-from django.core.mail import EmailMultiAlternatives
 from django.template.loader import render_to_string
 from django.utils.html import strip_tags
 from django.conf import settings
+from notifications.delivery import build_email, enqueue_emails
 from .models import OrganizationInvitation
 
 logger = logging.getLogger(__name__)
 
-def send_invitation_email(invitation):
+def build_invitation_email(invitation):
     """
-    Send an invitation email to join an organization
-    
-    Args:
-        invitation: The OrganizationInvitation model instance
+    Render the invitation email for an OrganizationInvitation as an unsaved
+    outbox row
     
-    Returns:
-        bool: True if the email was sent successfully, False otherwise
+    The idempotency key makes a repeated send for the same invitation (and
+    expiry) a no-op, while a resend that extends the expiry produces a new
+    email.
     """
-    if not isinstance(invitation, OrganizationInvitation):
-        logger.error("Invalid invitation object provided")
-        return False
-    
     # Get the base URL from settings or environment
     base_url = getattr(settings, 'BASE_URL', None)
     if not base_url:
@@ -48,24 +43,50 @@ def send_invitation_email(invitation):
     html_content = render_to_string('email/invitation.html', context)
     text_content = strip_tags(html_content)  # Strip HTML for plain text version
     
+    return build_email(
+        subject,
+        text_content,
+        invitation.email,
+        html_body=html_content,
+        idempotency_key=f"invitation:{invitation.id}:{invitation.expires_at.isoformat()}"
+    )
+
+def send_invitation_email(invitation):
+    """
+    Queue an invitation email to join an organization
+    
+    Args:
+        invitation: The OrganizationInvitation model instance
+    
+    Returns:
+        bool: True if the email was queued successfully, False otherwise
+    """
+    if not isinstance(invitation, OrganizationInvitation):
+        logger.error("Invalid invitation object provided")
+        return False
+    
     try:
-        # Create the email
-        email_message = EmailMultiAlternatives(
-            subject,
-            text_content,
-            settings.DEFAULT_FROM_EMAIL,
-            [invitation.email]
-        )
-        email_message.attach_alternative(html_content, "text/html")
-        
-        # Log before sending
-        logger.info(f"Sending invitation email to {invitation.email} using backend: {settings.EMAIL_BACKEND}")
-        
-        # Send the email
-        email_message.send(fail_silently=False)
-        
-        logger.info(f"Successfully sent invitation email to {invitation.email}")
+        logger.info(f"Queuing invitation email to {invitation.email}")
+        enqueue_emails([build_invitation_email(invitation)])
         return True
     except Exception as e:
-        logger.error(f"Failed to send invitation email to {invitation.email}: {str(e)}")
+        logger.error(f"Failed to queue invitation email to {invitation.email}: {str(e)}")
         return False
+
+def send_invitation_emails(invitations):
+    """
+    Queue the emails for many invitations as one outbox batch
+    
+    The emails are delivered by the background sender once the current
+    transaction commits.
+    
+    Returns:
+        int: The number of emails queued
+    """
+    try:
+        emails = [build_invitation_email(invitation) for invitation in invitations]
+        logger.info(f"Queuing {len(emails)} invitation emails")
+        return enqueue_emails(emails)
+    except Exception as e:
+        logger.error(f"Failed to queue invitation emails: {str(e)}")
+        return 0
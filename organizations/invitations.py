@@ -0,0 +1,181 @@
+"""
+Bulk organization invitations.
+
+``parse_invite_rows`` reads the addresses to invite from a JSON list or a
+CSV upload, ``bulk_invite`` validates them all against the existing
+members and open invitations with two set-based queries, creates the new
+invitations in one bulk insert and queues their emails as a single
+outbox batch. Every input row gets an entry in the returned report.
+"""
+import csv
+import io
+import secrets
+from datetime import timedelta
+
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+from django.db.models.functions import Lower
+from django.utils import timezone
+from rest_framework.parsers import BaseParser
+
+from .email import send_invitation_emails
+from .models import OrganizationInvitation, OrganizationMember
+
+try:
+    from activitylogs.models import ActivityLog
+    ACTIVITY_LOGS_ENABLED = True
+except ImportError:
+    ACTIVITY_LOGS_ENABLED = False
+
+# Most rows accepted in one request
+MAX_ROWS = 1000
+
+INVITATION_LIFETIME = timedelta(days=7)
+
+# Row statuses in the report
+INVITED = 'invited'
+ALREADY_MEMBER = 'already_member'
+ALREADY_INVITED = 'already_invited'
+DUPLICATE = 'duplicate'
+INVALID = 'invalid'
+
+
+class CSVTextParser(BaseParser):
+    """Accept a raw ``text/csv`` request body as a string"""
+    media_type = 'text/csv'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        return stream.read().decode('utf-8-sig')
+
+
+def parse_invite_rows(data, files=None, content_type=''):
+    """
+    Turn a bulk invite request body into a list of ``(email, role)`` pairs.
+
+    Accepts a JSON list of addresses or ``{"email", "role"}`` objects
+    (optionally wrapped as ``{"invitations": [...]}``), a CSV upload in the
+    ``file`` field, or a raw ``text/csv`` body. CSV rows are ``email`` or
+    ``email,role``; a header row is skipped. A ``role`` given next to the
+    list is the default for rows without one. Raises ValueError if the
+    body cannot be read.
+    """
+    default_role = OrganizationMember.MEMBER
+    if hasattr(data, 'get'):
+        default_role = data.get('role') or default_role
+
+    upload = files.get('file') if files else None
+    if upload is not None:
+        return _parse_csv(upload.read().decode('utf-8-sig'), default_role)
+    if content_type.startswith('text/csv'):
+        return _parse_csv(data if isinstance(data, str) else '', default_role)
+
+    items = data.get('invitations') if hasattr(data, 'get') else data
+    if isinstance(items, str):
+        # A CSV document sent as a form or JSON field
+        return _parse_csv(items, default_role)
+    if not isinstance(items, list):
+        raise ValueError('Expected a list of invitations or a CSV file.')
+
+    rows = []
+    for item in items:
+        if isinstance(item, dict):
+            rows.append((item.get('email'), item.get('role') or default_role))
+        else:
+            rows.append((item, default_role))
+    return rows
+
+
+def _parse_csv(text, default_role):
+    rows = []
+    for record in csv.reader(io.StringIO(text)):
+        record = [value.strip() for value in record]
+        if not any(record):
+            continue
+        if not rows and record[0].lower() == 'email':
+            continue
+        rows.append((record[0], record[1] if len(record) > 1 and record[1] else default_role))
+    return rows
+
+
+def bulk_invite(organization, invited_by, rows):
+    """
+    Invite every valid, new address in ``rows`` to ``organization``.
+
+    Returns the per-row report, in input order. Each entry has the row
+    number, the email, the role and a status: ``invited``,
+    ``already_member``, ``already_invited``, ``duplicate`` or ``invalid``.
+    """
+    valid_roles = {role for role, _ in OrganizationMember.ROLE_CHOICES}
+    report = []
+    candidates = {}
+    for number, (email, role) in enumerate(rows, start=1):
+        email = (email or '').strip() if isinstance(email, str) else ''
+        entry = {'row': number, 'email': email, 'role': role, 'status': INVITED}
+        report.append(entry)
+        try:
+            validate_email(email)
+        except ValidationError:
+            entry.update(status=INVALID, detail='Enter a valid email address.')
+            continue
+        if role not in valid_roles:
+            entry.update(status=INVALID, detail=f"Invalid role. Must be one of: {', '.join(sorted(valid_roles))}")
+            continue
+        key = email.lower()
+        if key in candidates:
+            entry.update(status=DUPLICATE, detail=f"Same address as row {candidates[key]['row']}.")
+            continue
+        candidates[key] = entry
+
+    if candidates:
+        members = set(
+            OrganizationMember.objects.filter(organization=organization)
+            .annotate(email_lower=Lower('user__email'))
+            .filter(email_lower__in=list(candidates))
+            .values_list('email_lower', flat=True)
+        )
+        open_invitations = dict(
+            OrganizationInvitation.objects.filter(
+                organization=organization, accepted=False, expires_at__gt=timezone.now()
+            )
+            .annotate(email_lower=Lower('email'))
+            .filter(email_lower__in=list(candidates))
+            .values_list('email_lower', 'id')
+        )
+        for key, entry in candidates.items():
+            if key in members:
+                entry.update(status=ALREADY_MEMBER, detail='User is already a member of this organization.')
+            elif key in open_invitations:
+                entry.update(status=ALREADY_INVITED, invitation_id=str(open_invitations[key]))
+
+    to_invite = [entry for entry in candidates.values() if entry['status'] == INVITED]
+    if to_invite:
+        # bulk_create skips save() and the post_save signal, so the token and
+        # expiry are set here and the emails are queued below as one batch
+        expires_at = timezone.now() + INVITATION_LIFETIME
+        invitations = [
+            OrganizationInvitation(
+                organization=organization,
+                email=entry['email'],
+                role=entry['role'],
+                invited_by=invited_by,
+                token=secrets.token_urlsafe(32),
+                expires_at=expires_at,
+            )
+            for entry in to_invite
+        ]
+        with transaction.atomic():
+            OrganizationInvitation.objects.bulk_create(invitations)
+            send_invitation_emails(invitations)
+            if ACTIVITY_LOGS_ENABLED:
+                ActivityLog.log_activity(
+                    user=invited_by,
+                    action_type=ActivityLog.UPDATED,
+                    content_object=organization,
+                    description=f"Invitations sent to {len(invitations)} addresses for organization '{organization.name}'",
+                    metadata={'emails': [invitation.email for invitation in invitations]},
+                )
+        for entry, invitation in zip(to_invite, invitations):
+            entry['invitation_id'] = str(invitation.id)
+
+    return report
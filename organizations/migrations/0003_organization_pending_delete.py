@@ -0,0 +1,18 @@
+# Generated by Django 5.0.8 on 2026-10-19 07:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('organizations', '0002_alter_organization_id_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='organization',
+            name='pending_delete',
+            field=models.BooleanField(default=False),
+        ),
+    ]
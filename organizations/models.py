@@ -13,6 +13,8 @@ class Organization(models.Model):
     website = models.URLField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Set when deletion is requested; the row and its children are purged in the background
+    pending_delete = models.BooleanField(default=False)
     
     def __str__(self):
         return self.name
@@ -1,3 +1,164 @@
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from rest_framework import status
 
-# Create your tests here.
+from notifications.models import OutboundEmail
+from organizations.models import Organization, OrganizationMember, OrganizationInvitation
+
+User = get_user_model()
+
+
+@override_settings(EMAIL_OUTBOX_BACKGROUND_SENDER=False)
+class OrganizationBulkInviteTests(APITestCase):
+    """Test cases for the bulk invitation API"""
+
+    def setUp(self):
+        self.admin = User.objects.create_user(username='admin', email='admin@example.com', password='testpassword')
+        self.member = User.objects.create_user(username='member', email='member@example.com', password='testpassword')
+        self.organization = Organization.objects.create(name='Test Organization')
+        OrganizationMember.objects.create(organization=self.organization, user=self.admin, role=OrganizationMember.ADMIN)
+        OrganizationMember.objects.create(organization=self.organization, user=self.member)
+        OrganizationInvitation.objects.create(
+            organization=self.organization, email='pending@example.com', invited_by=self.admin
+        )
+        OutboundEmail.objects.all().delete()
+        self.url = f'/api/v1/organizations/{self.organization.id}/bulk-invite/'
+        self.client.force_authenticate(user=self.admin)
+
+    def test_json_list_reports_every_row(self):
+        response = self.client.post(self.url, {
+            'role': OrganizationMember.MANAGER,
+            'invitations': [
+                'new1@example.com',
+                {'email': 'new2@example.com', 'role': OrganizationMember.ADMIN},
+                'MEMBER@example.com',
+                'pending@example.com',
+                'New1@example.com',
+                'not-an-email',
+            ],
+        }, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            [entry['status'] for entry in response.data['results']],
+            ['invited', 'invited', 'already_member', 'already_invited', 'duplicate', 'invalid']
+        )
+        self.assertEqual(response.data['summary']['invited'], 2)
+        self.assertEqual(
+            OrganizationInvitation.objects.get(email='new2@example.com').role, OrganizationMember.ADMIN
+        )
+        self.assertEqual(
+            OrganizationInvitation.objects.get(email='new1@example.com').role, OrganizationMember.MANAGER
+        )
+        self.assertEqual(
+            sorted(OutboundEmail.objects.values_list('to', flat=True)),
+            ['new1@example.com', 'new2@example.com']
+        )
+
+    def test_csv_upload(self):
+        upload = SimpleUploadedFile(
+            'people.csv', b'email,role\ncsv1@example.com,admin\ncsv2@example.com\n', content_type='text/csv'
+        )
+
+        response = self.client.post(self.url, {'file': upload}, format='multipart')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        invitations = dict(
+            OrganizationInvitation.objects.filter(email__startswith='csv').values_list('email', 'role')
+        )
+        self.assertEqual(invitations, {'csv1@example.com': 'admin', 'csv2@example.com': 'member'})
+        self.assertTrue(all(
+            invitation.token and invitation.expires_at > timezone.now()
+            for invitation in OrganizationInvitation.objects.filter(email__startswith='csv')
+        ))
+
+    def test_query_count_does_not_grow_with_rows(self):
+        def invite(prefix, count):
+            emails = [f'{prefix}{i}@example.com' for i in range(count)]
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(self.url, emails, format='json')
+            self.assertEqual(response.data['summary'], {'invited': count})
+            return len(queries.captured_queries)
+
+        self.assertEqual(invite('few', 2), invite('many', 40))
+
+    def test_non_admin_cannot_bulk_invite(self):
+        self.client.force_authenticate(user=self.member)
+
+        response = self.client.post(self.url, ['someone@example.com'], format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_rejects_unreadable_body(self):
+        response = self.client.post(self.url, {'invitations': 42}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class OrganizationDirectoryTests(APITestCase):
+    """Test cases for the compact member directory"""
+
+    def setUp(self):
+        self.organization = Organization.objects.create(name='Test Organization')
+        self.users = []
+        for i, (first, role) in enumerate([
+            ('Alice', OrganizationMember.ADMIN),
+            ('Bob', OrganizationMember.MEMBER),
+            ('Carol', OrganizationMember.MANAGER),
+            ('Dave', OrganizationMember.MEMBER),
+            ('Erin', OrganizationMember.MEMBER),
+        ]):
+            user = User.objects.create_user(
+                username=first.lower(), email=f'{first.lower()}@example.com',
+                password='testpassword', first_name=first, last_name='Smith'
+            )
+            OrganizationMember.objects.create(organization=self.organization, user=user, role=role)
+            self.users.append(user)
+        self.url = f'/api/v1/organizations/{self.organization.id}/directory/'
+        self.client.force_authenticate(user=self.users[0])
+
+    def test_cursor_walks_members_alphabetically(self):
+        emails = []
+        url = f'{self.url}?limit=2'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            emails.extend(row['email'] for row in response.data['results'])
+            url = response.data['next']
+
+        self.assertEqual(emails, sorted(user.email for user in self.users))
+
+    def test_rows_are_compact_and_built_in_one_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+
+        row = response.data['results'][0]
+        self.assertEqual(set(row), {'id', 'user_id', 'name', 'email', 'role', 'avatar_url'})
+        self.assertEqual(row['name'], 'Alice Smith')
+        self.assertIsNone(row['avatar_url'])
+        # One query to load the organization, one joined query for the page
+        self.assertEqual(len(queries.captured_queries), 2, [q['sql'] for q in queries.captured_queries])
+
+    def test_role_filter_and_prefix_search(self):
+        members = self.client.get(f'{self.url}?role=member')
+        self.assertEqual(
+            [row['email'] for row in members.data['results']],
+            ['bob@example.com', 'dave@example.com', 'erin@example.com']
+        )
+
+        search = self.client.get(f'{self.url}?search=car')
+        self.assertEqual([row['email'] for row in search.data['results']], ['carol@example.com'])
+
+        invalid = self.client.get(f'{self.url}?role=owner')
+        self.assertEqual(invalid.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_non_members_cannot_read_directory(self):
+        outsider = User.objects.create_user(username='outsider', email='outsider@example.com', password='testpassword')
+        self.client.force_authenticate(user=outsider)
+
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_404_NOT_FOUND)
@@ -1,5 +1,6 @@
 from rest_framework import viewsets, generics, permissions, status
 from rest_framework.decorators import action
+from rest_framework.parsers import FormParser, JSONParser, MultiPartParser
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404, render, redirect
 from django.db.models import Q
@@ -8,12 +9,16 @@ from django.db.models import Q
 import uuid
 import datetime
 
+from projectmanagement.pagination import MemberDirectoryPagination
+from users.models import User
+from users.avatars import avatar_url
 from .models import Organization, OrganizationMember, OrganizationInvitation
 from .serializers import (
     OrganizationSerializer, OrganizationDetailSerializer,
     OrganizationMemberSerializer, OrganizationMemberUpdateSerializer,
     OrganizationInvitationSerializer
 )
+from .invitations import CSVTextParser, MAX_ROWS, INVITED, bulk_invite, parse_invite_rows
 from .permissions import (
     IsOrganizationAdmin, IsOrganizationMember, 
     IsOrganizationAdminOrReadOnly
@@ -25,6 +30,7 @@ class OrganizationViewSet(viewsets.ModelViewSet):
     """
     serializer_class = OrganizationSerializer
     permission_classes = [permissions.IsAuthenticated]
+    query_budget = {'list': 4, 'retrieve': 4, 'members': 4, 'default': 20}
     queryset = Organization.objects.all()  # Add this line to fix the router issue
     
     def get_queryset(self):
@@ -34,7 +40,8 @@ class OrganizationViewSet(viewsets.ModelViewSet):
             
         # Return organizations the user is a member of
         return Organization.objects.filter(
-            members__user=self.request.user
+            members__user=self.request.user,
+            pending_delete=False
         ).distinct()
     
     def get_serializer_class(self):
@@ -47,6 +54,15 @@ class OrganizationViewSet(viewsets.ModelViewSet):
             self.permission_classes = [permissions.IsAuthenticated, IsOrganizationAdmin]
         return super().get_permissions()
     
+    def destroy(self, request, *args, **kwargs):
+        """Hide the organization now and delete it in the background"""
+        from projects.deletion import schedule_deletion
+        from projects.serializers import DeletionJobSerializer
+        
+        organization = self.get_object()
+        job = schedule_deletion(organization, request.user)
+        return Response(DeletionJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+    
     def perform_create(self, serializer):
         # Create organization and add current user as admin
         organization = serializer.save()
@@ -60,10 +76,63 @@ class OrganizationViewSet(viewsets.ModelViewSet):
     def members(self, request, pk=None):
         """Get all members of an organization"""
         organization = self.get_object()
-        members = OrganizationMember.objects.filter(organization=organization)
+        members = OrganizationMember.objects.filter(organization=organization).select_related('user', 'organization')
         serializer = OrganizationMemberSerializer(members, many=True)
         return Response(serializer.data)
     
+    @action(detail=True, methods=['get'])
+    def directory(self, request, pk=None):
+        """
+        Compact, paginated member directory
+        
+        Rows are built from a single joined values() query instead of the
+        nested member serializer. Supports ``?role=`` (comma separated),
+        ``?search=`` (prefix of email, first or last name), ``?limit=`` and
+        cursor pagination ordered by email.
+        """
+        organization = self.get_object()
+        rows = OrganizationMember.objects.filter(organization=organization)
+        
+        roles = [role for role in request.query_params.get('role', '').split(',') if role]
+        if roles:
+            valid_roles = [role for role, _ in OrganizationMember.ROLE_CHOICES]
+            invalid = [role for role in roles if role not in valid_roles]
+            if invalid:
+                return Response(
+                    {"detail": f"Invalid role. Must be one of: {', '.join(valid_roles)}"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            rows = rows.filter(role__in=roles)
+        
+        search = request.query_params.get('search', '').strip()
+        if search:
+            rows = rows.filter(
+                Q(user__email__istartswith=search) |
+                Q(user__first_name__istartswith=search) |
+                Q(user__last_name__istartswith=search)
+            )
+        
+        rows = rows.values(
+            'id', 'role', 'user_id', 'user__email', 'user__first_name',
+            'user__last_name', 'user__profile_picture', 'user__avatar_variants'
+        )
+        paginator = MemberDirectoryPagination()
+        page = paginator.paginate_queryset(rows, request, view=self)
+        
+        return paginator.get_paginated_response([
+            {
+                'id': row['id'],
+                'user_id': row['user_id'],
+                'name': f"{row['user__first_name']} {row['user__last_name']}".strip() or row['user__email'],
+                'email': row['user__email'],
+                'role': row['role'],
+                'avatar_url': avatar_url(
+                    row['user__profile_picture'], row['user__avatar_variants'], 64, request
+                ),
+            }
+            for row in page
+        ])
+    
     @action(detail=True, methods=['post'], permission_classes=[permissions.IsAuthenticated, IsOrganizationAdmin])
     def invite(self, request, pk=None):
         """Invite a user to an organization"""
@@ -105,15 +174,49 @@ class OrganizationViewSet(viewsets.ModelViewSet):
             role=role,
             invited_by=request.user,
         )
-        invitation.save()  # This will generate the token and set expires_at
-        
-        # Explicitly send the invitation email here to ensure it's sent immediately
-        # (the signal handler will also try to send it but this is a backup)
-        from .email import send_invitation_email
-        send_invitation_email(invitation)
+        invitation.save()  # Generates the token and expiry; the post_save signal queues the email
         
         serializer = OrganizationInvitationSerializer(invitation)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
+    
+    @action(
+        detail=True, methods=['post'], url_path='bulk-invite',
+        permission_classes=[permissions.IsAuthenticated, IsOrganizationAdmin],
+        parser_classes=[JSONParser, MultiPartParser, FormParser, CSVTextParser]
+    )
+    def bulk_invite(self, request, pk=None):
+        """
+        Invite many users at once from a JSON list or a CSV file
+        
+        Returns a report with one entry per input row. Rows for existing
+        members, open invitations, duplicates and invalid addresses are
+        reported rather than failing the whole request.
+        """
+        organization = self.get_object()
+        
+        try:
+            rows = parse_invite_rows(request.data, request.FILES, request.content_type or '')
+        except (ValueError, UnicodeDecodeError) as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if not rows:
+            return Response({"detail": "No invitations provided."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(rows) > MAX_ROWS:
+            return Response(
+                {"detail": f"At most {MAX_ROWS} invitations can be sent in one request."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        report = bulk_invite(organization, request.user, rows)
+        
+        summary = {}
+        for entry in report:
+            summary[entry['status']] = summary.get(entry['status'], 0) + 1
+        invited = summary.get(INVITED, 0)
+        return Response(
+            {"summary": summary, "results": report},
+            status=status.HTTP_201_CREATED if invited else status.HTTP_200_OK
+        )
 
 class OrganizationMemberViewSet(viewsets.ModelViewSet):
     """
@@ -121,6 +224,7 @@ class OrganizationMemberViewSet(viewsets.ModelViewSet):
     """
     serializer_class = OrganizationMemberSerializer
     permission_classes = [permissions.IsAuthenticated, IsOrganizationMember]
+    query_budget = {'list': 5, 'default': 12}
     
     def get_queryset(self):
         organization_id = self.kwargs.get('organization_pk')
@@ -142,10 +246,11 @@ class OrganizationInvitationViewSet(viewsets.ModelViewSet):
     """
     serializer_class = OrganizationInvitationSerializer
     permission_classes = [permissions.IsAuthenticated, IsOrganizationAdmin]
+    query_budget = {'list': 5, 'default': 15}
     
     def get_queryset(self):
         organization_id = self.kwargs.get('organization_pk')
-        return OrganizationInvitation.objects.filter(organization_id=organization_id)
+        return OrganizationInvitation.objects.filter(organization_id=organization_id).select_related('organization', 'invited_by')
     
     def perform_create(self, serializer):
         """Set the organization and invited_by fields when creating an invitation"""
@@ -284,7 +389,7 @@ class OrganizationInvitationViewSet(viewsets.ModelViewSet):
 
 # View for rendering the organization detail HTML page
 def organization_detail_view(request, org_id):
-    organization = get_object_or_404(Organization, id=org_id)
+    organization = get_object_or_404(Organization, id=org_id, pending_delete=False)
     # Basic permission check: user must be a member of the organization to view its details
     # More granular checks can be added if needed (e.g. using IsOrganizationMember permission class)
     if not OrganizationMember.objects.filter(organization=organization, user=request.user).exists() and not request.user.is_staff:
@@ -372,7 +477,8 @@ def organization_list_view(request):
         
     # Get organizations the user is a member of
     user_organizations = Organization.objects.filter(
-        members__user=request.user
+        members__user=request.user,
+        pending_delete=False
     ).distinct()
     
     context = {
@@ -388,13 +494,13 @@ def organization_delete_view(request, org_id):
     View function for handling organization deletion
     Requires POST method and checks if user has admin permissions
     """
-    organization = get_object_or_404(Organization, id=org_id)
+    organization = get_object_or_404(Organization, id=org_id, pending_delete=False)
     
     # Check if user is an organization admin
     member = OrganizationMember.objects.filter(
         organization=organization,
         user=request.user,
-        is_admin=True
+        role=OrganizationMember.ADMIN
     ).first()
     
     if not member and not request.user.is_staff:
@@ -404,12 +510,13 @@ def organization_delete_view(request, org_id):
     
     # Only process deletion on POST request
     if request.method == 'POST':
-        # Delete the organization
-        organization.delete()
+        # Hide the organization now; its projects are purged in the background
+        from projects.deletion import schedule_deletion
+        schedule_deletion(organization, request.user)
         
         # Redirect to the organizations list
         from django.contrib import messages
-        messages.success(request, f'Organization "{organization.name}" has been successfully deleted.')
+        messages.success(request, f'Organization "{organization.name}" is being deleted.')
         return redirect('organizations')
     
     # Render confirmation page for GET requests
@@ -420,7 +527,7 @@ def organization_delete_view(request, org_id):
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from projects.models import Project
+from projects.models import Project, live_projects
 from projects.serializers import ProjectSerializer
 
 class OrganizationProjectsView(APIView):
@@ -443,7 +550,8 @@ class OrganizationProjectsView(APIView):
         # Get all projects for the organization that the user has access to
         # Either projects the user is a member of, or public projects in the organization
         projects = Project.objects.filter(
-            organization_id=organization_id
+            live_projects(),
+            organization_id=organization_id,
         ).filter(
             Q(members__user=request.user) | Q(is_public=True)
         ).distinct()
@@ -1,8 +1,11 @@
 """
 ASGI config for projectmanagement project.
 
-Simple ASGI configuration without WebSocket support.
-For production, consider using WSGI instead.
+Simple ASGI configuration without WebSocket support. Serve with uvicorn
+(uvicorn projectmanagement.asgi:application, or ``./build.sh asgi`` for
+gunicorn with uvicorn workers) so async views such as the notification
+stream and the async API views (see projectmanagement.asyncviews) run on
+the event loop without holding a worker thread.
 """
 
 import os
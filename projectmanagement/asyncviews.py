@@ -0,0 +1,103 @@
+"""
+Async views for the hottest read endpoints.
+
+DRF views are synchronous, so under ASGI every one of them is run in a
+worker thread. The high-fanout reads (unread count, upcoming tasks,
+recent boards, board snapshot) are plain ``async def`` views on Django's
+async ORM instead, and ``async_api_view`` gives them the parts of an
+APIView they need: the API's authentication and throttle classes, 405 for
+other methods and an ``APIJsonResponse`` shaped like DRF's Response.
+
+Sessions are checked on the event loop with ``request.auser()``; only the
+other authentication classes (HTTP Basic, or the test client's forced
+user) and the throttles, which use the shared SQLite limiter, are run in
+a thread.
+"""
+import functools
+import math
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from rest_framework import exceptions
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+
+class APIJsonResponse(JsonResponse):
+    """A JsonResponse that keeps ``data``, like DRF's Response"""
+
+    def __init__(self, data, **kwargs):
+        kwargs.setdefault('safe', False)
+        super().__init__(data, **kwargs)
+        self.data = data
+
+
+def _api_user(request):
+    """The user the API's authentication classes find, or None"""
+    authenticators = [auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+    try:
+        user = Request(request, authenticators=authenticators).user
+    except exceptions.AuthenticationFailed:
+        return None
+    return user if user.is_authenticated else None
+
+
+async def authenticate(request):
+    """Set ``request.user`` and return it, or None for anonymous requests"""
+    user = await request.auser()
+    if not user.is_authenticated:
+        user = await sync_to_async(_api_user)(request)
+        if user is None:
+            return None
+    request.user = user
+    return user
+
+
+def _throttle_waits(request, view):
+    """Seconds to wait for each throttle that refused the request; empty if none did"""
+    waits = []
+    for throttle_class in api_settings.DEFAULT_THROTTLE_CLASSES:
+        throttle = throttle_class()
+        if not throttle.allow_request(request, view):
+            waits.append(throttle.wait())
+    return waits
+
+
+def async_api_view(methods=('GET',), throttle_scope=None):
+    """
+    Turn an ``async def view(request, ...)`` into an authenticated,
+    throttled API view; anonymous requests get DRF's 403
+    """
+    allowed = {method.upper() for method in methods}
+    if 'GET' in allowed:
+        allowed.add('HEAD')
+
+    def decorator(view):
+        @functools.wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in allowed:
+                response = APIJsonResponse({'detail': f'Method "{request.method}" not allowed.'}, status=405)
+                response['Allow'] = ', '.join(sorted(allowed))
+                return response
+
+            if await authenticate(request) is None:
+                return APIJsonResponse({'detail': 'Authentication credentials were not provided.'}, status=403)
+
+            waits = await sync_to_async(_throttle_waits)(request, wrapper)
+            if waits:
+                wait = max((w for w in waits if w is not None), default=None)
+                if wait is None:
+                    return APIJsonResponse({'detail': 'Request was throttled.'}, status=429)
+                seconds = math.ceil(wait)
+                response = APIJsonResponse(
+                    {'detail': f'Request was throttled. Expected available in {seconds} seconds.'}, status=429
+                )
+                response['Retry-After'] = str(seconds)
+                return response
+
+            return await view(request, *args, **kwargs)
+
+        # Read by ScopedRateThrottle
+        wrapper.throttle_scope = throttle_scope
+        return wrapper
+    return decorator
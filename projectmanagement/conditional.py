@@ -0,0 +1,168 @@
+"""
+Conditional requests for DRF viewsets.
+
+ConditionalGetMixin gives ``list`` and ``retrieve`` an ETag computed from
+what the representation depends on, without serializing it: the row
+count and newest ``updated_at`` of the queryset, plus the count and
+newest timestamp of every related table named in ``etag_fields``. It
+may map action names to fields, like ``query_budget``::
+
+    class BoardViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
+        etag_fields = {'default': ('updated_at', 'columns__updated_at')}
+
+A GET whose If-None-Match holds the current ETag gets a 304 before the
+serializer runs. A PUT, PATCH or DELETE whose If-Match does not hold the
+object's current ETag gets a 412, so clients can update optimistically.
+Last-Modified is sent as well, but a deleted row does not move the newest
+timestamp, so only the ETag can turn a request into a 304.
+
+A representation that changes without a write, such as a flag computed
+against the clock, adds the aggregate that tracks it in
+``etag_aggregates``.
+"""
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.http import http_date, parse_etags
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.response import Response
+
+# Actions whose responses carry validators
+CONDITIONAL_ACTIONS = ('list', 'retrieve')
+
+WRITE_METHODS = ('PUT', 'PATCH', 'DELETE')
+
+
+class PreconditionFailed(APIException):
+    status_code = status.HTTP_412_PRECONDITION_FAILED
+    default_detail = 'The resource has changed since it was fetched (If-Match failed).'
+    default_code = 'precondition_failed'
+
+
+class NotModified(Exception):
+    """Raised from ``initial`` to answer with a 304 instead of running the handler"""
+
+
+def _opaque(etag):
+    # Weak and strong forms of a tag compare equal; compression
+    # middleware weakens the tags it passes on
+    return etag[2:] if etag.startswith('W/') else etag
+
+
+def etag_matches(header, etag):
+    """Whether an If-None-Match or If-Match header lists ``etag`` (or is ``*``)"""
+    tags = parse_etags(header)
+    return '*' in tags or _opaque(etag) in {_opaque(tag) for tag in tags}
+
+
+class ConditionalGetMixin:
+    """ETag and Last-Modified validators for a viewset (see module docstring)"""
+    etag_fields = ('updated_at',)
+
+    def get_etag_fields(self, action=None):
+        fields = self.etag_fields
+        if isinstance(fields, dict):
+            fields = fields.get(action or self.action, fields.get('default', ('updated_at',)))
+        return fields
+
+    def etag_extra(self):
+        """Anything else the representation depends on, such as per-user state"""
+        return ()
+
+    def etag_aggregates(self):
+        """Further aggregates over the queryset to key the ETag on, by name"""
+        return {}
+
+    def version(self, queryset, fields):
+        """``(values, last_modified)`` for the rows of ``queryset`` and the relations in ``fields``"""
+        aggregates = {'rows': Count('pk', distinct=True)}
+        for i, field in enumerate(fields):
+            aggregates[f'newest_{i}'] = Max(field)
+            relation = field.rpartition('__')[0]
+            if relation:
+                aggregates[f'count_{i}'] = Count(relation, distinct=True)
+        aggregates.update(self.etag_aggregates())
+        values = queryset.order_by().aggregate(**aggregates)
+        timestamps = [values[f'newest_{i}'] for i in range(len(fields)) if values[f'newest_{i}'] is not None]
+        return values, max(timestamps, default=None)
+
+    def object_version(self, obj, fields):
+        """``version`` for one object; no query unless ``fields`` reach into related tables"""
+        if self.etag_aggregates() or any('__' in field for field in fields):
+            return self.version(self.get_queryset().filter(pk=obj.pk), fields)
+        values = {field: getattr(obj, field) for field in fields}
+        return values, max((value for value in values.values() if value is not None), default=None)
+
+    def make_etag(self, values, action=None):
+        request = self.request
+        key = '|'.join(str(part) for part in (
+            type(self).__name__,
+            action or self.action,
+            getattr(request.user, 'pk', None),
+            request.get_full_path(),
+            getattr(request, 'accepted_media_type', ''),
+            sorted(values.items()),
+            self.etag_extra(),
+        ))
+        return '"%s"' % hashlib.md5(key.encode(), usedforsecurity=False).hexdigest()
+
+    def get_object(self):
+        # The object read for the validators is reused by the handler
+        obj = getattr(self, '_conditional_object', None)
+        if obj is None:
+            obj = super().get_object()
+        return obj
+
+    def object_etag(self, obj):
+        """The ETag ``retrieve`` would send for ``obj``"""
+        values, last_modified = self.object_version(obj, self.get_etag_fields('retrieve'))
+        return self.make_etag(values, 'retrieve'), last_modified
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self._validators = None
+
+        if request.method in ('GET', 'HEAD') and self.action in CONDITIONAL_ACTIONS:
+            if self.action == 'list':
+                values, last_modified = self.version(self.filter_queryset(self.get_queryset()), self.get_etag_fields())
+                self._validators = (self.make_etag(values), last_modified)
+            else:
+                self._conditional_object = self.get_object()
+                self._validators = self.object_etag(self._conditional_object)
+            if_none_match = request.headers.get('If-None-Match')
+            if if_none_match and etag_matches(if_none_match, self._validators[0]):
+                raise NotModified()
+
+        elif request.method in WRITE_METHODS and self.lookup_url_kwarg_value() is not None:
+            if_match = request.headers.get('If-Match')
+            if if_match:
+                self._conditional_object = self.get_object()
+                if not etag_matches(if_match, self.object_etag(self._conditional_object)[0]):
+                    raise PreconditionFailed()
+
+    def lookup_url_kwarg_value(self):
+        return self.kwargs.get(self.lookup_url_kwarg or self.lookup_field)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            return Response(status=status.HTTP_304_NOT_MODIFIED)
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        validators = getattr(self, '_validators', None)
+        if validators is None and self.action in ('update', 'partial_update') and response.status_code == 200:
+            # The new ETag, for the client's next If-Match
+            lookup = self.lookup_url_kwarg_value()
+            obj = lookup is not None and self.get_queryset().filter(**{self.lookup_field: lookup}).first()
+            if obj:
+                validators = self.object_etag(obj)
+        if validators and response.status_code in (200, 304):
+            etag, last_modified = validators
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified.timestamp())
+            # Always ask before reusing a stored copy
+            response['Cache-Control'] = 'private, no-cache'
+        return response
@@ -0,0 +1,22 @@
+"""
+SQLite database backend tuned for serving concurrent requests.
+
+Use it with ``'ENGINE': 'projectmanagement.db'``. Compared to Django's
+plain ``sqlite3`` backend it:
+
+* applies the ``PRAGMAS`` from the database settings (WAL journal,
+  ``synchronous=NORMAL``, ``mmap_size``, ``cache_size``, ``temp_store``,
+  ``busy_timeout``) to every new connection,
+* opens transactions with ``BEGIN IMMEDIATE`` (``TRANSACTION_MODE``), so a
+  transaction that reads before it writes takes the write lock up front
+  instead of failing with "database is locked" when it tries to upgrade,
+* retries statements that start a transaction or run in autocommit when
+  SQLite still reports the database busy after ``busy_timeout``, up to
+  ``BUSY_RETRIES`` times with jittered exponential backoff.
+
+Persistent connections come from Django's own ``CONN_MAX_AGE`` and
+``CONN_HEALTH_CHECKS`` settings. An alias with ``POOL_SIZE`` also keeps up
+to that many idle connections when Django closes them, and hands them to
+the next thread that connects, so short-lived threads do not reopen the
+file every time.
+"""
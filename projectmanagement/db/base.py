@@ -0,0 +1,144 @@
+import random
+import re
+import threading
+import time
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base as sqlite3_base
+from django.db.backends.sqlite3.base import Database, SQLiteCursorWrapper
+
+# PRAGMA names and values are interpolated into SQL, so only plain
+# identifiers and integers are accepted
+_PRAGMA_NAME = re.compile(r'^[a-z_]+$')
+_PRAGMA_VALUE = re.compile(r'^(-?\d+|[A-Za-z_]+)$')
+
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+_stats_lock = threading.Lock()
+_stats = {'retries': 0, 'gave_up': 0}
+
+# Idle raw connections kept for reuse, per alias (see POOL_SIZE)
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def busy_stats():
+    """Busy retries and give-ups since the process started (or the last reset)"""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def reset_busy_stats():
+    with _stats_lock:
+        for key in _stats:
+            _stats[key] = 0
+
+
+def _count(key):
+    with _stats_lock:
+        _stats[key] += 1
+
+
+def is_busy_error(error):
+    message = str(error).lower()
+    return 'database is locked' in message or 'database is busy' in message
+
+
+class RetryingCursorWrapper(SQLiteCursorWrapper):
+    """
+    Retry a statement that found the database busy, if it is safe to run
+    again: outside a transaction (autocommit statements and ``BEGIN``).
+    Inside a transaction the whole transaction would have to be retried,
+    so the error is raised as usual.
+    """
+    retries = 0
+    backoff = 0.01
+    max_backoff = 0.5
+
+    def execute(self, query, params=None):
+        return self._retry(super().execute, query, params)
+
+    def executemany(self, query, param_list):
+        if self.retries and not self.connection.in_transaction:
+            # A generator can only be consumed once
+            param_list = list(param_list)
+        return self._retry(super().executemany, query, param_list)
+
+    def _retry(self, run, query, params):
+        if not self.retries or self.connection.in_transaction:
+            return run(query, params)
+        attempt = 0
+        while True:
+            try:
+                return run(query, params)
+            except Database.OperationalError as e:
+                if not is_busy_error(e) or attempt >= self.retries:
+                    if is_busy_error(e):
+                        _count('gave_up')
+                    raise
+            attempt += 1
+            _count('retries')
+            # Full jitter keeps competing writers from retrying in lockstep
+            delay = min(self.max_backoff, self.backoff * 2 ** attempt)
+            time.sleep(random.uniform(delay / 2, delay))
+
+
+class DatabaseWrapper(sqlite3_base.DatabaseWrapper):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pragmas = self._validated_pragmas(self.settings_dict.get('PRAGMAS') or {})
+        mode = self.settings_dict.get('TRANSACTION_MODE') or 'DEFERRED'
+        if mode.upper() not in TRANSACTION_MODES:
+            raise ImproperlyConfigured(
+                f"TRANSACTION_MODE must be one of {', '.join(TRANSACTION_MODES)}, not {mode!r}."
+            )
+        self.transaction_mode = mode.upper()
+        self.busy_retries = int(self.settings_dict.get('BUSY_RETRIES', 0))
+        self.busy_backoff = float(self.settings_dict.get('BUSY_BACKOFF', 0.01))
+        self.pool_size = int(self.settings_dict.get('POOL_SIZE', 0))
+
+    @staticmethod
+    def _validated_pragmas(pragmas):
+        for name, value in pragmas.items():
+            if not _PRAGMA_NAME.match(name) or not _PRAGMA_VALUE.match(str(value)):
+                raise ImproperlyConfigured(f"Invalid SQLite pragma {name!r} = {value!r}.")
+        return dict(pragmas)
+
+    def get_new_connection(self, conn_params):
+        if self.pool_size:
+            with _pools_lock:
+                idle = _pools.get(self.alias)
+                if idle:
+                    return idle.pop()
+        conn = super().get_new_connection(conn_params)
+        # busy_timeout first, so the journal mode switch waits for other writers
+        pragmas = sorted(self.pragmas.items(), key=lambda item: item[0] != 'busy_timeout')
+        for name, value in pragmas:
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _close(self):
+        # With a pool, closing hands the connection back for the next
+        # request instead of closing the file (Django's sqlite3 connections
+        # are created with check_same_thread=False, so any thread may reuse it)
+        if self.pool_size and self.connection is not None and not self.is_in_memory_db():
+            if self.connection.in_transaction:
+                self.connection.rollback()
+            with _pools_lock:
+                idle = _pools.setdefault(self.alias, [])
+                if len(idle) < self.pool_size:
+                    idle.append(self.connection)
+                    return
+        super()._close()
+
+    def create_cursor(self, name=None):
+        cursor = self.connection.cursor(factory=RetryingCursorWrapper)
+        cursor.retries = self.busy_retries
+        cursor.backoff = self.busy_backoff
+        return cursor
+
+    def _start_transaction_under_autocommit(self):
+        if self.transaction_mode == 'DEFERRED':
+            self.cursor().execute('BEGIN')
+        else:
+            self.cursor().execute(f'BEGIN {self.transaction_mode}')
@@ -0,0 +1,229 @@
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test.utils import override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from organizations.models import Organization
+from projectmanagement.metrics import QueryTimer, observe_queries
+from projectmanagement.ratelimit import get_limiter
+from projects.models import Board, Column, Project, ProjectMember
+from tasks.models import Task
+
+
+def scenarios(project, board, columns, task):
+    """
+    ``{name: [(method, path, data), ...]}``; every request of a scenario
+    together is one sample, the way a page load is
+    """
+    project_url = f'/api/v1/projects/{project.id}'
+    board_url = f'{project_url}/boards/{board.id}'
+    metrics_url = f'/api/v1/analytics/projects/{project.id}/metrics'
+    return {
+        'task_list': [('get', f'{project_url}/tasks/', None)],
+        'task_detail': [('get', f'/api/v1/tasks/{task.id}/', None)],
+        'board_load': [('get', f'{board_url}/', None), ('get', f'{board_url}/columns/', None)] + [
+            ('get', f'{board_url}/columns/{column.id}/tasks/', None) for column in columns
+        ],
+        'board_snapshot': [('get', f'{board_url}/snapshot/', None)],
+        'task_move': 'move',
+        'analytics_summary': [('get', f'{metrics_url}/summary/', None)],
+        'analytics_task_distribution': [('get', f'{metrics_url}/task-distribution/', None)],
+        'analytics_burndown': [('get', f'{metrics_url}/burndown/', None)],
+        'analytics_rankings': [('get', f'/api/v1/analytics/projects/{project.id}/productivity/rankings/', None)],
+        'dashboard': [('get', '/api/v1/analytics/boards/recent/', None), ('get', '/api/v1/analytics/tasks/upcoming/', None)],
+        'activity_feed': [('get', '/api/v1/activity-logs/', None)],
+        'notifications_list': [('get', '/api/v1/notifications/', None)],
+        'notifications_unread_count': [('get', '/api/v1/notifications/unread_count/', None)],
+    }
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, timeout=5,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Time the hot API endpoints (task list, board load, task move, analytics, '
+        'notifications) through the full middleware stack against a seed_bench '
+        'dataset, and report latency percentiles and query counts as JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20, help='Timed samples per scenario (default: 20)')
+        parser.add_argument('--warmup', type=int, default=3, help='Untimed samples first (default: 3)')
+        parser.add_argument('--prefix', default='bench', help='Prefix of the seed_bench dataset (default: bench)')
+        parser.add_argument('--project', help='Benchmark this project instead of the first seeded one')
+        parser.add_argument(
+            '--only', action='append', default=[], metavar='SCENARIO',
+            help='Run only this scenario; may be repeated',
+        )
+        parser.add_argument('--output', help='Also write the JSON results to this file')
+        parser.add_argument('--compare', help='Print the change against the JSON results of an earlier run')
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON')
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1 or options['warmup'] < 0:
+            raise CommandError('--iterations must be at least 1 and --warmup cannot be negative')
+        project = self.target_project(options)
+        board = Board.objects.filter(project=project).order_by('-is_default', 'created_at').first()
+        columns = list(Column.objects.filter(board=board)) if board else []
+        if len(columns) < 2:
+            raise CommandError(f"Project {project.id} needs a board with at least two columns")
+        task = Task.objects.filter(column=columns[0]).order_by('order').first()
+        if task is None:
+            raise CommandError(f"Column {columns[0].id} has no tasks to benchmark with")
+        members = ProjectMember.objects.filter(project=project).select_related('user')
+        member = members.filter(role__in=[ProjectMember.OWNER, ProjectMember.ADMIN]).first() or members.first()
+        if member is None:
+            raise CommandError(f"Project {project.id} has no members to benchmark as")
+
+        plans = scenarios(project, board, columns, task)
+        unknown = set(options['only']) - set(plans)
+        if unknown:
+            raise CommandError(f"Unknown scenarios: {', '.join(sorted(unknown))}; pick from {', '.join(plans)}")
+        names = options['only'] or list(plans)
+
+        # Rate limits and metrics go to scratch files, so the benchmark
+        # neither throttles itself nor shows up in the real numbers, and
+        # any mail the views send stays in memory
+        with tempfile.TemporaryDirectory() as directory, override_settings(
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+            EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+            RATE_LIMIT_DB_PATH=os.path.join(directory, 'ratelimit.sqlite3'),
+            METRICS_DB_PATH=os.path.join(directory, 'metrics.sqlite3'),
+            QUERY_BUDGET_RAISE=False,
+        ):
+            client = APIClient()
+            client.force_login(member.user)
+            results = [self.run_scenario(client, name, plans[name], task, columns, options) for name in names]
+
+        report = {
+            'meta': {
+                'started_at': timezone.now().isoformat(),
+                'revision': git_revision(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connections['default'].vendor,
+                'project': str(project.id),
+                'user': str(member.user_id),
+                'dataset': {
+                    'projects': Project.objects.count(),
+                    'tasks': Task.objects.count(),
+                    'project_tasks': Task.objects.filter(column__board__project=project).count(),
+                },
+                'iterations': options['iterations'],
+                'warmup': options['warmup'],
+            },
+            'results': results,
+        }
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            self.print_table(results, self.load(options['compare']) if options['compare'] else None)
+
+    def target_project(self, options):
+        if options['project']:
+            project = Project.objects.filter(id=options['project']).first()
+            if project is None:
+                raise CommandError(f"No project {options['project']}")
+            return project
+        organization = Organization.objects.filter(name__startswith=f"{options['prefix']} ").order_by('name').first()
+        project = organization and Project.objects.filter(organization=organization).order_by('slug').first()
+        if project is None:
+            raise CommandError(f"No '{options['prefix']}' dataset found; run seed_bench first or pass --project")
+        return project
+
+    def run_scenario(self, client, name, plan, task, columns, options):
+        durations, queries, query_seconds, statuses = [], [], [], {}
+        for sample in range(options['warmup'] + options['iterations'] + (plan == 'move')):
+            if plan == 'move':
+                # Back and forth between the first two columns; the extra
+                # last move puts the task back where it started
+                requests = [self.move_request(task, columns[(sample + 1) % 2])]
+                if sample == options['warmup'] + options['iterations']:
+                    if sample % 2:
+                        client.patch(*requests[0][1:], format='json')
+                    break
+            else:
+                requests = plan
+            get_limiter().reset()
+
+            with observe_queries(QueryTimer()) as timer:
+                start = time.perf_counter()
+                responses = [getattr(client, method)(path, data, format='json') for method, path, data in requests]
+                elapsed = time.perf_counter() - start
+
+            if sample < options['warmup']:
+                continue
+            durations.append(elapsed * 1000)
+            queries.append(timer.queries)
+            query_seconds.append(timer.seconds * 1000)
+            for response in responses:
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        return {
+            'name': name,
+            'requests_per_sample': len(requests),
+            'samples': len(durations),
+            'mean_ms': statistics.fmean(durations),
+            'p50_ms': percentile(durations, 0.5),
+            'p95_ms': percentile(durations, 0.95),
+            'p99_ms': percentile(durations, 0.99),
+            'min_ms': min(durations),
+            'max_ms': max(durations),
+            'queries': statistics.median(queries),
+            'query_ms': statistics.median(query_seconds),
+            'statuses': {str(code): count for code, count in sorted(statuses.items())},
+            'errors': sum(count for code, count in statuses.items() if code >= 400),
+        }
+
+    def move_request(self, task, destination):
+        return ('patch', f'/api/v1/tasks/{task.id}/', {'column': str(destination.id), 'order': 0})
+
+    def load(self, path):
+        try:
+            with open(path) as f:
+                return {result['name']: result for result in json.load(f)['results']}
+        except (OSError, ValueError, KeyError) as e:
+            raise CommandError(f"Could not read the results in {path}: {e}")
+
+    def print_table(self, results, baseline=None):
+        header = f"{'scenario':<30}{'p50 ms':>9}{'p95 ms':>9}{'max ms':>9}{'queries':>9}{'errors':>8}"
+        if baseline is not None:
+            header += f"{'p50 change':>12}{'queries was':>13}"
+        self.stdout.write(header)
+        for result in results:
+            line = (
+                f"{result['name']:<30}{result['p50_ms']:>9.2f}{result['p95_ms']:>9.2f}{result['max_ms']:>9.2f}"
+                f"{result['queries']:>9g}{result['errors']:>8}"
+            )
+            before = (baseline or {}).get(result['name'])
+            if before:
+                change = (result['p50_ms'] - before['p50_ms']) / before['p50_ms'] if before['p50_ms'] else 0
+                line += f"{change:>+12.1%}{before['queries']:>13g}"
+            self.stdout.write(line)
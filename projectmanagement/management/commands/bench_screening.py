@@ -0,0 +1,97 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+
+from projectmanagement.screening import get_screen
+
+# The substring screening SecurityMiddleware used before
+# projectmanagement.screening, kept here as the baseline
+LEGACY_PATTERNS = [
+    '../', '..\\', '.env', 'wp-admin', 'phpinfo',
+    '<script', 'javascript:', 'vbscript:', 'onload=',
+    'eval(', 'exec(', '__import__', 'system(',
+    'DROP TABLE', 'SELECT * FROM', 'UNION SELECT'
+]
+
+
+def legacy_check(request):
+    request_data = (
+        request.path.lower() +
+        request.META.get('QUERY_STRING', '').lower() +
+        request.META.get('HTTP_USER_AGENT', '').lower()
+    )
+    for pattern in LEGACY_PATTERNS:
+        if pattern in request_data:
+            return True
+    if len(request.build_absolute_uri()) > 2048:
+        return True
+    if len(request.GET) > 50 or len(request.POST) > 100:
+        return True
+    return False
+
+
+USER_AGENT = (
+    'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) '
+    'Chrome/126.0.0.0 Safari/537.36'
+)
+
+
+def sample_requests(factory):
+    """A mix of ordinary traffic and a few attacks"""
+    return [
+        factory.get('/api/v1/tasks/', {'board': '3', 'ordering': '-updated_at', 'page': '2'}, HTTP_USER_AGENT=USER_AGENT),
+        factory.get('/projects/3f2b6a4e-8c1d-4d2a-9e7f-0a1b2c3d4e5f/', HTTP_USER_AGENT=USER_AGENT),
+        factory.get('/api/v1/users/autocomplete/', {'q': 'mart', 'limit': '10'}, HTTP_USER_AGENT=USER_AGENT),
+        factory.post('/api/v1/tasks/', {'title': 'Write the report', 'description': 'x' * 200}, HTTP_USER_AGENT=USER_AGENT),
+        factory.get('/static/css/style.css', HTTP_USER_AGENT=USER_AGENT),
+        factory.get('/dashboard/', HTTP_USER_AGENT=USER_AGENT),
+        factory.get('/api/v1/tasks/', HTTP_USER_AGENT="' UNION SELECT password FROM users_user --"),
+        factory.get('/../../etc/passwd', HTTP_USER_AGENT=USER_AGENT),
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        'Time the request screening in SecurityMiddleware against the substring '
+        'matching it replaced, on a mix of synthetic requests'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20000, help='Passes over the request mix (default: 20000)')
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON')
+
+    def handle(self, *args, **options):
+        requests = sample_requests(RequestFactory())
+        screen = get_screen()
+        results = [
+            self.run('legacy', legacy_check, requests, options['iterations']),
+            self.run('compiled', screen.check, requests, options['iterations']),
+        ]
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write(f"{options['iterations']} x {len(requests)} requests")
+        self.stdout.write(f"{'engine':<10}{'us/request':>12}{'blocked':>9}")
+        for result in results:
+            self.stdout.write(f"{result['engine']:<10}{result['us_per_request']:>12.2f}{result['blocked']:>9}")
+
+    def run(self, engine, check, requests, iterations):
+        # Parse the bodies and query strings up front: the views would do it
+        # anyway, so only the screening itself is timed
+        for request in requests:
+            request.GET, request.POST
+        blocked = sum(1 for request in requests if check(request))
+        start = time.perf_counter()
+        for _ in range(iterations):
+            for request in requests:
+                check(request)
+        elapsed = time.perf_counter() - start
+        return {
+            'engine': engine,
+            'requests': iterations * len(requests),
+            'us_per_request': elapsed / (iterations * len(requests)) * 1e6,
+            'blocked': blocked,
+        }
@@ -0,0 +1,345 @@
+import json
+import random
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.contrib.contenttypes.models import ContentType
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import override_settings
+from django.utils import timezone
+
+from activitylogs.models import ActivityLog
+from analytics.models import ActivityLog as AnalyticsActivityLog, ProjectMetric
+from notifications.models import Notification, NotificationReadState
+from organizations.models import Organization, OrganizationMember
+from projects.deletion import process_pending, schedule_deletion
+from projects.models import Board, Column, Project, ProjectMember
+from tasks.models import Comment, Label, Task
+from users.models import UserPreference, UserSearchTerm
+from users.search import search_terms
+
+User = get_user_model()
+
+# Per organization, except ``orgs``. Tasks, comments and activities are per
+# column, task and task respectively, so large is about 2.5M rows
+SCALES = {
+    'small': {
+        'orgs': 1, 'users': 20, 'projects': 2, 'boards': 1, 'columns': 5, 'tasks': 20,
+        'comments': 2, 'labels': 6, 'activities': 3, 'notifications': 20,
+    },
+    'medium': {
+        'orgs': 5, 'users': 50, 'projects': 5, 'boards': 2, 'columns': 5, 'tasks': 40,
+        'comments': 2, 'labels': 8, 'activities': 3, 'notifications': 50,
+    },
+    'large': {
+        'orgs': 20, 'users': 100, 'projects': 10, 'boards': 2, 'columns': 5, 'tasks': 100,
+        'comments': 2, 'labels': 10, 'activities': 3, 'notifications': 100,
+    },
+    'xlarge': {
+        'orgs': 50, 'users': 200, 'projects': 20, 'boards': 2, 'columns': 6, 'tasks': 150,
+        'comments': 2, 'labels': 12, 'activities': 3, 'notifications': 200,
+    },
+}
+
+COLUMN_NAMES = ['Backlog', 'To Do', 'In Progress', 'Review', 'Done', 'Blocked', 'Icebox', 'Archive']
+FIRST_NAMES = ['Ana', 'Ben', 'Chloé', 'Dev', 'Elif', 'Farah', 'Goran', 'Hiro', 'Ines', 'Jonas', 'Kofi', 'Lena', 'Mateo', 'Nia', 'Omar', 'Priya']
+LAST_NAMES = ['Adams', 'Brandt', 'Chen', 'Dubois', 'Eze', 'Fischer', 'García', 'Haddad', 'Ivanova', 'Jensen', 'Kowalski', 'Larsen', 'Moreau', 'Nakamura']
+WORDS = [
+    'api', 'billing', 'cache', 'dashboard', 'export', 'filter', 'login', 'mobile', 'onboarding',
+    'payments', 'report', 'search', 'settings', 'signup', 'sync', 'upload', 'webhook', 'widget',
+]
+VERBS = ['Fix', 'Add', 'Refactor', 'Document', 'Test', 'Speed up', 'Redesign', 'Review']
+LABEL_COLORS = ['#e11d48', '#f97316', '#eab308', '#22c55e', '#06b6d4', '#3b82f6', '#8b5cf6', '#64748b']
+
+# Insert order, so every row's foreign keys are already in the table
+INSERT_ORDER = [
+    User, UserPreference, UserSearchTerm, OrganizationMember, Project, ProjectMember, Label,
+    Board, Column, Task, Task.assignees.through, Task.labels.through, Comment,
+    ActivityLog, AnalyticsActivityLog, ProjectMetric, Notification,
+]
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    """Let bulk_create keep the timestamps set on the objects instead of now()"""
+    fields = [
+        field for model in models for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Rows:
+    """Objects waiting to be bulk inserted, written whenever ``batch_size`` pile up"""
+
+    def __init__(self, batch_size):
+        self.batch_size = batch_size
+        self.pending = {model: [] for model in INSERT_ORDER}
+        self.size = 0
+        self.counts = {model._meta.label: 0 for model in INSERT_ORDER}
+
+    def add(self, obj):
+        self.pending[type(obj)].append(obj)
+        self.size += 1
+        if self.size >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        for model in INSERT_ORDER:
+            objs = self.pending[model]
+            if objs:
+                model.objects.bulk_create(objs, batch_size=self.batch_size)
+                self.counts[model._meta.label] += len(objs)
+                self.pending[model] = []
+        self.size = 0
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate a synthetic dataset of organizations, projects, boards, tasks, '
+        'comments, activity and notifications for benchmarking (see the bench command)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=list(SCALES), default='small', help='Dataset size preset (default: small)')
+        for name, help_text in [
+            ('orgs', 'Organizations'),
+            ('users', 'Users per organization'),
+            ('projects', 'Projects per organization'),
+            ('boards', 'Boards per project'),
+            ('columns', 'Columns per board'),
+            ('tasks', 'Tasks per column'),
+            ('comments', 'Average comments per task'),
+            ('labels', 'Labels per project'),
+            ('activities', 'Activity log entries per task'),
+            ('notifications', 'Notifications per user'),
+        ]:
+            parser.add_argument(f'--{name}', type=int, help=f'{help_text} (overrides the preset)')
+        parser.add_argument('--days', type=int, default=90, help='Spread timestamps over the last N days (default: 90)')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed, for repeatable datasets (default: 0)')
+        parser.add_argument('--prefix', default='bench', help='Prefix of the generated names and emails (default: bench)')
+        parser.add_argument('--password', default='bench-password', help='Password of every generated user')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per INSERT (default: 5000)')
+        parser.add_argument('--flush', action='store_true', help='Delete a dataset with the same prefix first')
+        parser.add_argument('--skip-feeds', action='store_true', help='Do not rebuild the activity feeds afterwards')
+        parser.add_argument('--json', action='store_true', help='Print the row counts as JSON')
+
+    def handle(self, *args, **options):
+        config = dict(SCALES[options['scale']])
+        config.update({name: options[name] for name in config if options[name] is not None})
+        if any(value < 0 for value in config.values()) or config['users'] < 1:
+            raise CommandError('Counts cannot be negative, and every organization needs a user')
+
+        prefix = options['prefix']
+        existing = Organization.objects.filter(name__startswith=f'{prefix} ')
+        if existing.exists():
+            if not options['flush']:
+                raise CommandError(f"A '{prefix}' dataset already exists; pass --flush to replace it or pick another --prefix")
+            self.progress(options, f"Deleting the existing '{prefix}' dataset...")
+            self.delete_dataset(prefix)
+
+        start = time.perf_counter()
+        self.rng = random.Random(options['seed'])
+        self.now = timezone.now()
+        self.days = max(options['days'], 1)
+        self.prefix = prefix
+        self.password = make_password(options['password'])
+        self.task_type = ContentType.objects.get_for_model(Task)
+        rows = Rows(options['batch_size'])
+        self.entity_ids = iter(range(1, 2 ** 31))
+
+        user_ids = []
+        timestamped = (Project, Board, Column, Task, Comment, ActivityLog, AnalyticsActivityLog, Notification)
+        for org_number in range(config['orgs']):
+            with transaction.atomic():
+                # Organizations go in one at a time: their signal handlers
+                # log the creation, which bulk_create would skip
+                organization = Organization.objects.create(name=f'{prefix} {org_number} {self.rng.choice(WORDS).title()} Inc')
+                with explicit_timestamps(*timestamped):
+                    user_ids.extend(self.seed_organization(rows, organization, org_number, config))
+                    rows.flush()
+            self.progress(options, f'Organization {org_number + 1}/{config["orgs"]} done')
+
+        NotificationReadState._initialise(user_ids)
+        if not options['skip_feeds']:
+            call_command('rebuild_activity_feeds', days=self.days, stdout=StringIO())
+
+        counts = {label: count for label, count in rows.counts.items() if count}
+        counts['organizations.Organization'] = config['orgs']
+        elapsed = time.perf_counter() - start
+        if options['json']:
+            self.stdout.write(json.dumps({'scale': options['scale'], 'config': config, 'rows': counts, 'seconds': elapsed}, indent=2))
+            return
+        for label, count in counts.items():
+            self.stdout.write(f'{label:<32}{count:>12,}')
+        self.stdout.write(self.style.SUCCESS(f'Seeded {sum(counts.values()):,} rows in {elapsed:.1f}s'))
+
+    def progress(self, options, message):
+        if not options['json']:
+            self.stdout.write(message)
+
+    def delete_dataset(self, prefix):
+        # The way the API deletes them, in chunks without per-row signals,
+        # but here and now instead of in the background worker
+        with override_settings(DELETION_BACKGROUND_WORKER=False):
+            for organization in Organization.objects.filter(name__startswith=f'{prefix} '):
+                schedule_deletion(organization)
+        process_pending()
+        User.objects.filter(email__startswith=f'{prefix}-', email__endswith='@bench.example.com').delete()
+
+    def when(self, after=None):
+        """A random moment in the last ``days`` days, and after ``after`` if given"""
+        earliest = after or self.now - timedelta(days=self.days)
+        return earliest + (self.now - earliest) * self.rng.random()
+
+    def seed_organization(self, rows, organization, org_number, config):
+        rng = self.rng
+        users = []
+        for number in range(config['users']):
+            first_name, last_name = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+            username = f'{self.prefix}-{org_number}-{number}'
+            user = User(
+                id=uuid.uuid4(), username=username, email=f'{username}@bench.example.com', password=self.password,
+                first_name=first_name, last_name=last_name, date_joined=self.when(),
+            )
+            users.append(user)
+            rows.add(user)
+            rows.add(UserPreference(user=user))
+            for term in search_terms(first_name, last_name, username, user.email):
+                rows.add(UserSearchTerm(user=user, term=term))
+            rows.add(OrganizationMember(
+                organization=organization, user=user,
+                role=OrganizationMember.ADMIN if number == 0 else OrganizationMember.MEMBER,
+            ))
+            for _ in range(config['notifications']):
+                created_at = self.when()
+                read = rng.random() < 0.7
+                rows.add(Notification(
+                    recipient=user, notification_type=rng.choice(Notification.NOTIFICATION_TYPES)[0],
+                    title=f'{rng.choice(VERBS)} {rng.choice(WORDS)}', message='Generated by seed_bench',
+                    created_at=created_at, read=read, read_at=self.when(created_at) if read else None,
+                ))
+
+        for project_number in range(config['projects']):
+            self.seed_project(rows, organization, users, org_number, project_number, config)
+        return [user.id for user in users]
+
+    def seed_project(self, rows, organization, users, org_number, project_number, config):
+        rng = self.rng
+        created_at = self.when()
+        project = Project(
+            id=uuid.uuid4(), name=f'{self.prefix} {org_number}-{project_number} {rng.choice(WORDS).title()}',
+            slug=f'{self.prefix}-{org_number}-{project_number}', organization=organization,
+            created_by=users[0] if users else None, created_at=created_at, updated_at=created_at,
+        )
+        rows.add(project)
+        # The organization admin and about half of everyone else
+        members = [user for number, user in enumerate(users) if number == 0 or rng.random() < 0.5]
+        for user in members:
+            rows.add(ProjectMember(
+                project=project, user=user,
+                role=ProjectMember.ADMIN if user is users[0] else ProjectMember.MEMBER,
+            ))
+        labels = [
+            Label(id=uuid.uuid4(), name=f'{rng.choice(WORDS)} {number}', color=LABEL_COLORS[number % len(LABEL_COLORS)], project=project)
+            for number in range(config['labels'])
+        ]
+        for label in labels:
+            rows.add(label)
+
+        for board_number in range(config['boards']):
+            board = Board(
+                id=uuid.uuid4(), name=f'Board {board_number + 1}', project=project, created_by=project.created_by,
+                is_default=board_number == 0, created_at=created_at, updated_at=created_at,
+            )
+            rows.add(board)
+            columns = []
+            for order in range(config['columns']):
+                name = COLUMN_NAMES[order % len(COLUMN_NAMES)]
+                if order >= len(COLUMN_NAMES):
+                    name = f'{name} {order // len(COLUMN_NAMES) + 1}'
+                column = Column(id=uuid.uuid4(), name=name, board=board, order=order, created_at=created_at, updated_at=created_at)
+                columns.append(column)
+                rows.add(column)
+            for column in columns:
+                for order in range(config['tasks']):
+                    self.seed_task(rows, project, column, columns, order, members, labels, config)
+
+        self.seed_metrics(rows, project)
+
+    def seed_task(self, rows, project, column, columns, order, members, labels, config):
+        rng = self.rng
+        created_at = self.when(project.created_at)
+        title = f'{rng.choice(VERBS)} {rng.choice(WORDS)} {rng.choice(WORDS)}'
+        author = rng.choice(members)
+        task = Task(
+            id=uuid.uuid4(), title=title, description=f'{title}.\n\nGenerated by seed_bench.',
+            column=column, order=order, created_by=author, created_at=created_at, updated_at=self.when(created_at),
+            due_date=self.now + timedelta(days=rng.uniform(-self.days / 4, self.days / 2)) if rng.random() < 0.6 else None,
+            priority=rng.choice(Task.PRIORITY_CHOICES)[0],
+            estimated_hours=Decimal(rng.randint(1, 40)) if rng.random() < 0.5 else None,
+        )
+        rows.add(task)
+        for user in rng.sample(members, min(len(members), rng.randint(0, 2))):
+            rows.add(Task.assignees.through(task_id=task.id, user_id=user.id))
+        for label in rng.sample(labels, min(len(labels), rng.randint(0, 2))):
+            rows.add(Task.labels.through(task_id=task.id, label_id=label.id))
+
+        for _ in range(rng.randint(0, 2 * config['comments'])):
+            commented_at = self.when(created_at)
+            rows.add(Comment(
+                task=task, author=rng.choice(members), content=f'Looked at the {rng.choice(WORDS)} part.',
+                created_at=commented_at, updated_at=commented_at,
+            ))
+
+        events = [(ActivityLog.CREATED, AnalyticsActivityLog.CREATE, created_at)]
+        for _ in range(config['activities'] - 1):
+            events.append((
+                rng.choice([ActivityLog.UPDATED, ActivityLog.MOVED, ActivityLog.COMMENTED]), None, self.when(created_at)
+            ))
+        for action_type, analytics_type, timestamp in events[:config['activities']]:
+            user = rng.choice(members)
+            destination = rng.choice(columns)
+            rows.add(ActivityLog(
+                user=user, action_type=action_type, timestamp=timestamp, content_type=self.task_type,
+                object_id=task.id, description=f"{action_type.capitalize()} task '{title}'", project_id=project.id,
+            ))
+            analytics_type = analytics_type or {
+                ActivityLog.UPDATED: AnalyticsActivityLog.UPDATE,
+                ActivityLog.MOVED: AnalyticsActivityLog.MOVE,
+                ActivityLog.COMMENTED: AnalyticsActivityLog.COMMENT,
+            }[action_type]
+            rows.add(AnalyticsActivityLog(
+                user=user, organization_id=project.organization_id, project=project, action_type=analytics_type,
+                entity_type=AnalyticsActivityLog.TASK, entity_id=next(self.entity_ids), entity_name=title,
+                details={'destination_column': str(destination.id)} if analytics_type == AnalyticsActivityLog.MOVE else None,
+                timestamp=timestamp,
+            ))
+
+    def seed_metrics(self, rows, project):
+        """A daily ProjectMetric row, trending the way a busy project does"""
+        total = self.rng.randint(20, 200)
+        today = self.now.date()
+        for age in range(min(self.days, (self.now - project.created_at).days + 1), 0, -1):
+            total += self.rng.randint(0, 5)
+            completed = int(total * (1 - age / (self.days + 1)) * self.rng.uniform(0.6, 0.9))
+            rows.add(ProjectMetric(
+                project=project, date=today - timedelta(days=age - 1), tasks_total=total, tasks_completed=completed,
+                tasks_in_progress=(total - completed) // 3, tasks_overdue=self.rng.randint(0, (total - completed) // 5 + 1),
+                active_users=self.rng.randint(1, 10),
+            ))
@@ -0,0 +1,153 @@
+import json
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections, transaction
+
+from projectmanagement.db.base import busy_stats, reset_busy_stats
+
+COUNTERS = 100
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare write contention on SQLite between the plain sqlite3 backend '
+        '(rollback journal, a new connection per request) and the tuned '
+        'projectmanagement.db backend, using scratch database files'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8, help='Concurrent workers (default: 8)')
+        parser.add_argument('--requests', type=int, default=200, help='Requests per worker (default: 200)')
+        parser.add_argument(
+            '--read-ratio',
+            type=float,
+            default=0.5,
+            help='Share of requests that only read (default: 0.5)',
+        )
+        parser.add_argument(
+            '--mode',
+            choices=['baseline', 'tuned', 'both'],
+            default='both',
+            help='Which backend configuration to run (default: both)',
+        )
+        parser.add_argument('--json', action='store_true', help='Print the results as JSON')
+
+    def handle(self, *args, **options):
+        modes = ['baseline', 'tuned'] if options['mode'] == 'both' else [options['mode']]
+        results = []
+        with tempfile.TemporaryDirectory() as directory:
+            for mode in modes:
+                path = os.path.join(directory, f'{mode}.sqlite3')
+                results.append(self.run_mode(mode, path, options))
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write(
+            f"{options['threads']} threads x {options['requests']} requests, "
+            f"{options['read_ratio']:.0%} read-only"
+        )
+        self.stdout.write(
+            f"{'mode':<10}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}{'retries':>9}"
+        )
+        for result in results:
+            self.stdout.write(
+                f"{result['mode']:<10}{result['throughput']:>10.0f}{result['p50_ms']:>10.2f}"
+                f"{result['p95_ms']:>10.2f}{result['p99_ms']:>10.2f}{result['errors']:>8}{result['retries']:>9}"
+            )
+
+    def database_settings(self, mode, path):
+        if mode == 'baseline':
+            database = {'ENGINE': 'django.db.backends.sqlite3', 'NAME': path, 'CONN_MAX_AGE': 0}
+        else:
+            database = dict(settings.DATABASES[DEFAULT_DB_ALIAS], NAME=path, CONN_MAX_AGE=None)
+            database['ENGINE'] = 'projectmanagement.db'
+        # Let Django fill in the remaining defaults the same way it does at startup
+        return connections.configure_settings({DEFAULT_DB_ALIAS: database})[DEFAULT_DB_ALIAS]
+
+    def run_mode(self, mode, path, options):
+        alias = f'contention_bench_{mode}'
+        connections.settings[alias] = self.database_settings(mode, path)
+        try:
+            self.create_schema(alias)
+            reset_busy_stats()
+            latencies = []
+            errors = []
+            lock = threading.Lock()
+
+            def worker(seed):
+                rng = random.Random(seed)
+                mine, failed = [], 0
+                try:
+                    for _ in range(options['requests']):
+                        started = time.perf_counter()
+                        try:
+                            self.request(alias, rng, options['read_ratio'])
+                        except OperationalError:
+                            failed += 1
+                        mine.append(time.perf_counter() - started)
+                        # What request_finished does: drop the connection
+                        # unless CONN_MAX_AGE keeps it
+                        connections[alias].close_if_unusable_or_obsolete()
+                finally:
+                    connections[alias].close()
+                with lock:
+                    latencies.extend(mine)
+                    errors.append(failed)
+
+            threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(options['threads'])]
+            started = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - started
+        finally:
+            connections[alias].close()
+            del connections.settings[alias]
+
+        quantiles = statistics.quantiles(latencies, n=100)
+        return {
+            'mode': mode,
+            'requests': len(latencies),
+            'seconds': round(elapsed, 3),
+            'throughput': len(latencies) / elapsed,
+            'p50_ms': quantiles[49] * 1000,
+            'p95_ms': quantiles[94] * 1000,
+            'p99_ms': quantiles[98] * 1000,
+            'errors': sum(errors),
+            'retries': busy_stats()['retries'] if mode == 'tuned' else 0,
+        }
+
+    def create_schema(self, alias):
+        with connections[alias].cursor() as cursor:
+            cursor.execute('CREATE TABLE counter (id INTEGER PRIMARY KEY, value INTEGER NOT NULL)')
+            cursor.execute(
+                'CREATE TABLE event (id INTEGER PRIMARY KEY AUTOINCREMENT, '
+                'counter_id INTEGER NOT NULL, created REAL NOT NULL)'
+            )
+            cursor.execute('CREATE INDEX event_counter ON event (counter_id)')
+            cursor.executemany('INSERT INTO counter (id, value) VALUES (%s, 0)', [(i,) for i in range(COUNTERS)])
+        connections[alias].close()
+
+    def request(self, alias, rng, read_ratio):
+        counter_id = rng.randrange(COUNTERS)
+        with connections[alias].cursor() as cursor:
+            if rng.random() < read_ratio:
+                cursor.execute('SELECT COUNT(*) FROM event WHERE counter_id = %s', [counter_id])
+                cursor.fetchone()
+                return
+        # A typical write: read the row, then change it, in one transaction
+        with transaction.atomic(using=alias):
+            with connections[alias].cursor() as cursor:
+                cursor.execute('SELECT value FROM counter WHERE id = %s', [counter_id])
+                cursor.fetchone()
+                cursor.execute('UPDATE counter SET value = value + 1 WHERE id = %s', [counter_id])
+                cursor.execute('INSERT INTO event (counter_id, created) VALUES (%s, %s)', [counter_id, time.time()])
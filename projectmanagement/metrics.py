@@ -0,0 +1,332 @@
+"""
+Request and signal-handler metrics, shared by every worker process.
+
+MetricsMiddleware records, per view and method, the response count by
+status, a latency histogram, the number and time of database queries and
+the response size; ``timed_handler`` records how long signal receivers
+take. Each process adds up its samples in memory and every
+METRICS_FLUSH_INTERVAL seconds adds them to a SQLite side file next to
+the database (``metrics.sqlite3``, like the rate limiter's), so the
+totals cover all gunicorn workers on the host. The session store and
+SQLite busy-retry counters of each process are carried over at flush
+time as well.
+
+``/api/v1/_metrics`` (staff users, or a bearer METRICS_TOKEN for a
+scraper) renders the totals in the Prometheus text format.
+"""
+import bisect
+import functools
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from .db.base import busy_stats
+from .ratelimit import default_path
+from .sessions import session_stats
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+METHODS = ('GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS')
+
+# name: (type, help), in the order they are rendered
+FAMILIES = {
+    'pm_http_requests_total': ('counter', 'Responses by view, method and status'),
+    'pm_http_request_duration_seconds': ('histogram', 'Time spent in the middleware stack and view'),
+    'pm_http_db_queries_total': ('counter', 'Database queries run while handling requests'),
+    'pm_http_db_query_seconds_total': ('counter', 'Time spent in database queries while handling requests'),
+    'pm_http_response_bytes_total': ('counter', 'Response body bytes (streaming responses are not counted)'),
+    'pm_signal_handler_duration_seconds': ('histogram', 'Time spent in signal receivers'),
+    'pm_session_events_total': ('counter', 'Session store cache hits, misses, writes and skipped touches'),
+    'pm_sqlite_busy_total': ('counter', 'SQLite statements retried after finding the database busy, or given up'),
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sample (
+    name TEXT NOT NULL,
+    labels TEXT NOT NULL,
+    le TEXT NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (name, labels, le)
+) WITHOUT ROWID
+"""
+
+_ADD = """
+INSERT INTO sample (name, labels, le, value) VALUES (?, ?, ?, ?)
+ON CONFLICT (name, labels, le) DO UPDATE SET value = value + excluded.value
+"""
+
+
+def labels_text(**labels):
+    """``view="task-list",method="GET"``, escaped for the text format"""
+    return ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels.items()
+    )
+
+
+def _format_value(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _process_counters():
+    counters = {('pm_session_events_total', labels_text(event=event)): value for event, value in session_stats().items()}
+    counters.update(
+        {('pm_sqlite_busy_total', labels_text(outcome=outcome)): value for outcome, value in busy_stats().items()}
+    )
+    return counters
+
+
+class MetricsRegistry:
+    """In-process samples, flushed into the side file at ``path``"""
+
+    def __init__(self, path, flush_interval=10, buckets=DEFAULT_BUCKETS):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.buckets = tuple(sorted(buckets))
+        self._bucket_labels = tuple(_format_value(bound) for bound in self.buckets) + ('+Inf',)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._pending = defaultdict(float)
+        self._last_flush = time.monotonic()
+        # Process-wide counters as last carried over
+        self._carried = {}
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False, uri=True)
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.execute('PRAGMA synchronous = OFF')
+            conn.execute(_SCHEMA)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def inc(self, name, labels, value=1):
+        with self._lock:
+            self._pending[(name, labels, '')] += value
+        self.maybe_flush()
+
+    def observe(self, name, labels, value):
+        """Add ``value`` to the ``name`` histogram"""
+        le = self._bucket_labels[bisect.bisect_left(self.buckets, value)]
+        with self._lock:
+            self._pending[(name + '_bucket', labels, le)] += 1
+            self._pending[(name + '_sum', labels, '')] += value
+            self._pending[(name + '_count', labels, '')] += 1
+        self.maybe_flush()
+
+    def record_request(self, view, method, status, duration, queries, query_time, size):
+        labels = labels_text(view=view, method=method)
+        le = self._bucket_labels[bisect.bisect_left(self.buckets, duration)]
+        with self._lock:
+            pending = self._pending
+            pending[('pm_http_requests_total', labels_text(view=view, method=method, status=status), '')] += 1
+            pending[('pm_http_request_duration_seconds_bucket', labels, le)] += 1
+            pending[('pm_http_request_duration_seconds_sum', labels, '')] += duration
+            pending[('pm_http_request_duration_seconds_count', labels, '')] += 1
+            pending[('pm_http_db_queries_total', labels, '')] += queries
+            pending[('pm_http_db_query_seconds_total', labels, '')] += query_time
+            pending[('pm_http_response_bytes_total', labels, '')] += size
+        self.maybe_flush()
+
+    def maybe_flush(self):
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def _carry_process_counters(self, pending):
+        for key, value in _process_counters().items():
+            carried = self._carried.get(key, 0)
+            # A counter that went backwards was reset
+            delta = value - carried if value >= carried else value
+            if delta:
+                pending[key + ('',)] += delta
+            self._carried[key] = value
+
+    def flush(self):
+        """Add this process' samples to the side file"""
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(float)
+            self._last_flush = time.monotonic()
+            self._carry_process_counters(pending)
+        if not pending:
+            return
+        try:
+            conn = self._connection()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                conn.executemany(_ADD, [key + (value,) for key, value in pending.items()])
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+            conn.execute('COMMIT')
+        except sqlite3.Error as e:
+            # Metrics are best effort; never fail a request over them
+            logger.warning("Could not flush %d metric samples: %s", len(pending), e)
+
+    def samples(self):
+        """``{(name, labels, le): value}`` for all processes, this one flushed first"""
+        self.flush()
+        rows = self._connection().execute('SELECT name, labels, le, value FROM sample')
+        return {(name, labels, le): value for name, labels, le, value in rows}
+
+    def render(self):
+        """All samples in the Prometheus text exposition format"""
+        samples = self.samples()
+        series = defaultdict(list)
+        for (name, labels, le), value in samples.items():
+            series[name].append((labels, le, value))
+
+        lines = []
+        for family, (kind, help_text) in FAMILIES.items():
+            lines.append(f'# HELP {family} {help_text}')
+            lines.append(f'# TYPE {family} {kind}')
+            if kind == 'histogram':
+                lines.extend(self._render_histogram(family, series))
+                continue
+            for labels, _, value in sorted(series.get(family, ())):
+                lines.append(f'{family}{{{labels}}} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+    def _render_histogram(self, family, series):
+        buckets = defaultdict(dict)
+        for labels, le, value in series.get(family + '_bucket', ()):
+            buckets[labels][le] = value
+        sums = {labels: value for labels, _, value in series.get(family + '_sum', ())}
+        for labels in sorted(buckets):
+            cumulative = 0
+            for le in self._bucket_labels:
+                cumulative += buckets[labels].get(le, 0)
+                yield f'{family}_bucket{{{labels},le="{le}"}} {_format_value(cumulative)}'
+            yield f'{family}_sum{{{labels}}} {_format_value(sums.get(labels, 0))}'
+            yield f'{family}_count{{{labels}}} {_format_value(cumulative)}'
+
+    def reset(self):
+        with self._lock:
+            self._pending.clear()
+            self._carried = _process_counters()
+        self._connection().execute('DELETE FROM sample')
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    """The process-wide registry for METRICS_DB_PATH"""
+    global _registry
+    path = getattr(settings, 'METRICS_DB_PATH', None) or default_path('metrics')
+    if _registry is None or _registry.path != path:
+        with _registry_lock:
+            if _registry is None or _registry.path != path:
+                _registry = MetricsRegistry(
+                    path,
+                    flush_interval=getattr(settings, 'METRICS_FLUSH_INTERVAL', 10),
+                    buckets=getattr(settings, 'METRICS_LATENCY_BUCKETS', DEFAULT_BUCKETS),
+                )
+    return _registry
+
+
+def metrics_enabled():
+    return getattr(settings, 'METRICS_ENABLED', True)
+
+
+_observers = ContextVar('query_observers', default=())
+
+
+def _run_observers(execute, sql, params, many, context):
+    for observer in reversed(_observers.get()):
+        execute = functools.partial(observer, execute)
+    return execute(sql, params, many, context)
+
+
+def _install(connection):
+    if _run_observers not in connection.execute_wrappers:
+        # At the front, so the pop() at the end of an enclosing
+        # execute_wrapper() block still removes its own wrapper
+        connection.execute_wrappers.insert(0, _run_observers)
+
+
+@receiver(connection_created)
+def install_query_observers(sender, connection, **kwargs):
+    _install(connection)
+
+
+@contextmanager
+def observe_queries(observer):
+    """
+    Pass every query run in the block through ``observer``, an execute
+    wrapper. Unlike ``connection.execute_wrapper()`` this covers all
+    aliases and follows the block's context into the threads async views
+    run their ORM calls in.
+    """
+    for alias in connections:
+        _install(connections[alias])
+    token = _observers.set(_observers.get() + (observer,))
+    try:
+        yield observer
+    finally:
+        _observers.reset(token)
+
+
+class QueryTimer:
+    """A database execute wrapper counting the queries it sees and their time"""
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - start
+            self.queries += 1
+
+
+def record_request(request, response, duration, timer):
+    match = getattr(request, 'resolver_match', None)
+    # Unresolved paths share one label so scanners cannot blow up the series
+    view = (match.view_name or match._func_path) if match else 'unmatched'
+    method = request.method if request.method in METHODS else 'other'
+    size = 0 if response.streaming else len(response.content)
+    get_registry().record_request(
+        view, method, response.status_code, duration, timer.queries, timer.seconds, size
+    )
+
+
+def timed_handler(func):
+    """
+    Record how long a signal receiver takes; goes under ``@receiver``::
+
+        @receiver(post_save, sender=Task)
+        @timed_handler
+        def update_metrics(sender, instance, **kwargs):
+    """
+    name = f'{func.__module__}.{func.__name__}'
+    labels = labels_text(handler=name)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not metrics_enabled():
+            return func(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            get_registry().observe('pm_signal_handler_duration_seconds', labels, time.perf_counter() - start)
+
+    return wrapper
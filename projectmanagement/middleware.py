@@ -1,29 +1,227 @@
 """
 Custom middleware for the Project Management application.
+
+All of it runs both ways, so under ASGI the async views are reached
+without a hop through a worker thread.
 """
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.middleware.gzip import GZipMiddleware
+from django.utils.cache import patch_vary_headers
+from django.utils.regex_helper import _lazy_re_compile
+
+from .metrics import QueryTimer, metrics_enabled, observe_queries, record_request
+from .routers import replica_alias, use_replica
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
 
-class ServiceWorkerMiddleware:
+logger = logging.getLogger(__name__)
+
+re_accepts_brotli = _lazy_re_compile(r'\bbr\b')
+
+
+class HybridMiddleware:
+    """
+    Base for middleware that works in sync and async stacks alike.
+    ``__call__`` hands over to ``__acall__`` when the stack is async.
+    """
+    sync_capable = True
+    async_capable = True
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+
+class ServiceWorkerMiddleware(HybridMiddleware):
     """
     Middleware to add Service-Worker-Allowed header for service worker registration.
     
     This fixes the error: "The path of the provided scope ('/') is not under the max scope allowed ('/static/js/')"
     """
     
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        return self.process_response(request, self.get_response(request))
+    
+    async def __acall__(self, request):
+        return self.process_response(request, await self.get_response(request))
+    
+    def process_response(self, request, response):
+        # Check if this is a request for the service worker script
+        if '/static/js/auth-service-worker.js' in request.path:
+            # Add the Service-Worker-Allowed header to allow the service worker to control the entire origin
+            response['Service-Worker-Allowed'] = '/'
+            logger.debug("Added Service-Worker-Allowed header for %s", request.path)
+        
+        return response
+
+
+class ReadReplicaMiddleware(HybridMiddleware):
+    """
+    Route the reads of safe-method API requests to the read-only database.
+    
+    After a successful write the client gets a short-lived cookie, and
+    while it is valid its reads stay on the primary so it always sees its
+    own changes (read-your-writes).
+    """
+    SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+    
     def __init__(self, get_response):
-        self.get_response = get_response
-        print("ServiceWorkerMiddleware initialized")
+        super().__init__(get_response)
+        self.cookie_name = getattr(settings, 'READ_REPLICA_STICKY_COOKIE', 'pm_primary_until')
+        self.sticky_seconds = getattr(settings, 'READ_REPLICA_STICKY_SECONDS', 10)
+        self.path_prefixes = tuple(getattr(settings, 'READ_REPLICA_PATH_PREFIXES', ('/api/',)))
+    
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if replica_alias() is None:
+            return self.get_response(request)
+        
+        with use_replica(self.preference(request)):
+            response = self.get_response(request)
+        return self.process_response(request, response)
+    
+    async def __acall__(self, request):
+        if replica_alias() is None:
+            return await self.get_response(request)
+        
+        # The preference is a context variable, so it carries over into
+        # the threads the async ORM runs queries in
+        with use_replica(self.preference(request)):
+            response = await self.get_response(request)
+        return self.process_response(request, response)
+    
+    def preference(self, request):
+        """True for the replica, False for the primary, None to let the router decide"""
+        if request.method not in self.SAFE_METHODS or self.is_sticky(request):
+            return False
+        if request.path.startswith(self.path_prefixes):
+            return True
+        return None
+    
+    def process_response(self, request, response):
+        if request.method not in self.SAFE_METHODS and response.status_code < 400:
+            response.set_cookie(
+                self.cookie_name,
+                str(int(time.time() + self.sticky_seconds)),
+                max_age=self.sticky_seconds,
+                httponly=True,
+                samesite='Lax',
+                secure=request.is_secure(),
+            )
+        return response
+    
+    def is_sticky(self, request):
+        try:
+            return float(request.COOKIES.get(self.cookie_name, 0)) > time.time()
+        except ValueError:
+            return False
 
+
+class MetricsMiddleware(HybridMiddleware):
+    """
+    Record latency, database queries, response size and status per view
+    (see projectmanagement.metrics). Goes first, so the time spent in the
+    other middleware is counted too.
+    """
+    
     def __call__(self, request):
-        # Store the path for debugging
-        path = request.path
+        if self.is_async:
+            return self.__acall__(request)
+        if not metrics_enabled():
+            return self.get_response(request)
         
-        # Get the response from the next middleware/view
-        response = self.get_response(request)
+        start = time.perf_counter()
+        with observe_queries(QueryTimer()) as timer:
+            response = self.get_response(request)
+        record_request(request, response, time.perf_counter() - start, timer)
+        return response
+    
+    async def __acall__(self, request):
+        if not metrics_enabled():
+            return await self.get_response(request)
         
-        # Check if this is a request for the service worker script
-        if '/static/js/auth-service-worker.js' in path:
-            # Add the Service-Worker-Allowed header to allow the service worker to control the entire origin
-            response['Service-Worker-Allowed'] = '/'
-            print(f"Added Service-Worker-Allowed header for {path}")
+        start = time.perf_counter()
+        with observe_queries(QueryTimer()) as timer:
+            response = await self.get_response(request)
+        record_request(request, response, time.perf_counter() - start, timer)
+        return response
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """
+    Compress responses of COMPRESSION_MIN_SIZE bytes or more (streamed ones
+    always) with brotli or gzip, whichever the client accepts. Goes right
+    below MetricsMiddleware, so the sizes recorded are the ones sent.
+    
+    Brotli needs the optional ``brotli`` package and is only used for JSON:
+    HTML pages, which carry CSRF tokens, keep to gzip and the random
+    padding GZipMiddleware adds against BREACH. Server-sent event streams
+    are never compressed, as that would hold events back.
+    """
+    
+    def process_response(self, request, response):
+        content_type = response.get('Content-Type', '')
+        if content_type.startswith('text/event-stream'):
+            return response
+        if not response.streaming and len(response.content) < getattr(settings, 'COMPRESSION_MIN_SIZE', 1024):
+            return response
+        if (
+            brotli is not None
+            and content_type.startswith('application/json')
+            and not response.has_header('Content-Encoding')
+            and re_accepts_brotli.search(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        ):
+            return self.compress_brotli(response)
+        return super().process_response(request, response)
+    
+    def compress_brotli(self, response):
+        patch_vary_headers(response, ('Accept-Encoding',))
+        quality = getattr(settings, 'COMPRESSION_BROTLI_QUALITY', 5)
+        if response.streaming:
+            chunks = response.streaming_content
+            response.streaming_content = (
+                _abrotli_stream(chunks, quality) if response.is_async else _brotli_stream(chunks, quality)
+            )
+            del response.headers['Content-Length']
+        else:
+            compressed = brotli.compress(response.content, quality=quality)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
         
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = 'br'
         return response
+
+
+def _brotli_stream(chunks, quality):
+    compressor = brotli.Compressor(quality=quality)
+    for chunk in chunks:
+        data = compressor.process(chunk)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+async def _abrotli_stream(chunks, quality):
+    compressor = brotli.Compressor(quality=quality)
+    async for chunk in chunks:
+        data = compressor.process(chunk)
+        if data:
+            yield data
+    yield compressor.finish()
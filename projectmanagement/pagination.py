@@ -0,0 +1,185 @@
+"""
+Pagination classes shared across the API.
+"""
+import base64
+import binascii
+import json
+from collections import OrderedDict
+from datetime import date, datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination over a composite sort key.
+
+    Unlike PageNumberPagination this never issues a COUNT and never uses
+    OFFSET: each page is fetched with a WHERE clause that continues from the
+    last row of the previous page, so the cost of a page is independent of
+    how deep into the feed the client is. The last ordering field must be
+    unique (normally the primary key) so that ties are broken
+    deterministically.
+    """
+    ordering = ('-timestamp', '-id')
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'limit'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        reverse, position = self.decode_cursor(request)
+        ordering = self.get_ordering(reverse)
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self.build_keyset_filter(ordering, position))
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+
+        if reverse:
+            results.reverse()
+            self.has_next = position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+
+        self.page = results
+        return results
+
+    def get_page_size(self, request):
+        if self.page_size_query_param:
+            try:
+                size = int(request.query_params[self.page_size_query_param])
+                if size > 0:
+                    return min(size, self.max_page_size)
+            except (KeyError, ValueError):
+                pass
+        return self.page_size
+
+    def get_ordering(self, reverse=False):
+        if not reverse:
+            return tuple(self.ordering)
+        return tuple(
+            field[1:] if field.startswith('-') else '-' + field
+            for field in self.ordering
+        )
+
+    def build_keyset_filter(self, ordering, position):
+        """
+        Build the "comes after position" predicate for the given ordering,
+        e.g. ``timestamp < t OR (timestamp = t AND id < i)`` for
+        ``('-timestamp', '-id')``.
+        """
+        condition = Q()
+        equal_prefix = Q()
+        for field, value in zip(ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= equal_prefix & Q(**{f'{name}__{lookup}': value})
+            equal_prefix &= Q(**{name: value})
+
+        # Repeat the bound on the leading field on its own so the database can
+        # turn it into an index range instead of evaluating the OR per row.
+        leading = ordering[0]
+        leading_lookup = 'lte' if leading.startswith('-') else 'gte'
+        return Q(**{f'{leading.lstrip("-")}__{leading_lookup}': position[0]}) & condition
+
+    def get_position(self, item):
+        position = []
+        for field in self.ordering:
+            name = field.lstrip('-')
+            if isinstance(item, dict):
+                value = item[name]
+            else:
+                value = item
+                for attr in name.split('__'):
+                    value = getattr(value, attr)
+            position.append(value)
+        return position
+
+    def encode_cursor(self, item, reverse=False):
+        values = []
+        for value in self.get_position(item):
+            if isinstance(value, (datetime, date)):
+                value = value.isoformat()
+            elif not isinstance(value, (int, str)):
+                value = str(value)
+            values.append(value)
+
+        payload = {'p': values}
+        if reverse:
+            payload['r'] = 1
+        encoded = base64.urlsafe_b64encode(json.dumps(payload).encode('utf-8')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return False, None
+
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+            position = payload['p']
+            reverse = bool(payload.get('r'))
+        except (TypeError, ValueError, KeyError, binascii.Error, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return reverse, position
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1])
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class ActivityFeedPagination(KeysetPagination):
+    """Newest-first pagination for activity feeds, keyed on (timestamp, id)."""
+    ordering = ('-timestamp', '-id')
+
+
+class MemberDirectoryPagination(KeysetPagination):
+    """Alphabetical pagination for member directories, keyed on (user email, id)."""
+    ordering = ('user__email', 'id')
+    page_size = 50
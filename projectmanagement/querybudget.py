@@ -0,0 +1,151 @@
+"""
+Query budgets and N+1 detection for views.
+
+A view declares the most queries it may run per request, either with the
+``query_budget`` decorator (function views) or a ``query_budget``
+attribute on its class, which for a viewset may map action names to
+budgets (with an optional ``'default'``)::
+
+    class TaskViewSet(viewsets.ModelViewSet):
+        query_budget = {'list': 8, 'retrieve': 10, 'default': 15}
+
+QUERY_BUDGETS (view name -> budget) overrides both, and
+QUERY_BUDGET_DEFAULT applies to views that declare nothing (None: no
+limit).
+
+QueryBudgetMiddleware counts the queries each view runs and groups them
+by shape (the SQL with its parameter lists collapsed), so the same
+SELECT repeated for every row of a list shows up as one shape run
+QUERY_N_PLUS_ONE_THRESHOLD or more times. The session store's queries
+are not the view's and are left out; whether they run depends on the
+session cache, not on what the view does. Repeated writes are not
+flagged: signal receivers log one activity per object on purpose. Violations are logged, or
+raised as QueryBudgetExceeded when QUERY_BUDGET_RAISE is set (as the
+test runner, projectmanagement.testrunner, does).
+"""
+import logging
+import re
+from collections import Counter
+
+from django.conf import settings
+
+from .metrics import observe_queries
+from .middleware import HybridMiddleware
+
+logger = logging.getLogger(__name__)
+
+# IN (%s, %s, ...) of any length is one shape
+_PARAM_LIST = re.compile(r'\(\s*%s(?:\s*,\s*%s)*\s*\)')
+
+
+# Not queries as far as budgets go; every write transaction has them
+_TRANSACTION_CONTROL = ('BEGIN', 'COMMIT', 'ROLLBACK', 'SAVEPOINT', 'RELEASE SAVEPOINT')
+
+# The table of projectmanagement.sessions (Django's database session store)
+_SESSION_TABLE = '"django_session"'
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def query_budget(budget):
+    """Declare the query budget of a view function or class"""
+    def decorator(view):
+        view.query_budget = budget
+        return view
+    return decorator
+
+
+def sql_shape(sql):
+    return _PARAM_LIST.sub('(%s, ...)', sql)
+
+
+class QueryLog:
+    """A database execute wrapper keeping a count per query shape"""
+
+    def __init__(self):
+        self.shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        if not sql.startswith(_TRANSACTION_CONTROL) and _SESSION_TABLE not in sql:
+            self.shapes[sql_shape(sql)] += 1
+        return execute(sql, params, many, context)
+
+    @property
+    def count(self):
+        return sum(self.shapes.values())
+
+    def repeated(self, threshold):
+        """``(shape, times)`` for the SELECTs run ``threshold`` times or more"""
+        return [
+            (shape, times) for shape, times in self.shapes.most_common()
+            if times >= threshold and shape.startswith('SELECT')
+        ]
+
+
+def budget_for(view_func, view_name, action=None):
+    """The budget declared for a resolved view, or QUERY_BUDGET_DEFAULT"""
+    budgets = getattr(settings, 'QUERY_BUDGETS', {})
+    if view_name in budgets:
+        return budgets[view_name]
+    view_class = getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None)
+    declared = getattr(view_func, 'query_budget', None)
+    if declared is None and view_class is not None:
+        declared = getattr(view_class, 'query_budget', None)
+    if isinstance(declared, dict):
+        declared = declared.get(action, declared.get('default'))
+    if declared is None:
+        return getattr(settings, 'QUERY_BUDGET_DEFAULT', None)
+    return declared
+
+
+def check(view_name, log, budget):
+    """Report the problems with the queries in ``log``; returns their descriptions"""
+    problems = []
+    if budget is not None and log.count > budget:
+        problems.append(f"{log.count} queries, over its budget of {budget}")
+    threshold = getattr(settings, 'QUERY_N_PLUS_ONE_THRESHOLD', 5)
+    for shape, times in log.repeated(threshold):
+        problems.append(f"possible N+1, ran {times} times: {shape[:300]}")
+    if problems:
+        message = f"{view_name}: " + '; '.join(problems)
+        if getattr(settings, 'QUERY_BUDGET_RAISE', False):
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+    return problems
+
+
+class QueryBudgetMiddleware(HybridMiddleware):
+    """
+    Enforce query budgets and flag N+1 queries. Goes last, so only the
+    view (and its template rendering) is counted.
+    """
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not getattr(settings, 'QUERY_BUDGET_ENABLED', True):
+            return self.get_response(request)
+
+        with observe_queries(QueryLog()) as log:
+            response = self.get_response(request)
+        self.check(request, log)
+        return response
+
+    async def __acall__(self, request):
+        if not getattr(settings, 'QUERY_BUDGET_ENABLED', True):
+            return await self.get_response(request)
+
+        with observe_queries(QueryLog()) as log:
+            response = await self.get_response(request)
+        self.check(request, log)
+        return response
+
+    def check(self, request, log):
+        match = getattr(request, 'resolver_match', None)
+        if match is not None and log.shapes:
+            actions = getattr(match.func, 'actions', None) or {}
+            action = actions.get(request.method.lower())
+            view_name = match.view_name or match._func_path
+            check(view_name, log, budget_for(match.func, view_name, action))
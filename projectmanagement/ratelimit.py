@@ -0,0 +1,191 @@
+"""
+Rate limiting shared by every worker process.
+
+Limits are token buckets kept in a small SQLite side file (WAL,
+synchronous=OFF; losing a few counts on a crash is harmless), so all
+gunicorn workers on the host count against the same buckets. A hit is a
+single UPSERT ... RETURNING statement that refills the bucket for the time
+elapsed, takes a token if there is one and reports the decision, so
+concurrent requests cannot race past the limit.
+
+The table stays bounded: every RATE_LIMIT_TRIM_INTERVAL hits a process
+drops the buckets that have refilled completely (forgetting them changes
+nothing) and then the least recently used ones beyond RATE_LIMIT_MAX_KEYS.
+
+SecurityMiddleware applies the RATE_LIMIT_POLICIES per client IP and
+route; the throttles in projectmanagement.throttling use the same store
+for DRF's rate scopes.
+"""
+import functools
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+logger = logging.getLogger(__name__)
+
+Decision = namedtuple('Decision', ['allowed', 'remaining', 'retry_after'])
+
+PERIODS = {'s': 1, 'sec': 1, 'second': 1, 'm': 60, 'min': 60, 'minute': 60, 'h': 3600, 'hour': 3600, 'd': 86400, 'day': 86400}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS bucket (
+    key TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    capacity REAL NOT NULL,
+    rate REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    allowed INTEGER NOT NULL
+) WITHOUT ROWID
+"""
+
+# Columns on the right of SET refer to the row as it was before the update
+_HIT = """
+INSERT INTO bucket (key, tokens, capacity, rate, updated_at, allowed)
+VALUES (:key, :capacity - 1, :capacity, :rate, :now, 1)
+ON CONFLICT (key) DO UPDATE SET
+    tokens = min(:capacity, tokens + (:now - updated_at) * :rate)
+             - (min(:capacity, tokens + (:now - updated_at) * :rate) >= 1),
+    allowed = min(:capacity, tokens + (:now - updated_at) * :rate) >= 1,
+    capacity = :capacity,
+    rate = :rate,
+    updated_at = :now
+RETURNING allowed, tokens
+"""
+
+_TRIM_FULL = "DELETE FROM bucket WHERE updated_at + (capacity - tokens) / rate <= :now"
+
+_TRIM_LRU = """
+DELETE FROM bucket WHERE key IN (
+    SELECT key FROM bucket ORDER BY updated_at DESC LIMIT -1 OFFSET :max_keys
+)
+"""
+
+# Ids in a path (numbers, UUIDs) are folded so each route is one bucket
+_ID_SEGMENT = re.compile(
+    r'/(?:\d+|[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12})(?=/|$)'
+)
+
+
+@functools.lru_cache(maxsize=64)
+def parse_rate(rate):
+    """Turn ``'100/minute'`` (or ``'5/m'``, ``'10/30s'``) into (requests, seconds)"""
+    count, _, period = rate.partition('/')
+    match = re.fullmatch(r'(\d*)\s*([a-z]+)', period.strip().lower())
+    if not match or match.group(2) not in PERIODS:
+        raise ValueError(f"Invalid rate {rate!r}")
+    return int(count), int(match.group(1) or 1) * PERIODS[match.group(2)]
+
+
+def route_key(path):
+    """``path`` with its id segments folded, e.g. ``/api/v1/tasks/*/``"""
+    return _ID_SEGMENT.sub('/*', path)[:100]
+
+
+class RateLimiter:
+    """Token buckets in a SQLite file shared by the processes using ``path``"""
+
+    def __init__(self, path, max_keys=50000, trim_interval=1000):
+        self.path = path
+        self.max_keys = max_keys
+        self.trim_interval = trim_interval
+        self._local = threading.local()
+        self._hits = 0
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        # A forked worker must not share its parent's connection
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False, uri=True)
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.execute('PRAGMA synchronous = OFF')
+            conn.execute(_SCHEMA)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def hit(self, key, limit, period, now=None):
+        """
+        Take a token from the ``key`` bucket, which holds ``limit`` tokens
+        and refills completely over ``period`` seconds
+        """
+        rate = limit / period
+        now = now or time.time()
+        try:
+            allowed, tokens = self._connection().execute(
+                _HIT, {'key': key, 'capacity': limit, 'rate': rate, 'now': now}
+            ).fetchone()
+        except sqlite3.Error as e:
+            # Never turn a broken side file into an outage
+            logger.warning("Rate limiter unavailable, allowing request: %s", e)
+            return Decision(True, limit, 0)
+
+        self._hits += 1
+        if self._hits % self.trim_interval == 0:
+            self.trim(now)
+        if allowed:
+            return Decision(True, int(tokens), 0)
+        return Decision(False, 0, (1 - tokens) / rate)
+
+    def trim(self, now=None):
+        """Forget full buckets, then the least recently used beyond max_keys"""
+        try:
+            conn = self._connection()
+            conn.execute(_TRIM_FULL, {'now': now or time.time()})
+            conn.execute(_TRIM_LRU, {'max_keys': self.max_keys})
+        except sqlite3.Error as e:
+            logger.warning("Could not trim rate limit buckets: %s", e)
+
+    def count(self):
+        return self._connection().execute('SELECT COUNT(*) FROM bucket').fetchone()[0]
+
+    def reset(self):
+        self._connection().execute('DELETE FROM bucket')
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def default_path(name='ratelimit'):
+    """
+    ``<name>.sqlite3`` next to the main database file, so the processes
+    sharing a database share the side file. With an in-memory database (as
+    in tests) the side file is in memory too, shared by the process' threads.
+    """
+    database = connections[DEFAULT_DB_ALIAS]
+    if database.is_in_memory_db():
+        return f'file:{name}?mode=memory&cache=shared'
+    return os.path.join(os.path.dirname(database.settings_dict['NAME']), f'{name}.sqlite3')
+
+
+def get_limiter():
+    """The process-wide limiter for RATE_LIMIT_DB_PATH"""
+    global _limiter
+    path = getattr(settings, 'RATE_LIMIT_DB_PATH', None) or default_path()
+    if _limiter is None or _limiter.path != path:
+        with _limiter_lock:
+            if _limiter is None or _limiter.path != path:
+                _limiter = RateLimiter(
+                    path,
+                    max_keys=getattr(settings, 'RATE_LIMIT_MAX_KEYS', 50000),
+                    trim_interval=getattr(settings, 'RATE_LIMIT_TRIM_INTERVAL', 1000),
+                )
+    return _limiter
+
+
+def policy_for(path, method='GET'):
+    """
+    The first RATE_LIMIT_POLICIES entry whose prefixes match ``path`` (and
+    whose ``methods``, if it lists any, include ``method``), or None
+    """
+    for policy in getattr(settings, 'RATE_LIMIT_POLICIES', ()):
+        if path.startswith(tuple(policy['prefixes'])) and method in policy.get('methods', (method,)):
+            return policy
+    return None
@@ -0,0 +1,68 @@
+"""
+Read/write split between the primary database and its read-only alias.
+
+The ``replica`` alias opens the same SQLite file read-only (see
+DATABASES in settings). ReadReplicaMiddleware marks safe-method API
+requests as replica reads with ``use_replica``; reads of the apps in
+READ_REPLICA_APPS (analytics) go to the replica everywhere. Everything
+else, every write and any read made inside a transaction on the primary
+stays on ``default``, so a request never reads around its own
+uncommitted changes. After a client writes, its requests stick to the
+primary for READ_REPLICA_STICKY_SECONDS (see the middleware).
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA = 'replica'
+PRIMARY = 'primary'
+
+_read_preference = ContextVar('read_preference', default=None)
+
+
+def replica_alias():
+    """The read-only alias, or None when it is not configured"""
+    alias = getattr(settings, 'READ_REPLICA_ALIAS', REPLICA)
+    return alias if alias in settings.DATABASES else None
+
+
+@contextmanager
+def use_replica(enabled=True):
+    """
+    Route reads in the block to the replica, or with ``enabled=False`` pin
+    them to the primary; with ``enabled=None`` the router decides by app
+    """
+    preference = None if enabled is None else REPLICA if enabled else PRIMARY
+    token = _read_preference.set(preference)
+    try:
+        yield
+    finally:
+        _read_preference.reset(token)
+
+
+class ReadReplicaRouter:
+    """Send eligible reads to the read-only alias and everything else to default"""
+
+    def db_for_read(self, model, **hints):
+        alias = replica_alias()
+        preference = _read_preference.get()
+        if alias is None or preference == PRIMARY:
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            # The replica cannot see what this transaction has written yet
+            return DEFAULT_DB_ALIAS
+        if preference == REPLICA or model._meta.app_label in getattr(settings, 'READ_REPLICA_APPS', ()):
+            return alias
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases are the same database
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
@@ -0,0 +1,166 @@
+"""
+Request screening for SecurityMiddleware.
+
+All REQUEST_SCREENING_RULES patterns are compiled once into a single
+regex shaped like a trie (patterns sharing a prefix share a branch), so
+each request value is scanned in one pass whatever the number of patterns,
+and a hit is mapped back to its rule with a dict lookup. The raw WSGI values
+(PATH_INFO, QUERY_STRING, HTTP_USER_AGENT) are scanned one by one, lowercased
+but never concatenated or rebuilt into a URL. (An IGNORECASE regex is about
+eight times slower in CPython's engine than lowercasing first.) User agents
+repeat across requests, so their results are cached. Rules can be switched off below a path prefix with
+REQUEST_SCREENING_EXEMPTIONS (``'*'`` for all of them).
+
+Besides the patterns, a request is refused if its URL is longer than
+REQUEST_SCREENING_MAX_URL_LENGTH or it carries too many query or form
+parameters.
+"""
+import re
+import threading
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+DEFAULT_RULES = {
+    'path_traversal': ['../', '..\\'],
+    'probe': ['.env', 'wp-admin', 'phpinfo'],
+    'script_injection': ['<script', 'javascript:', 'vbscript:', 'onload='],
+    'code_injection': ['eval(', 'exec(', '__import__', 'system('],
+    'sql_injection': ['drop table', 'select * from', 'union select'],
+}
+
+# The request values that are scanned
+SCANNED = ('PATH_INFO', 'QUERY_STRING', 'HTTP_USER_AGENT')
+
+EXEMPT_ALL = '*'
+
+USER_AGENT_CACHE_SIZE = 1024
+
+
+def _trie_pattern(words):
+    """A regex matching any of ``words``, with common prefixes factored out"""
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def build(node):
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        # A word ends here, but longer ones continue
+        return f'(?:{body})?' if '' in node else body
+
+    return build(trie)
+
+
+class RequestScreen:
+    """A compiled set of screening rules"""
+
+    def __init__(self, rules, exemptions=None, max_url_length=2048, max_query_params=50, max_form_fields=100):
+        self.rule_for = {}
+        for name, patterns in rules.items():
+            for pattern in patterns:
+                if pattern:
+                    self.rule_for.setdefault(pattern.lower(), name)
+        self.pattern = re.compile(_trie_pattern(self.rule_for)) if self.rule_for else None
+        # Longest prefixes first, so the most specific exemption wins
+        self.exemptions = sorted(
+            ((prefix, frozenset(names)) for prefix, names in (exemptions or {}).items()),
+            key=lambda item: len(item[0]),
+            reverse=True,
+        )
+        self.max_url_length = max_url_length
+        self.max_query_params = max_query_params
+        self.max_form_fields = max_form_fields
+        self._user_agents = {}
+
+    def exempt_rules(self, path):
+        for prefix, names in self.exemptions:
+            if path.startswith(prefix):
+                return names
+        return frozenset()
+
+    def rules_in(self, value):
+        """The rules ``value`` breaks, in order of appearance"""
+        value = value.lower()
+        # Almost every value is clean, and a plain search is the cheapest way to tell
+        if self.pattern.search(value) is None:
+            return ()
+        return tuple(dict.fromkeys(self.rule_for[match.group()] for match in self.pattern.finditer(value)))
+
+    def _user_agent_rules(self, user_agent):
+        # The same few user agents come back on nearly every request
+        rules = self._user_agents.get(user_agent)
+        if rules is None:
+            rules = self.rules_in(user_agent)
+            if len(self._user_agents) >= USER_AGENT_CACHE_SIZE:
+                self._user_agents.clear()
+            self._user_agents[user_agent] = rules
+        return rules
+
+    def check(self, request):
+        """The name of the first rule ``request`` breaks, or None"""
+        meta = request.META
+        path = meta.get('PATH_INFO', '')
+        query = meta.get('QUERY_STRING', '')
+
+        exempt = self.exempt_rules(path) if self.exemptions else frozenset()
+        if self.pattern is not None and EXEMPT_ALL not in exempt:
+            for key in SCANNED:
+                value = meta.get(key)
+                if not value:
+                    continue
+                rules = self._user_agent_rules(value) if key == 'HTTP_USER_AGENT' else self.rules_in(value)
+                for rule in rules:
+                    if rule not in exempt:
+                        return rule
+
+        # scheme://host + path + ?query, without building it
+        url_length = 8 + len(meta.get('HTTP_HOST', '')) + len(meta.get('SCRIPT_NAME', '')) + len(path)
+        if query:
+            url_length += 1 + len(query)
+        if url_length > self.max_url_length:
+            return 'url_length'
+        if query and query.count('&') >= self.max_query_params:
+            return 'query_params'
+        # Only url-encoded bodies are cheap to count; multipart uploads are
+        # not parsed here
+        if (
+            request.method == 'POST'
+            and meta.get('CONTENT_TYPE', '').startswith('application/x-www-form-urlencoded')
+            and len(request.POST) > self.max_form_fields
+        ):
+            return 'form_fields'
+        return None
+
+
+_screen = None
+_screen_lock = threading.Lock()
+
+
+def get_screen():
+    """The RequestScreen built from the current settings"""
+    global _screen
+    if _screen is None:
+        with _screen_lock:
+            if _screen is None:
+                _screen = RequestScreen(
+                    getattr(settings, 'REQUEST_SCREENING_RULES', DEFAULT_RULES),
+                    getattr(settings, 'REQUEST_SCREENING_EXEMPTIONS', {}),
+                    max_url_length=getattr(settings, 'REQUEST_SCREENING_MAX_URL_LENGTH', 2048),
+                    max_query_params=getattr(settings, 'REQUEST_SCREENING_MAX_QUERY_PARAMS', 50),
+                    max_form_fields=getattr(settings, 'REQUEST_SCREENING_MAX_FORM_FIELDS', 100),
+                )
+    return _screen
+
+
+@receiver(setting_changed)
+def reset_screen(setting, **kwargs):
+    global _screen
+    if setting.startswith('REQUEST_SCREENING_'):
+        _screen = None
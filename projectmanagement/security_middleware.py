@@ -3,15 +3,18 @@ Security middleware for Django Project Management System
 Provides rate limiting, request filtering, and security headers.
 """
 
+import math
 import time
 import hashlib
 from django.http import HttpResponse, HttpResponseForbidden
-from django.core.cache import cache
 from django.conf import settings
 from django.utils.deprecation import MiddlewareMixin
 from django.urls import resolve
 import logging
 
+from .ratelimit import get_limiter, parse_rate, policy_for, route_key
+from .screening import get_screen
+
 logger = logging.getLogger(__name__)
 
 # Custom HttpResponseTooManyRequests for older Django versions
@@ -32,13 +35,17 @@ class SecurityMiddleware(MiddlewareMixin):
         """Process incoming requests for security validation"""
         
         # Rate limiting
-        if self._is_rate_limited(request):
+        limited = self._is_rate_limited(request)
+        if limited:
             logger.warning(f"Rate limit exceeded for IP: {self._get_client_ip(request)}")
-            return HttpResponseTooManyRequests("Rate limit exceeded. Please try again later.")
+            response = HttpResponseTooManyRequests("Rate limit exceeded. Please try again later.")
+            response['Retry-After'] = str(max(1, math.ceil(limited.retry_after)))
+            return response
         
         # Block suspicious requests
-        if self._is_suspicious_request(request):
-            logger.warning(f"Suspicious request blocked from IP: {self._get_client_ip(request)}")
+        rule = self._is_suspicious_request(request)
+        if rule:
+            logger.warning(f"Suspicious request blocked ({rule}) from IP: {self._get_client_ip(request)}")
             return HttpResponseForbidden("Request blocked for security reasons.")
         
         return None
@@ -77,71 +84,37 @@ class SecurityMiddleware(MiddlewareMixin):
         return ip
     
     def _is_rate_limited(self, request):
-        """Check if request should be rate limited"""
-        
-        # Skip rate limiting for static files
-        if request.path.startswith('/static/') or request.path.startswith('/media/'):
-            return False
-        
-        ip = self._get_client_ip(request)
-        
-        # Different limits for different endpoints
-        if request.path.startswith('/api/auth/'):
-            # Stricter limits for auth endpoints
-            limit = getattr(settings, 'AUTH_RATE_LIMIT', 5)  # 5 requests per minute
-            window = 60
-        elif request.path.startswith('/api/'):
-            # General API rate limit
-            limit = getattr(settings, 'API_RATE_LIMIT', 100)  # 100 requests per minute
-            window = 60
-        else:
-            # Web interface rate limit
-            limit = getattr(settings, 'WEB_RATE_LIMIT', 200)  # 200 requests per minute
-            window = 60
-        
-        # Create cache key
-        cache_key = f"rate_limit:{ip}:{request.path_info[:50]}"
+        """
+        Take a token from the client's bucket for this route
+        
+        Returns the limiter's decision when the request is over the limit,
+        otherwise None. Limits are per client IP and route (ids folded), with
+        the rate of the first matching RATE_LIMIT_POLICIES entry, and are
+        shared by all worker processes.
+        """
+        if not getattr(settings, 'RATE_LIMIT_ENABLED', True):
+            return None
         
-        # Get current request count
-        current_requests = cache.get(cache_key, 0)
+        policy = policy_for(request.path, request.method)
+        if policy is None or not policy['rate']:
+            # Static and media files are not limited
+            return None
         
-        if current_requests >= limit:
-            return True
+        limit, period = parse_rate(policy['rate'])
+        key = f"{policy['name']}:{self._get_client_ip(request)}"
+        if policy.get('per_route', True):
+            key = f"{key}:{route_key(request.path_info)}"
         
-        # Increment counter
-        cache.set(cache_key, current_requests + 1, window)
-        return False
+        decision = get_limiter().hit(key, limit, period)
+        return None if decision.allowed else decision
     
     def _is_suspicious_request(self, request):
-        """Detect suspicious request patterns"""
-        
-        # Check for common attack patterns in URL
-        suspicious_patterns = [
-            '../', '..\\', '.env', 'wp-admin', 'phpinfo',
-            '<script', 'javascript:', 'vbscript:', 'onload=',
-            'eval(', 'exec(', '__import__', 'system(',
-            'DROP TABLE', 'SELECT * FROM', 'UNION SELECT'
-        ]
-        
-        request_data = (
-            request.path.lower() + 
-            request.META.get('QUERY_STRING', '').lower() +
-            request.META.get('HTTP_USER_AGENT', '').lower()
-        )
-        
-        for pattern in suspicious_patterns:
-            if pattern in request_data:
-                return True
-        
-        # Check for abnormally long URLs
-        if len(request.build_absolute_uri()) > 2048:
-            return True
-        
-        # Check for too many parameters
-        if len(request.GET) > 50 or len(request.POST) > 100:
-            return True
-        
-        return False
+        """
+        Screen the request against the compiled REQUEST_SCREENING_RULES
+        
+        Returns the name of the rule it breaks, or None.
+        """
+        return get_screen().check(request)
 
 
 class APIKeyMiddleware(MiddlewareMixin):
@@ -0,0 +1,179 @@
+"""
+Database sessions that are cheap to keep alive.
+
+With SESSION_SAVE_EVERY_REQUEST every response saves the session just to
+push its expiry forward, which is a write per request on SQLite. This
+store keeps recently used sessions in a process-local LRU
+(SESSION_CACHE_SIZE entries, trusted for SESSION_CACHE_TTL seconds) and
+only writes an unchanged session once its expiry would move forward by
+SESSION_TOUCH_INTERVAL or more. That write sets expire_date alone, so
+it never puts a cached, possibly stale, session_data back over the row.
+Changed sessions are written as usual.
+
+Expiry keeps sliding, but the stored expiry may lag the cookie by up to
+SESSION_TOUCH_INTERVAL, so an idle session can end that much earlier
+than SESSION_COOKIE_AGE. A cached session that carries a login is only
+served after checking its row still exists, so a logout or flush in
+another process ends it at once; anonymous sessions may outlive their
+row in this process' cache for up to SESSION_CACHE_TTL seconds.
+
+session_stats() reports cache hits and misses, writes and the touches
+that were skipped.
+"""
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.contrib.sessions.backends.base import UpdateError
+from django.contrib.sessions.backends.db import SessionStore as DBStore
+from django.utils import timezone
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+_stats_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0, 'writes': 0, 'touches_skipped': 0}
+
+
+def session_stats():
+    """Counters since the process started (or the last reset)"""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def reset_session_stats():
+    with _stats_lock:
+        for key in _stats:
+            _stats[key] = 0
+
+
+def clear_session_cache():
+    with _cache_lock:
+        _cache.clear()
+
+
+def _count(key):
+    with _stats_lock:
+        _stats[key] += 1
+
+
+def _cache_get(session_key):
+    with _cache_lock:
+        entry = _cache.get(session_key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry[2] > getattr(settings, 'SESSION_CACHE_TTL', 30):
+            del _cache[session_key]
+            return None
+        _cache.move_to_end(session_key)
+        return entry
+
+
+def _cache_set(session_key, session_data, expire_date):
+    with _cache_lock:
+        _cache[session_key] = (session_data, expire_date, time.monotonic())
+        _cache.move_to_end(session_key)
+        while len(_cache) > getattr(settings, 'SESSION_CACHE_SIZE', 10000):
+            _cache.popitem(last=False)
+
+
+def _cache_delete(session_key):
+    with _cache_lock:
+        _cache.pop(session_key, None)
+
+
+class SessionStore(DBStore):
+    """
+    The database session store, read through a process-local LRU and with
+    throttled expiry touches
+    """
+
+    def __init__(self, session_key=None):
+        super().__init__(session_key)
+        # The expiry of the stored row, as far as this process knows
+        self._stored_expiry = None
+
+    def load(self):
+        session_key = self.session_key
+        entry = _cache_get(session_key) if session_key else None
+        if entry is not None and entry[1] > timezone.now():
+            session = self.decode(entry[0])
+            if SESSION_KEY not in session or self._row_exists(session_key):
+                _count('hits')
+                self._stored_expiry = entry[1]
+                return session
+            # Logged out (or flushed) by another process
+            _count('misses')
+            _cache_delete(session_key)
+            self._session_key = None
+            return {}
+
+        _count('misses')
+        s = self._get_session_from_db()
+        if s is None:
+            if session_key:
+                _cache_delete(session_key)
+            return {}
+        self._stored_expiry = s.expire_date
+        _cache_set(s.session_key, s.session_data, s.expire_date)
+        return self.decode(s.session_data)
+
+    def _row_exists(self, session_key):
+        return self.model.objects.filter(session_key=session_key, expire_date__gt=timezone.now()).exists()
+
+    def _touch_can_wait(self):
+        if self._stored_expiry is None:
+            return False
+        interval = timedelta(seconds=getattr(settings, 'SESSION_TOUCH_INTERVAL', 300))
+        return self.get_expiry_date() - self._stored_expiry < interval
+
+    def create_model_instance(self, data):
+        self._saving = super().create_model_instance(data)
+        return self._saving
+
+    def save(self, must_create=False):
+        if self.session_key is None:
+            return self.create()
+        if not must_create:
+            # Loads the session (from the cache, usually) if nothing has yet
+            self._get_session()
+            if self.session_key is None:
+                # The row is gone; the db store fails the same way
+                raise UpdateError
+            if not self.modified:
+                if self._touch_can_wait():
+                    _count('touches_skipped')
+                else:
+                    self._touch()
+                return
+        super().save(must_create=must_create)
+        obj = self._saving
+        _count('writes')
+        self._stored_expiry = obj.expire_date
+        _cache_set(obj.session_key, obj.session_data, obj.expire_date)
+
+    def _touch(self):
+        """
+        Push the stored expiry forward without writing session_data
+
+        The data here may be the cached copy, older than the row if another
+        process has changed the session since; writing it back would undo
+        that change. The cache entry is dropped so the next load reads the row.
+        """
+        expire_date = self.get_expiry_date()
+        if not self.model.objects.filter(session_key=self.session_key).update(expire_date=expire_date):
+            _cache_delete(self.session_key)
+            raise UpdateError
+        _count('writes')
+        self._stored_expiry = expire_date
+        _cache_delete(self.session_key)
+
+    def delete(self, session_key=None):
+        if session_key is None:
+            session_key = self.session_key
+        if session_key is not None:
+            _cache_delete(session_key)
+        super().delete(session_key)
@@ -105,12 +105,16 @@ INSTALLED_APPS += [
     'notifications',
     'analytics',
     'activitylogs',  # New app for activity logs and audit trail
+    'projectmanagement',  # Project-wide management commands
 ]
 
 MIDDLEWARE = [
+    'projectmanagement.middleware.MetricsMiddleware',  # First, so it times everything below
+    'projectmanagement.middleware.CompressionMiddleware',  # Gzip or brotli, over everything below
     'projectmanagement.security_middleware.SecurityMiddleware',  # Add security middleware first
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'projectmanagement.middleware.ReadReplicaMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -122,7 +126,7 @@ MIDDLEWARE = [
 # Add CORS middleware if available
 try:
     import corsheaders
-    MIDDLEWARE.insert(3, 'corsheaders.middleware.CorsMiddleware')
+    MIDDLEWARE.insert(5, 'corsheaders.middleware.CorsMiddleware')
 except ImportError:
     pass
 
@@ -133,6 +137,9 @@ try:
 except ImportError:
     pass
 
+# Last, so it counts only the queries of the view itself
+MIDDLEWARE.append('projectmanagement.querybudget.QueryBudgetMiddleware')
+
 ROOT_URLCONF = 'projectmanagement.urls'
 
 TEMPLATES = [
@@ -158,22 +165,117 @@ WSGI_APPLICATION = 'projectmanagement.wsgi.application'
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
 # Database configuration
-# If DATABASE_PATH is set in environment, use that path for SQLite
-if os.environ.get('DATABASE_PATH'):
-    DATABASES = {
-        'default': {
-            'ENGINE': 'django.db.backends.sqlite3',
-            'NAME': os.environ.get('DATABASE_PATH'),
-        }
+# SQLite through projectmanagement.db, which applies SQLITE_PRAGMAS to every
+# connection, opens transactions with BEGIN IMMEDIATE and retries statements
+# that find the database busy. Connections are kept for CONN_MAX_AGE seconds.
+SQLITE_PRAGMAS = {
+    'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE', 'wal'),
+    'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'normal'),
+    'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000)),  # milliseconds
+    'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 128 * 1024 * 1024)),  # bytes
+    'cache_size': int(os.environ.get('SQLITE_CACHE_SIZE', -32000)),  # negative: KiB
+    'temp_store': os.environ.get('SQLITE_TEMP_STORE', 'memory'),
+}
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'projectmanagement.db',
+        # If DATABASE_PATH is set in environment, use that path for SQLite
+        'NAME': os.environ.get('DATABASE_PATH') or os.path.join(BASE_DIR, 'db.sqlite3'),
+        'CONN_MAX_AGE': int(os.environ.get('DATABASE_CONN_MAX_AGE', 600)),  # seconds
+        'CONN_HEALTH_CHECKS': True,
+        'PRAGMAS': SQLITE_PRAGMAS,
+        'TRANSACTION_MODE': os.environ.get('SQLITE_TRANSACTION_MODE', 'IMMEDIATE'),
+        'BUSY_RETRIES': int(os.environ.get('SQLITE_BUSY_RETRIES', 5)),
     }
-else:
-    DATABASES = {
-        'default': {
-            'ENGINE': 'django.db.backends.sqlite3', 
-            'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-        }
+}
+
+# Read-only alias over the same file (projectmanagement.routers). Safe-method
+# API requests and the READ_REPLICA_APPS read through it from a small pool of
+# idle connections; a client that has just written reads from the primary for
+# READ_REPLICA_STICKY_SECONDS.
+READ_REPLICA_ALIAS = 'replica'
+if os.environ.get('READ_REPLICA_ENABLED', 'True').lower() == 'true':
+    DATABASES[READ_REPLICA_ALIAS] = {
+        'ENGINE': 'projectmanagement.db',
+        'NAME': Path(DATABASES['default']['NAME']).resolve().as_uri() + '?mode=ro',
+        # Connections go back to the pool after every request
+        'CONN_MAX_AGE': 0,
+        'POOL_SIZE': int(os.environ.get('READ_REPLICA_POOL_SIZE', 4)),
+        # The journal mode can only be changed through the primary
+        'PRAGMAS': {name: value for name, value in SQLITE_PRAGMAS.items() if name != 'journal_mode'},
+        'BUSY_RETRIES': int(os.environ.get('SQLITE_BUSY_RETRIES', 5)),
+        'TEST': {'MIRROR': 'default'},
     }
+DATABASE_ROUTERS = ['projectmanagement.routers.ReadReplicaRouter']
+READ_REPLICA_APPS = ('analytics',)
+READ_REPLICA_PATH_PREFIXES = ('/api/',)
+READ_REPLICA_STICKY_SECONDS = int(os.environ.get('READ_REPLICA_STICKY_SECONDS', 10))
+
+# Rate limiting (projectmanagement.ratelimit): token buckets in a SQLite side
+# file shared by all worker processes, also used by the DRF throttles. The
+# first policy matching the path (and method, if it lists any) applies, per
+# client IP and, with per_route, per route (ids folded).
+RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', 'True').lower() == 'true'
+RATE_LIMIT_DB_PATH = os.environ.get('RATE_LIMIT_DB_PATH')  # default: ratelimit.sqlite3 next to the database
+RATE_LIMIT_MAX_KEYS = int(os.environ.get('RATE_LIMIT_MAX_KEYS', 50000))
+RATE_LIMIT_TRIM_INTERVAL = 1000  # hits per process between trims
+RATE_LIMIT_POLICIES = [
+    {
+        'name': 'auth',
+        'prefixes': ('/api/auth/', '/api/v1/users/login/', '/api/v1/users/password-reset/', '/accounts/login/'),
+        'methods': ('POST',),
+        'rate': os.environ.get('AUTH_RATE_LIMIT', '5/minute'),
+        'per_route': False,
+    },
+    {'name': 'static', 'prefixes': ('/static/', '/media/'), 'rate': None},
+    {'name': 'api', 'prefixes': ('/api/',), 'rate': os.environ.get('API_RATE_LIMIT', '100/minute')},
+    {'name': 'web', 'prefixes': ('/',), 'rate': os.environ.get('WEB_RATE_LIMIT', '200/minute')},
+]
 
+# Metrics (projectmanagement.metrics): per-view latency, queries and response
+# size plus signal-handler timings, summed across workers in a SQLite side
+# file and served at /api/v1/_metrics to staff or with the bearer METRICS_TOKEN
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'True').lower() == 'true'
+METRICS_DB_PATH = os.environ.get('METRICS_DB_PATH')  # default: metrics.sqlite3 next to the database
+METRICS_FLUSH_INTERVAL = int(os.environ.get('METRICS_FLUSH_INTERVAL', 10))  # seconds
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Query budgets (projectmanagement.querybudget): views declare how many queries
+# they may run, and a statement shape repeated QUERY_N_PLUS_ONE_THRESHOLD times
+# in one request is flagged as a likely N+1. Logged, or raised with
+# QUERY_BUDGET_RAISE, which the test runner turns on.
+QUERY_BUDGET_ENABLED = os.environ.get('QUERY_BUDGET_ENABLED', 'True').lower() == 'true'
+QUERY_BUDGET_RAISE = os.environ.get('QUERY_BUDGET_RAISE', 'False').lower() == 'true'
+QUERY_BUDGET_DEFAULT = None  # for views that declare no budget; None means no limit
+QUERY_BUDGETS = {}  # view name -> budget, overriding what the view declares
+QUERY_N_PLUS_ONE_THRESHOLD = int(os.environ.get('QUERY_N_PLUS_ONE_THRESHOLD', 5))
+
+TEST_RUNNER = 'projectmanagement.testrunner.TestRunner'
+
+# Responses (projectmanagement.middleware.CompressionMiddleware and
+# projectmanagement.renderers): bodies of COMPRESSION_MIN_SIZE bytes or more
+# are compressed, JSON with brotli when the brotli package is installed, and
+# unpaginated lists longer than STREAMING_LIST_THRESHOLD rows are streamed
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))
+COMPRESSION_BROTLI_QUALITY = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', 5))
+STREAMING_LIST_THRESHOLD = int(os.environ.get('STREAMING_LIST_THRESHOLD', 1000))
+
+# Request screening (projectmanagement.screening): requests whose path, query
+# string or user agent contain one of these patterns (case-insensitive) are
+# refused. EXEMPTIONS maps a path prefix to the rule names ('*' for all) that
+# do not apply below it.
+REQUEST_SCREENING_RULES = {
+    'path_traversal': ['../', '..\\'],
+    'probe': ['.env', 'wp-admin', 'phpinfo'],
+    'script_injection': ['<script', 'javascript:', 'vbscript:', 'onload='],
+    'code_injection': ['eval(', 'exec(', '__import__', 'system('],
+    'sql_injection': ['drop table', 'select * from', 'union select'],
+}
+REQUEST_SCREENING_EXEMPTIONS = {}
+REQUEST_SCREENING_MAX_URL_LENGTH = 2048
+REQUEST_SCREENING_MAX_QUERY_PARAMS = 50
+REQUEST_SCREENING_MAX_FORM_FIELDS = 100
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -245,14 +347,18 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',
     ),
     'UNAUTHENTICATED_USER': 'django.contrib.auth.models.AnonymousUser',
+    'DEFAULT_RENDERER_CLASSES': (
+        'projectmanagement.renderers.FastJSONRenderer',  # orjson when installed
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
     'EXCEPTION_HANDLER': 'projectmanagement.utils.custom_exception_handler',
     'DEFAULT_FILTER_BACKENDS': (
         'django_filters.rest_framework.DjangoFilterBackend',
     ),
     'DEFAULT_THROTTLE_CLASSES': [
-        'rest_framework.throttling.AnonRateThrottle',
-        'rest_framework.throttling.UserRateThrottle',
-        'rest_framework.throttling.ScopedRateThrottle',
+        'projectmanagement.throttling.SharedAnonRateThrottle',
+        'projectmanagement.throttling.SharedUserRateThrottle',
+        'projectmanagement.throttling.SharedScopedRateThrottle',
     ],
     'DEFAULT_THROTTLE_RATES': {
         'anon': '100/day',
@@ -344,10 +450,18 @@ CSRF_COOKIE_HTTPONLY = True
 CSRF_COOKIE_SAMESITE = 'Lax'
 
 # Session configuration
-SESSION_ENGINE = 'django.contrib.sessions.backends.db'
+SESSION_ENGINE = 'projectmanagement.sessions'
 SESSION_COOKIE_AGE = 86400  # 1 day in seconds
 SESSION_EXPIRE_AT_BROWSER_CLOSE = False
 SESSION_SAVE_EVERY_REQUEST = True
+# projectmanagement.sessions: an unchanged session is only written again once
+# its expiry would move by SESSION_TOUCH_INTERVAL seconds; recently used
+# sessions are served from a per-process LRU for SESSION_CACHE_TTL seconds
+# (logged-in ones after checking their row still exists, so logouts apply
+# in every worker at once)
+SESSION_TOUCH_INTERVAL = int(os.environ.get('SESSION_TOUCH_INTERVAL', 300))
+SESSION_CACHE_TTL = int(os.environ.get('SESSION_CACHE_TTL', 30))
+SESSION_CACHE_SIZE = int(os.environ.get('SESSION_CACHE_SIZE', 10000))
 
 # ASGI application (simplified, no WebSockets)
 ASGI_APPLICATION = 'projectmanagement.asgi.application'
@@ -364,6 +478,39 @@ EMAIL_HOST_USER = os.environ.get('EMAIL_HOST_USER', '')
 EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_HOST_PASSWORD', '')
 DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', EMAIL_HOST_USER)
 
+# Email outbox (see notifications/delivery.py). Emails are written to the
+# outbox table and delivered in batches by a background sender thread, or by
+# `manage.py send_outbox` when EMAIL_OUTBOX_BACKGROUND_SENDER is disabled.
+EMAIL_OUTBOX_BACKGROUND_SENDER = os.environ.get('EMAIL_OUTBOX_BACKGROUND_SENDER', 'True').lower() == 'true'
+EMAIL_OUTBOX_BATCH_SIZE = int(os.environ.get('EMAIL_OUTBOX_BATCH_SIZE', 50))
+EMAIL_OUTBOX_POLL_INTERVAL = int(os.environ.get('EMAIL_OUTBOX_POLL_INTERVAL', 30))  # seconds
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.environ.get('EMAIL_OUTBOX_MAX_ATTEMPTS', 5))
+EMAIL_OUTBOX_RETRY_BASE_SECONDS = int(os.environ.get('EMAIL_OUTBOX_RETRY_BASE_SECONDS', 30))
+
+# Notification stream (/api/v1/notifications/stream/). Long polls return
+# after NOTIFICATION_STREAM_TIMEOUT seconds without news; event streams stay
+# open for up to NOTIFICATION_STREAM_MAX_DURATION, with a keep-alive comment
+# every NOTIFICATION_STREAM_HEARTBEAT seconds.
+NOTIFICATION_STREAM_TIMEOUT = int(os.environ.get('NOTIFICATION_STREAM_TIMEOUT', 25))  # seconds
+NOTIFICATION_STREAM_MAX_DURATION = int(os.environ.get('NOTIFICATION_STREAM_MAX_DURATION', 300))  # seconds
+NOTIFICATION_STREAM_HEARTBEAT = int(os.environ.get('NOTIFICATION_STREAM_HEARTBEAT', 15))  # seconds
+
+# Background deletion of projects and organizations (projects.deletion).
+# Children are purged DELETION_CHUNK_SIZE rows per transaction; run
+# `manage.py process_deletions` when DELETION_BACKGROUND_WORKER is disabled.
+DELETION_BACKGROUND_WORKER = os.environ.get('DELETION_BACKGROUND_WORKER', 'True').lower() == 'true'
+DELETION_CHUNK_SIZE = int(os.environ.get('DELETION_CHUNK_SIZE', 500))
+DELETION_CHUNK_PAUSE = float(os.environ.get('DELETION_CHUNK_PAUSE', 0))  # seconds between chunks
+
+# User autocomplete: the most results one /api/v1/users/autocomplete/ call returns
+USER_AUTOCOMPLETE_MAX_RESULTS = int(os.environ.get('USER_AUTOCOMPLETE_MAX_RESULTS', 20))
+
+# Profile picture variants (users.avatars): square WebP renditions rendered by
+# AVATAR_WORKERS background threads after upload (0 renders inline)
+AVATAR_SIZES = (32, 64, 128)
+AVATAR_WEBP_QUALITY = int(os.environ.get('AVATAR_WEBP_QUALITY', 80))
+AVATAR_WORKERS = int(os.environ.get('AVATAR_WORKERS', 2))
+
 # Media files
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
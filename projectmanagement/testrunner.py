@@ -0,0 +1,20 @@
+"""
+The test runner for ``manage.py test`` (TEST_RUNNER in settings).
+
+Tests run with QUERY_BUDGET_RAISE on, so a view that goes over its query
+budget or runs an N+1 fails the test that exercised it rather than only
+logging a warning, as it does in production.
+"""
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._test_settings = override_settings(QUERY_BUDGET_RAISE=True)
+        self._test_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._test_settings.disable()
+        super().teardown_test_environment(**kwargs)
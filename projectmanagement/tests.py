@@ -0,0 +1,1081 @@
+import base64
+import decimal
+import gzip
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import uuid
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+from urllib.parse import urlencode
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import CommandError
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections, transaction
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import get_resolver
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APIRequestFactory
+
+from analytics.models import ProjectMetric
+from notifications.models import Notification, NotificationReadState
+from notifications.utils import fan_out_notification
+from organizations.models import Organization, OrganizationInvitation, OrganizationMember
+from projectmanagement.db import base as db_base
+from projectmanagement.db.base import DatabaseWrapper, busy_stats, reset_busy_stats
+from projectmanagement.metrics import MetricsRegistry, get_registry, labels_text, timed_handler
+from projectmanagement import middleware as pm_middleware
+from projectmanagement.middleware import CompressionMiddleware, ReadReplicaMiddleware
+from projectmanagement.querybudget import QueryBudgetExceeded, QueryLog, budget_for, check, sql_shape
+from projectmanagement.ratelimit import RateLimiter, get_limiter, parse_rate, route_key
+from projectmanagement.renderers import FastJSONRenderer
+from projectmanagement.routers import use_replica
+from projectmanagement.screening import RequestScreen, get_screen
+from projectmanagement.sessions import SessionStore, clear_session_cache, reset_session_stats, session_stats
+from projectmanagement.throttling import SharedScopedRateThrottle
+from projects.models import Board, Column, Project, ProjectMember
+from tasks.models import Label, Task
+from tasks.serializers import TaskSerializer, TaskValuesSerializer
+
+User = get_user_model()
+
+
+class TunedSQLiteBackendTests(SimpleTestCase):
+    """Test cases for the projectmanagement.db SQLite backend"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'test.sqlite3')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def make_wrapper(self, alias='tuned_test', **overrides):
+        database = {
+            'ENGINE': 'projectmanagement.db',
+            'NAME': self.path,
+            'PRAGMAS': {
+                'journal_mode': 'wal',
+                'synchronous': 'normal',
+                'busy_timeout': 0,
+                'mmap_size': 1048576,
+                'cache_size': -2000,
+                'temp_store': 'memory',
+            },
+            'TRANSACTION_MODE': 'IMMEDIATE',
+            'BUSY_RETRIES': 10,
+            'BUSY_BACKOFF': 0.02,
+            **overrides,
+        }
+        wrapper = DatabaseWrapper(
+            connections.configure_settings({DEFAULT_DB_ALIAS: database})[DEFAULT_DB_ALIAS], alias=alias
+        )
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def pragma(self, wrapper, name):
+        with wrapper.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_applied_to_new_connections(self):
+        wrapper = self.make_wrapper()
+        self.assertEqual(self.pragma(wrapper, 'journal_mode'), 'wal')
+        self.assertEqual(self.pragma(wrapper, 'synchronous'), 1)
+        self.assertEqual(self.pragma(wrapper, 'mmap_size'), 1048576)
+        self.assertEqual(self.pragma(wrapper, 'cache_size'), -2000)
+        self.assertEqual(self.pragma(wrapper, 'temp_store'), 2)
+        self.assertEqual(self.pragma(wrapper, 'foreign_keys'), 1)
+
+    def test_invalid_settings_are_rejected(self):
+        with self.assertRaises(ImproperlyConfigured):
+            self.make_wrapper(PRAGMAS={'journal_mode': 'wal; DROP TABLE x'})
+        with self.assertRaises(ImproperlyConfigured):
+            self.make_wrapper(TRANSACTION_MODE='LAZY')
+
+    def test_transactions_take_the_write_lock_up_front(self):
+        wrapper = self.make_wrapper()
+        with wrapper.cursor() as cursor:
+            cursor.execute('CREATE TABLE item (id INTEGER PRIMARY KEY)')
+        other = sqlite3.connect(self.path, timeout=0, isolation_level=None)
+        self.addCleanup(other.close)
+
+        wrapper.set_autocommit(True)
+        wrapper._start_transaction_under_autocommit()
+        try:
+            with self.assertRaisesMessage(sqlite3.OperationalError, 'database is locked'):
+                other.execute('BEGIN IMMEDIATE')
+        finally:
+            wrapper.connection.rollback()
+
+    def test_busy_statements_are_retried(self):
+        wrapper = self.make_wrapper()
+        with wrapper.cursor() as cursor:
+            cursor.execute('CREATE TABLE item (id INTEGER PRIMARY KEY)')
+
+        holder = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        self.addCleanup(holder.close)
+        holder.execute('BEGIN EXCLUSIVE')
+        release = threading.Timer(0.15, holder.execute, args=('COMMIT',))
+        release.start()
+        self.addCleanup(release.cancel)
+
+        reset_busy_stats()
+        with wrapper.cursor() as cursor:
+            cursor.execute('INSERT INTO item (id) VALUES (1)')
+        self.assertGreater(busy_stats()['retries'], 0)
+        self.assertEqual(busy_stats()['gave_up'], 0)
+
+    def test_read_only_pool_reuses_connections(self):
+        with sqlite3.connect(self.path) as setup:
+            setup.execute('CREATE TABLE item (id INTEGER PRIMARY KEY)')
+        alias = 'pool_test'
+        self.addCleanup(lambda: [conn.close() for conn in db_base._pools.pop(alias, [])])
+        wrapper = self.make_wrapper(
+            alias=alias,
+            NAME=Path(self.path).as_uri() + '?mode=ro',
+            PRAGMAS={'busy_timeout': 1000},
+            TRANSACTION_MODE='DEFERRED',
+            POOL_SIZE=1,
+        )
+
+        wrapper.ensure_connection()
+        raw = wrapper.connection
+        wrapper.close()
+        self.assertEqual(db_base._pools[alias], [raw])
+        wrapper.ensure_connection()
+        self.assertIs(wrapper.connection, raw)
+
+        with self.assertRaisesMessage(OperationalError, 'readonly'):
+            with wrapper.cursor() as cursor:
+                cursor.execute('INSERT INTO item (id) VALUES (1)')
+
+    def test_project_uses_the_tuned_backend(self):
+        self.assertIsInstance(connections[DEFAULT_DB_ALIAS], DatabaseWrapper)
+
+    def test_contention_benchmark_runs(self):
+        out = StringIO()
+        call_command('sqlite_contention_bench', threads=2, requests=5, json=True, stdout=out)
+        results = json.loads(out.getvalue())
+        self.assertEqual([result['mode'] for result in results], ['baseline', 'tuned'])
+        self.assertEqual(results[1]['requests'], 10)
+
+
+class ReadReplicaRoutingTests(TransactionTestCase):
+    """Test cases for the read/write split between default and replica
+
+    TransactionTestCase, because reads inside an open transaction on the
+    primary are never routed to the replica.
+    """
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def test_router(self):
+        self.assertEqual(User.objects.all().db, 'default')
+        self.assertEqual(ProjectMetric.objects.all().db, 'replica')
+        with use_replica():
+            self.assertEqual(User.objects.all().db, 'replica')
+            with transaction.atomic():
+                # Reads inside a write transaction must see its changes
+                self.assertEqual(User.objects.all().db, 'default')
+        with use_replica(False):
+            self.assertEqual(ProjectMetric.objects.all().db, 'default')
+        self.assertEqual(User.objects.db_manager().create_user(
+            username='writer', email='writer@example.com', password='testpassword'
+        )._state.db, 'default')
+
+    def route(self, request, model=User):
+        used = []
+
+        def view(request):
+            used.append(model.objects.all().db)
+            return HttpResponse()
+
+        response = ReadReplicaMiddleware(view)(request)
+        return used[0], response
+
+    def test_safe_api_requests_read_from_replica(self):
+        self.assertEqual(self.route(self.factory.get('/api/v1/projects/'))[0], 'replica')
+        self.assertEqual(self.route(self.factory.get('/projects/'))[0], 'default')
+
+    def test_pages_leave_routing_to_the_router(self):
+        # Outside the API only the READ_REPLICA_APPS read from the replica
+        self.assertEqual(self.route(self.factory.get('/dashboard/'), ProjectMetric)[0], 'replica')
+        self.assertEqual(self.route(self.factory.post('/dashboard/'), ProjectMetric)[0], 'default')
+        with use_replica(False):
+            with use_replica(None):
+                self.assertEqual(ProjectMetric.objects.all().db, 'replica')
+
+    def test_reads_stick_to_primary_after_a_write(self):
+        alias, response = self.route(self.factory.post('/api/v1/projects/'))
+        self.assertEqual(alias, 'default')
+        cookie = response.cookies['pm_primary_until']
+
+        request = self.factory.get('/api/v1/projects/')
+        request.COOKIES['pm_primary_until'] = cookie.value
+        self.assertEqual(self.route(request)[0], 'default')
+
+        request.COOKIES['pm_primary_until'] = '0'
+        self.assertEqual(self.route(request)[0], 'replica')
+
+
+class RateLimiterTests(SimpleTestCase):
+    """Test cases for the shared token bucket rate limiter"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = os.path.join(self.directory.name, 'ratelimit.sqlite3')
+        self.limiter = RateLimiter(self.path, max_keys=2, trim_interval=1000)
+
+    def test_token_bucket(self):
+        now = 1000.0
+        decisions = [self.limiter.hit('client', 3, 60, now=now) for _ in range(4)]
+        self.assertEqual([decision.allowed for decision in decisions], [True, True, True, False])
+        self.assertAlmostEqual(decisions[-1].retry_after, 20)
+
+        # One token comes back every 20 seconds
+        self.assertFalse(self.limiter.hit('client', 3, 60, now=now + 19).allowed)
+        self.assertTrue(self.limiter.hit('client', 3, 60, now=now + 40).allowed)
+        self.assertTrue(self.limiter.hit('other', 3, 60, now=now).allowed)
+
+    def test_limits_are_shared_between_processes(self):
+        # A second limiter on the same file stands in for another worker
+        other_worker = RateLimiter(self.path)
+        allowed = [
+            limiter.hit('client', 5, 60).allowed
+            for limiter in [self.limiter, other_worker] * 5
+        ]
+        self.assertEqual(allowed.count(True), 5)
+
+    def test_concurrent_hits_never_exceed_the_limit(self):
+        allowed = []
+        lock = threading.Lock()
+
+        def worker():
+            results = [self.limiter.hit('client', 50, 3600).allowed for _ in range(20)]
+            with lock:
+                allowed.extend(results)
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(allowed.count(True), 50)
+
+    def test_trim_drops_full_then_least_recently_used_buckets(self):
+        self.limiter.hit('refilled', 10, 10, now=1000)
+        for number in range(3):
+            self.limiter.hit(f'recent-{number}', 10, 100, now=1010 + number)
+        self.limiter.trim(now=1012)
+        self.assertEqual(self.limiter.count(), 2)
+
+    def test_helpers(self):
+        self.assertEqual(parse_rate('100/minute'), (100, 60))
+        self.assertEqual(parse_rate('10/30s'), (10, 30))
+        self.assertEqual(
+            route_key('/api/v1/tasks/3f2b6a4e-8c1d-4d2a-9e7f-0a1b2c3d4e5f/comments/12/'),
+            '/api/v1/tasks/*/comments/*/'
+        )
+
+
+class RateLimitMiddlewareTests(TestCase):
+    """Test cases for the rate limiting in SecurityMiddleware and the DRF throttles"""
+
+    def setUp(self):
+        get_limiter().reset()
+
+    @override_settings(RATE_LIMIT_POLICIES=[
+        {'name': 'static', 'prefixes': ('/static/',), 'rate': None},
+        {'name': 'api', 'prefixes': ('/api/',), 'rate': '2/minute'},
+    ])
+    def test_limit_per_client_and_route(self):
+        statuses = [self.client.get('/api/v1/health/').status_code for _ in range(3)]
+        self.assertEqual(statuses, [200, 200, 429])
+        response = self.client.get('/api/v1/health/')
+        self.assertEqual(int(response['Retry-After']), 30)
+
+        self.assertEqual(self.client.get('/api/health/').status_code, 200)
+        self.assertEqual(
+            self.client.get('/api/v1/health/', REMOTE_ADDR='10.0.0.2').status_code, 200
+        )
+
+    def test_drf_scoped_throttle_uses_shared_limiter(self):
+        class TestThrottle(SharedScopedRateThrottle):
+            THROTTLE_RATES = {'test_scope': '2/minute'}
+
+        class View:
+            throttle_scope = 'test_scope'
+
+        request = APIRequestFactory().get('/api/v1/anything/')
+        request.user = type('Anonymous', (), {'is_authenticated': False})()
+        allowed = [TestThrottle().allow_request(request, View()) for _ in range(3)]
+        self.assertEqual(allowed, [True, True, False])
+
+        throttle = TestThrottle()
+        throttle.allow_request(request, View())
+        self.assertAlmostEqual(throttle.wait(), 30, delta=1)
+
+
+class RequestScreeningTests(SimpleTestCase):
+    """Test cases for the compiled request screening"""
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.screen = RequestScreen(
+            {'probe': ['.env', 'wp-admin'], 'sql_injection': ['UNION SELECT', 'union all']},
+            {'/admin/': ['probe'], '/uploads/': ['*']},
+            max_url_length=100,
+            max_query_params=3,
+        )
+
+    def test_rules_match_case_insensitively(self):
+        self.assertEqual(self.screen.check(self.factory.get('/.ENV')), 'probe')
+        self.assertEqual(self.screen.check(self.factory.get('/search/?q=1+union+select')), None)
+        self.assertEqual(
+            self.screen.check(self.factory.get('/', HTTP_USER_AGENT='x Union Select y')), 'sql_injection'
+        )
+        self.assertIsNone(self.screen.check(self.factory.get('/projects/', HTTP_USER_AGENT='Mozilla/5.0')))
+
+    def test_exemptions_by_path_prefix(self):
+        self.assertIsNone(self.screen.check(self.factory.get('/admin/wp-admin/')))
+        self.assertEqual(self.screen.check(self.factory.get('/admin/wp-admin/union all')), 'sql_injection')
+        self.assertIsNone(self.screen.check(self.factory.get('/uploads/.env/union all')))
+
+    def test_size_limits(self):
+        self.assertEqual(self.screen.check(self.factory.get('/' + 'a' * 100)), 'url_length')
+        self.assertEqual(self.screen.check(self.factory.get('/', {'a': 1, 'b': 2, 'c': 3, 'd': 4})), 'query_params')
+        self.assertIsNone(self.screen.check(self.factory.get('/', {'a': 1, 'b': 2, 'c': 3})))
+        post = self.factory.post(
+            '/', urlencode({str(number): number for number in range(101)}),
+            content_type='application/x-www-form-urlencoded',
+        )
+        self.assertEqual(self.screen.check(post), 'form_fields')
+
+    @override_settings(REQUEST_SCREENING_EXEMPTIONS={'/api/v1/health/': ['*']})
+    def test_screen_follows_settings(self):
+        self.assertIsNone(get_screen().check(self.factory.get('/api/v1/health/.env')))
+        self.assertEqual(get_screen().check(self.factory.get('/api/v1/.env')), 'probe')
+
+    def test_middleware_blocks_suspicious_requests(self):
+        get_limiter().reset()
+        with self.assertLogs('projectmanagement.security_middleware', 'WARNING') as logs:
+            response = self.client.get('/api/v1/health/', HTTP_USER_AGENT="' UNION SELECT 1 --")
+        self.assertEqual(response.status_code, 403)
+        self.assertIn('sql_injection', logs.output[0])
+
+    def test_benchmark_runs(self):
+        out = StringIO()
+        call_command('bench_screening', iterations=2, json=True, stdout=out)
+        results = json.loads(out.getvalue())
+        self.assertEqual([result['engine'] for result in results], ['legacy', 'compiled'])
+        # The legacy patterns were upper case and never matched the lowered request
+        self.assertEqual([result['blocked'] for result in results], [1, 2])
+
+
+class LowWriteSessionTests(TestCase):
+    """Test cases for the cached session store with throttled touches"""
+
+    def setUp(self):
+        clear_session_cache()
+        reset_session_stats()
+        get_limiter().reset()
+        self.user = User.objects.create_user(
+            username='sessionuser', email='session@example.com', password='testpassword'
+        )
+        self.client.force_login(self.user)
+        self.session_key = self.client.cookies['sessionid'].value
+
+    def stored_expiry(self):
+        return Session.objects.get(session_key=self.session_key).expire_date
+
+    def test_unchanged_sessions_are_not_rewritten(self):
+        expiry = self.stored_expiry()
+        for _ in range(3):
+            response = self.client.get('/api/v1/health/')
+            # The cookie still slides on every response
+            self.assertIn('sessionid', response.cookies)
+        self.assertEqual(self.stored_expiry(), expiry)
+        self.assertEqual(session_stats()['touches_skipped'], 3)
+
+    @override_settings(SESSION_TOUCH_INTERVAL=0)
+    def test_touch_interval_zero_writes_every_request(self):
+        expiry = self.stored_expiry()
+        self.client.get('/api/v1/health/')
+        self.assertGreater(self.stored_expiry(), expiry)
+        self.assertEqual(session_stats()['touches_skipped'], 0)
+
+    def test_expiry_is_refreshed_once_the_interval_passes(self):
+        Session.objects.filter(session_key=self.session_key).update(
+            expire_date=timezone.now() + timedelta(seconds=60)
+        )
+        clear_session_cache()
+        self.client.get('/api/v1/health/')
+        self.assertGreater(self.stored_expiry(), timezone.now() + timedelta(hours=23))
+
+    @override_settings(SESSION_TOUCH_INTERVAL=0)
+    def test_touches_leave_other_processes_changes_alone(self):
+        stale = SessionStore(self.session_key)
+        stale._get_session()
+        # Another worker changes the session after this one loaded it
+        other = SessionStore(self.session_key)
+        other['theme'] = 'dark'
+        other.save()
+        expiry = self.stored_expiry()
+        stale.save()
+        self.assertGreater(self.stored_expiry(), expiry)
+        self.assertEqual(SessionStore(self.session_key)['theme'], 'dark')
+
+    def test_changed_sessions_are_written(self):
+        store = SessionStore(self.session_key)
+        store['theme'] = 'dark'
+        store.save()
+        self.assertEqual(SessionStore(self.session_key)['theme'], 'dark')
+        clear_session_cache()
+        self.assertEqual(SessionStore(self.session_key)['theme'], 'dark')
+
+    def test_reads_are_served_from_the_cache(self):
+        anonymous = SessionStore()
+        anonymous['theme'] = 'dark'
+        anonymous.create()
+        with self.assertNumQueries(0):
+            self.assertEqual(SessionStore(anonymous.session_key).load(), {'theme': 'dark'})
+        self.assertGreater(session_stats()['hits'], 0)
+
+        SessionStore(self.session_key).load()
+        # Logged-in sessions only check that their row is still there
+        with self.assertNumQueries(1) as context:
+            self.assertIn('_auth_user_id', SessionStore(self.session_key).load())
+        self.assertNotIn('session_data', context.captured_queries[0]['sql'])
+
+        with override_settings(SESSION_CACHE_TTL=0):
+            with self.assertNumQueries(1):
+                SessionStore(self.session_key).load()
+
+    def test_logout_in_another_process_ends_the_session(self):
+        self.assertEqual(self.client.get('/api/v1/users/me/').status_code, 200)
+        # What another worker's logout does; this process' cache is not told
+        Session.objects.filter(session_key=self.session_key).delete()
+        self.assertEqual(SessionStore(self.session_key).load(), {})
+        self.assertIn(self.client.get('/api/v1/users/me/').status_code, (401, 403))
+
+    def test_deleted_and_expired_sessions_are_not_served(self):
+        SessionStore(self.session_key).load()
+        SessionStore(self.session_key).delete()
+        self.assertEqual(SessionStore(self.session_key).load(), {})
+        self.assertEqual(self.client.get('/api/v1/health/').status_code, 200)
+
+        store = SessionStore()
+        store['key'] = 'value'
+        store.create()
+        Session.objects.filter(session_key=store.session_key).update(expire_date=timezone.now())
+        clear_session_cache()
+        self.assertEqual(SessionStore(store.session_key).load(), {})
+
+
+class MetricsTests(TestCase):
+    """Test cases for the metrics middleware, registry and endpoint"""
+
+    def setUp(self):
+        get_limiter().reset()
+        get_registry().reset()
+        self.staff = User.objects.create_user(
+            username='metricsadmin', email='metrics@example.com', password='testpassword', is_staff=True
+        )
+
+    def test_requests_are_recorded_per_view(self):
+        for _ in range(2):
+            self.client.get('/api/v1/health/')
+        self.client.get('/no-such-page/')
+        text = get_registry().render()
+        self.assertIn('pm_http_requests_total{view="health_check",method="GET",status="200"} 2', text)
+        self.assertIn('pm_http_request_duration_seconds_count{view="health_check",method="GET"} 2', text)
+        self.assertIn('pm_http_request_duration_seconds_bucket{view="health_check",method="GET",le="+Inf"} 2', text)
+        self.assertIn('pm_http_db_queries_total{view="health_check",method="GET"}', text)
+        self.assertIn('pm_http_response_bytes_total{view="health_check",method="GET"}', text)
+        self.assertIn('pm_http_requests_total{view="unmatched",method="GET",status="404"} 1', text)
+
+    def test_signal_handlers_are_timed(self):
+        from analytics import signals as analytics_signals
+        self.assertTrue(hasattr(analytics_signals.update_project_metrics_on_task_change, '__wrapped__'))
+
+        @timed_handler
+        def handler(sender, **kwargs):
+            return 'done'
+
+        self.assertEqual(handler(None), 'done')
+        name = f'{__name__}.handler'
+        self.assertIn(
+            f'pm_signal_handler_duration_seconds_count{{{labels_text(handler=name)}}} 1',
+            get_registry().render()
+        )
+
+    def test_samples_are_shared_between_processes(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'metrics.sqlite3')
+        # A second registry on the same file stands in for another worker
+        workers = [MetricsRegistry(path, flush_interval=3600), MetricsRegistry(path, flush_interval=3600)]
+        for worker in workers:
+            worker.record_request('task-list', 'GET', 200, 0.02, 3, 0.001, 512)
+            worker.flush()
+        text = workers[0].render()
+        self.assertIn('pm_http_requests_total{view="task-list",method="GET",status="200"} 2', text)
+        self.assertIn('pm_http_db_queries_total{view="task-list",method="GET"} 6', text)
+        self.assertIn('pm_http_request_duration_seconds_bucket{view="task-list",method="GET",le="0.01"} 0', text)
+        self.assertIn('pm_http_request_duration_seconds_bucket{view="task-list",method="GET",le="0.025"} 2', text)
+
+    def test_endpoint_requires_staff_or_token(self):
+        self.assertIn(self.client.get('/api/v1/_metrics').status_code, (401, 403))
+
+        self.client.force_login(self.staff)
+        response = self.client.get('/api/v1/_metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        self.assertIn(b'# TYPE pm_http_request_duration_seconds histogram', response.content)
+        self.client.logout()
+
+        with override_settings(METRICS_TOKEN='scrape-secret'):
+            response = self.client.get('/api/v1/_metrics', HTTP_AUTHORIZATION='Bearer scrape-secret')
+            self.assertEqual(response.status_code, 200)
+            response = self.client.get('/api/v1/_metrics', HTTP_AUTHORIZATION='Bearer wrong')
+            self.assertIn(response.status_code, (401, 403))
+
+
+def _log(*statements):
+    log = QueryLog()
+    for sql in statements:
+        log(lambda *args: None, sql, None, False, {})
+    return log
+
+
+def _router_views(resolver=None):
+    """The viewset views behind every URL pattern"""
+    for pattern in (resolver or get_resolver()).url_patterns:
+        if hasattr(pattern, 'url_patterns'):
+            yield from _router_views(pattern)
+        elif getattr(pattern.callback, 'actions', None):
+            yield pattern.callback
+
+
+class QueryBudgetTests(TestCase):
+    """Test cases for query budgets and the N+1 detector"""
+
+    def setUp(self):
+        get_limiter().reset()
+        self.admin = User.objects.create_user(username='admin', email='admin@example.com', password='password123')
+        self.organization = Organization.objects.create(name='Budget Org')
+        OrganizationMember.objects.create(organization=self.organization, user=self.admin, role=OrganizationMember.ADMIN)
+        self.project = Project.objects.create(name='Budget Project', organization=self.organization, created_by=self.admin)
+        ProjectMember.objects.get_or_create(project=self.project, user=self.admin, defaults={'role': 'admin'})
+
+    def add_members(self, count):
+        start = ProjectMember.objects.filter(project=self.project).count()
+        for i in range(start, start + count):
+            user = User.objects.create_user(username=f'member{i}', email=f'member{i}@example.com', password='password123')
+            OrganizationMember.objects.create(organization=self.organization, user=user)
+            ProjectMember.objects.get_or_create(project=self.project, user=user)
+            OrganizationInvitation.objects.create(
+                organization=self.organization, email=f'invitee{i}@example.com', invited_by=self.admin
+            )
+
+    def test_parameter_lists_are_one_shape(self):
+        self.assertEqual(
+            sql_shape('SELECT * FROM t WHERE id IN (%s, %s, %s)'),
+            sql_shape('SELECT * FROM t WHERE id IN (%s)')
+        )
+        log = _log('BEGIN IMMEDIATE', 'SELECT 1', 'COMMIT')
+        self.assertEqual(log.count, 1)
+
+    def test_repeated_selects_are_reported(self):
+        log = _log(*['SELECT * FROM t WHERE id = %s'] * 5 + ['INSERT INTO t VALUES (%s)'] * 5)
+        self.assertEqual(log.repeated(5), [('SELECT * FROM t WHERE id = %s', 5)])
+
+        with self.assertRaises(QueryBudgetExceeded) as raised:
+            check('task-list', log, budget=20)
+        self.assertIn('possible N+1, ran 5 times', str(raised.exception))
+
+    def test_over_budget_raises_or_logs(self):
+        log = _log('SELECT 1', 'SELECT 2', 'SELECT 3')
+        self.assertEqual(check('task-list', log, budget=3), [])
+        with self.assertRaises(QueryBudgetExceeded):
+            check('task-list', log, budget=2)
+
+        with override_settings(QUERY_BUDGET_RAISE=False):
+            with self.assertLogs('projectmanagement.querybudget', 'WARNING') as logs:
+                check('task-list', log, budget=2)
+        self.assertIn('task-list: 3 queries, over its budget of 2', logs.output[0])
+
+    def test_budgets_by_action_and_setting(self):
+        view = next(v for v in _router_views() if v.cls.__name__ == 'TaskViewSet')
+        self.assertEqual(budget_for(view, 'task-list', 'list'), view.cls.query_budget['list'])
+        self.assertEqual(budget_for(view, 'task-list', 'move_task'), view.cls.query_budget['default'])
+        with override_settings(QUERY_BUDGETS={'task-list': 1}):
+            self.assertEqual(budget_for(view, 'task-list', 'list'), 1)
+
+    def test_every_viewset_declares_a_budget(self):
+        views = list(_router_views())
+        self.assertTrue(views)
+        for view in views:
+            self.assertIsNotNone(getattr(view.cls, 'query_budget', None), view.cls.__name__)
+
+    def test_list_endpoints_are_not_n_plus_one(self):
+        # The budget middleware raises under test, so these fail on any N+1
+        self.client.force_login(self.admin)
+        urls = [
+            f'/api/v1/projects/{self.project.id}/members/',
+            f'/api/v1/organizations/{self.organization.id}/invitations/',
+            f'/api/v1/analytics/projects/{self.project.id}/productivity/rankings/',
+        ]
+        counts = {}
+        for members in (1, 7):
+            self.add_members(members)
+            for url in urls:
+                with CaptureQueriesContext(connections[DEFAULT_DB_ALIAS]) as queries:
+                    self.assertEqual(self.client.get(url).status_code, 200, url)
+                counts.setdefault(url, []).append(len(queries))
+        for url, (few, many) in counts.items():
+            self.assertEqual(few, many, url)
+
+    def test_session_authenticated_requests_fit_their_budgets(self):
+        # The session store's own queries don't count against the view's budget
+        board = Board.objects.create(name='Budget Board', project=self.project, created_by=self.admin)
+        column = Column.objects.create(name='To Do', board=board, order=0)
+        task = Task.objects.create(title='Budget Task', column=column, created_by=self.admin)
+        Label.objects.create(name='Bug', color='#ff0000', project=self.project)
+        self.client.force_login(self.admin)
+        project = f'/api/v1/projects/{self.project.id}'
+        columns = f'{project}/boards/{board.id}/columns'
+        urls = [
+            '/api/v1/users/', '/api/v1/users/me/', f'/api/v1/users/{self.admin.id}/',
+            '/api/v1/organizations/', f'/api/v1/organizations/{self.organization.id}/',
+            f'/api/v1/organizations/{self.organization.id}/members/',
+            f'/api/v1/organizations/{self.organization.id}/invitations/',
+            '/api/v1/projects/', f'{project}/', f'{project}/members/', f'{project}/boards/',
+            f'{project}/boards/{board.id}/', f'{columns}/',
+            f'{columns}/{column.id}/tasks/', f'{project}/tasks/', f'{project}/activity_logs/',
+            '/api/v1/tasks/', f'/api/v1/tasks/{task.id}/', f'/api/v1/tasks/projects/{self.project.id}/labels/',
+            '/api/v1/notifications/',
+            f'/api/v1/analytics/organizations/{self.organization.id}/activities/',
+            f'/api/v1/analytics/projects/{self.project.id}/metrics/',
+            f'/api/v1/analytics/projects/{self.project.id}/metrics/summary/',
+            f'/api/v1/analytics/projects/{self.project.id}/productivity/rankings/',
+            '/api/v1/activity-logs/',
+        ]
+        for url in urls:
+            # Twice: once with the session cache cold, once warm
+            for _ in range(2):
+                self.assertEqual(self.client.get(url).status_code, 200, url)
+
+
+class BenchCommandTests(TestCase):
+    """Test cases for the seed_bench and bench commands"""
+
+    def seed(self, *args):
+        out = StringIO()
+        call_command(
+            'seed_bench', '--orgs', '1', '--users', '4', '--projects', '1', '--columns', '3', '--tasks', '4',
+            '--notifications', '3', '--json', *args, stdout=out
+        )
+        return json.loads(out.getvalue())
+
+    def test_seed_bench_generates_a_dataset(self):
+        rows = self.seed()['rows']
+        self.assertEqual(rows['tasks.Task'], 12)
+        self.assertEqual(rows['projects.Column'], 3)
+        self.assertEqual(Task.objects.filter(title__isnull=False).count(), 12)
+        self.assertEqual(User.objects.filter(email__endswith='@bench.example.com').count(), 4)
+        # Timestamps are spread out instead of all being now
+        self.assertLess(Task.objects.earliest('created_at').created_at, timezone.now() - timedelta(hours=1))
+
+        with self.assertRaises(CommandError):
+            self.seed()
+        self.assertEqual(self.seed('--flush')['rows']['tasks.Task'], 12)
+        self.assertEqual(Task.objects.count(), 12)
+
+    def test_bench_reports_every_scenario(self):
+        self.seed()
+        task = Task.objects.order_by('column__order', 'order').first()
+        column_id = task.column_id
+        out = StringIO()
+        call_command('bench', iterations=2, warmup=0, json=True, stdout=out)
+        report = json.loads(out.getvalue())
+
+        names = [result['name'] for result in report['results']]
+        self.assertIn('task_list', names)
+        self.assertIn('task_move', names)
+        for result in report['results']:
+            self.assertEqual(result['errors'], 0, result)
+            self.assertEqual(result['samples'], 2)
+            self.assertGreater(result['queries'], 0)
+        self.assertEqual(report['meta']['dataset']['project_tasks'], 12)
+        # The moved task ends up back where it was
+        task.refresh_from_db()
+        self.assertEqual(task.column_id, column_id)
+
+    def test_bench_rejects_bad_sample_counts(self):
+        self.seed()
+        for options in ({'iterations': 0}, {'iterations': -1}, {'warmup': -1}):
+            with self.assertRaises(CommandError, msg=options):
+                call_command('bench', json=True, stdout=StringIO(), **options)
+
+
+class AsyncViewTests(TestCase):
+    """Test cases for the async API views and the hybrid middleware"""
+
+    def setUp(self):
+        get_limiter().reset()
+        self.user = User.objects.create_user(username='async', email='async@example.com', password='password123')
+        self.outsider = User.objects.create_user(username='outsider', email='outsider@example.com', password='password123')
+        organization = Organization.objects.create(name='Async Org')
+        OrganizationMember.objects.create(organization=organization, user=self.user, role=OrganizationMember.ADMIN)
+        self.project = Project.objects.create(name='Async Project', organization=organization, created_by=self.user)
+        ProjectMember.objects.get_or_create(project=self.project, user=self.user, defaults={'role': 'admin'})
+        self.board = Board.objects.create(name='Board', project=self.project, created_by=self.user, is_default=True)
+        self.columns = [Column.objects.create(name=name, board=self.board, order=i) for i, name in enumerate(['To Do', 'Done'])]
+        label = Label.objects.create(name='bug', project=self.project)
+        now = timezone.now()
+        self.tasks = []
+        for i, (column, days) in enumerate([(0, 2), (0, 30), (1, -1)]):
+            task = Task.objects.create(
+                title=f'Task {i}', column=self.columns[column], order=i, created_by=self.user,
+                due_date=now + timedelta(days=days),
+            )
+            task.labels.add(label)
+            task.assignees.add(self.user)
+            self.tasks.append(task)
+        self.snapshot_url = f'/api/v1/projects/{self.project.id}/boards/{self.board.id}/snapshot/'
+
+    def test_middleware_runs_both_ways(self):
+        for path in settings.MIDDLEWARE:
+            self.assertTrue(getattr(import_string(path), 'async_capable', False), path)
+
+        async def get_response(request):
+            return HttpResponse()
+
+        self.assertTrue(iscoroutinefunction(ReadReplicaMiddleware(get_response)))
+        self.assertFalse(iscoroutinefunction(ReadReplicaMiddleware(lambda request: HttpResponse())))
+
+    async def test_board_snapshot(self):
+        await self.async_client.aforce_login(self.user)
+
+        response = await self.async_client.get(self.snapshot_url)
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['id'], str(self.board.id))
+        self.assertEqual([column['name'] for column in data['columns']], ['To Do', 'Done'])
+        self.assertEqual([task['title'] for task in data['columns'][0]['tasks']], ['Task 0', 'Task 1'])
+        task = data['columns'][1]['tasks'][0]
+        self.assertEqual(task['column_name'], 'Done')
+        self.assertEqual([label['name'] for label in task['labels']], ['bug'])
+        self.assertEqual([user['username'] for user in task['assignees']], ['async'])
+
+    async def test_board_snapshot_is_hidden_from_non_members(self):
+        await self.async_client.aforce_login(self.outsider)
+        self.assertEqual((await self.async_client.get(self.snapshot_url)).status_code, 404)
+
+    async def test_queries_in_async_views_are_counted(self):
+        await sync_to_async(get_registry().reset)()
+        await self.async_client.aforce_login(self.user)
+
+        await self.async_client.get(self.snapshot_url)
+        text = await sync_to_async(get_registry().render)()
+        self.assertRegex(text, r'pm_http_db_queries_total\{view="board-snapshot",method="GET"\} [1-9]')
+
+        # The ORM calls run in a worker thread; the budget still sees them
+        with override_settings(QUERY_BUDGETS={'board-snapshot': 2}):
+            with self.assertRaises(QueryBudgetExceeded):
+                await self.async_client.get(self.snapshot_url)
+
+    async def test_unread_count(self):
+        self.assertEqual((await self.async_client.get('/api/v1/notifications/unread_count/')).status_code, 403)
+        await self.async_client.aforce_login(self.user)
+
+        # Without a read state row yet, and with one
+        await NotificationReadState.objects.filter(user=self.user).adelete()
+        response = await self.async_client.get('/api/v1/notifications/unread_count/')
+        state = await NotificationReadState.objects.aget(user=self.user)
+        self.assertEqual(response.json(), {'unread_count': state.unread_count})
+        await NotificationReadState.objects.filter(user=self.user).aupdate(unread_count=7)
+        response = await self.async_client.get('/api/v1/notifications/unread_count/')
+        self.assertEqual(response.json(), {'unread_count': 7})
+        self.assertEqual((await self.async_client.post('/api/v1/notifications/unread_count/')).status_code, 405)
+
+    def test_basic_authentication(self):
+        NotificationReadState.objects.filter(user=self.user).update(unread_count=3)
+        credentials = base64.b64encode(b'async@example.com:password123').decode()
+        response = self.client.get('/api/v1/notifications/unread_count/', HTTP_AUTHORIZATION=f'Basic {credentials}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {'unread_count': 3})
+
+    async def test_dashboard_views(self):
+        await self.async_client.aforce_login(self.user)
+
+        boards = (await self.async_client.get('/api/v1/analytics/boards/recent/')).json()
+        self.assertEqual([board['id'] for board in boards], [str(self.board.id)])
+        self.assertEqual(len(boards[0]['columns']), 2)
+
+        tasks = (await self.async_client.get('/api/v1/analytics/tasks/upcoming/')).json()
+        self.assertEqual([task['title'] for task in tasks], ['Task 0'])
+
+
+class ConditionalGetTests(TestCase):
+    """Test cases for ETags, 304 responses and If-Match on the API viewsets"""
+
+    def setUp(self):
+        get_limiter().reset()
+        self.user = User.objects.create_user(username='etag', email='etag@example.com', password='password123')
+        organization = Organization.objects.create(name='ETag Org')
+        OrganizationMember.objects.create(organization=organization, user=self.user, role=OrganizationMember.ADMIN)
+        self.project = Project.objects.create(name='ETag Project', organization=organization, created_by=self.user)
+        ProjectMember.objects.get_or_create(project=self.project, user=self.user, defaults={'role': 'admin'})
+        self.board = Board.objects.create(name='Board', project=self.project, created_by=self.user)
+        self.column = Column.objects.create(name='To Do', board=self.board, order=0)
+        self.task = Task.objects.create(title='Task', column=self.column, order=0, created_by=self.user)
+        self.label = Label.objects.create(name='bug', project=self.project)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.tasks_url = f'/api/v1/projects/{self.project.id}/tasks/'
+        self.task_url = f'/api/v1/tasks/{self.task.id}/'
+
+    def revalidate(self, url, etag):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_unchanged_list_is_not_modified(self):
+        response = self.client.get(self.tasks_url)
+        etag = response['ETag']
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+        self.assertIn('Last-Modified', response)
+
+        with CaptureQueriesContext(connections['default']) as revalidated:
+            response = self.revalidate(self.tasks_url, etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.content, b'')
+        # The count and timestamps only; the tasks themselves are never loaded
+        self.assertFalse(any('"tasks_task"."title"' in query['sql'] for query in revalidated.captured_queries))
+        # Weakened by compression on the way out, still the same version
+        self.assertEqual(self.revalidate(self.tasks_url, f'W/{etag}').status_code, 304)
+        # Another query string is another representation
+        self.assertNotEqual(self.client.get(self.tasks_url, {'priority': 'high'})['ETag'], etag)
+
+    def test_passing_due_date_changes_the_etag(self):
+        self.task.due_date = timezone.now() + timedelta(hours=1)
+        self.task.save()
+        list_response = self.client.get(self.tasks_url)
+        detail_response = self.client.get(self.task_url)
+        self.assertFalse(detail_response.data['is_overdue'])
+
+        # Nothing is written when the task becomes overdue
+        later = timezone.now() + timedelta(hours=2)
+        with mock.patch('django.utils.timezone.now', return_value=later):
+            response = self.revalidate(self.tasks_url, list_response['ETag'])
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.json()[0]['is_overdue'])
+            response = self.revalidate(self.task_url, detail_response['ETag'])
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.data['is_overdue'])
+
+    def test_related_changes_change_the_etag(self):
+        list_etag = self.client.get(self.tasks_url)['ETag']
+        detail_etag = self.client.get(self.task_url)['ETag']
+
+        self.task.labels.add(self.label)
+        self.assertEqual(self.revalidate(self.tasks_url, list_etag).status_code, 200)
+        list_etag = self.client.get(self.tasks_url)['ETag']
+
+        self.label.color = '#000000'
+        self.label.save()
+        self.assertEqual(self.revalidate(self.tasks_url, list_etag).status_code, 200)
+        list_etag = self.client.get(self.tasks_url)['ETag']
+
+        # From the label's side, where a clear names no tasks
+        self.label.tasks.clear()
+        self.assertEqual(self.revalidate(self.tasks_url, list_etag).status_code, 200)
+
+        self.task.assignees.add(self.user)
+        self.assertEqual(self.revalidate(self.task_url, detail_etag).status_code, 200)
+
+        board_url = f'/api/v1/projects/{self.project.id}/boards/{self.board.id}/'
+        board_etag = self.client.get(board_url)['ETag']
+        Column.objects.create(name='Done', board=self.board, order=1)
+        self.assertEqual(self.revalidate(board_url, board_etag).status_code, 200)
+
+        Task.objects.create(title='Another', column=self.column, order=1, created_by=self.user)
+        list_etag = self.client.get(self.tasks_url)['ETag']
+        Task.objects.filter(title='Another').delete()
+        self.assertEqual(self.revalidate(self.tasks_url, list_etag).status_code, 200)
+
+    def test_if_match_guards_writes(self):
+        etag = self.client.get(self.task_url)['ETag']
+        Task.objects.filter(pk=self.task.pk).update(title='Changed elsewhere', updated_at=timezone.now() + timedelta(seconds=1))
+
+        response = self.client.patch(self.task_url, {'title': 'Mine'}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 412)
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.title, 'Changed elsewhere')
+
+        etag = self.client.get(self.task_url)['ETag']
+        response = self.client.patch(self.task_url, {'title': 'Mine'}, format='json', HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        # The response's ETag is the one the next write has to send
+        self.assertEqual(response['ETag'], self.client.get(self.task_url)['ETag'])
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_notifications_follow_the_read_watermark(self):
+        fan_out_notification(
+            User.objects.filter(pk=self.user.pk), notification_type=Notification.TASK_UPDATED,
+            title='Update', message='Something changed'
+        )
+        etag = self.client.get('/api/v1/notifications/')['ETag']
+        self.assertEqual(self.revalidate('/api/v1/notifications/', etag).status_code, 304)
+
+        self.client.post('/api/v1/notifications/mark_all_as_read/')
+        self.assertEqual(self.revalidate('/api/v1/notifications/', etag).status_code, 200)
+
+
+class ResponseEncodingTests(TestCase):
+    """Test cases for the fast JSON renderer, compression and streamed lists"""
+
+    def compress(self, response, accept='gzip, deflate, br'):
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING=accept)
+        return CompressionMiddleware(lambda request: response)(request)
+
+    def test_renderer_matches_drf(self):
+        data = {
+            'id': uuid.uuid4(), 'at': timezone.now(), 'naive': timezone.now().replace(tzinfo=None),
+            'day': timezone.now().date(), 'hours': decimal.Decimal('1.50'), 'took': timedelta(seconds=90),
+            'text': 'line\u2028separator', 1: 'int key', 'nested': [{'labels': ('a', 'b')}],
+        }
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+        self.assertEqual(FastJSONRenderer().render(None), b'')
+
+    def test_large_responses_are_gzipped(self):
+        data = [{'title': f'Task {i}'} for i in range(200)]
+        response = self.compress(JsonResponse(data, safe=False), accept='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(json.loads(gzip.decompress(response.content)), data)
+
+        with override_settings(COMPRESSION_MIN_SIZE=100000):
+            self.assertFalse(self.compress(JsonResponse(data, safe=False)).has_header('Content-Encoding'))
+        self.assertFalse(self.compress(JsonResponse(data, safe=False), accept='identity').has_header('Content-Encoding'))
+
+        events = StreamingHttpResponse(iter([b'data: x\n\n'] * 500), content_type='text/event-stream')
+        self.assertFalse(self.compress(events).has_header('Content-Encoding'))
+
+    def test_brotli_for_json_when_installed(self):
+        data = [{'title': f'Task {i}'} for i in range(200)]
+        response = self.compress(JsonResponse(data, safe=False))
+        if pm_middleware.brotli is None:
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+            return
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(json.loads(pm_middleware.brotli.decompress(response.content)), data)
+        # Pages keep to gzip
+        page = HttpResponse('<p>page</p>' * 500)
+        self.assertEqual(self.compress(page)['Content-Encoding'], 'gzip')
+
+    def test_long_lists_are_streamed(self):
+        get_limiter().reset()
+        user = User.objects.create_user(username='stream', email='stream@example.com', password='password123')
+        organization = Organization.objects.create(name='Stream Org')
+        OrganizationMember.objects.create(organization=organization, user=user, role=OrganizationMember.ADMIN)
+        project = Project.objects.create(name='Stream Project', organization=organization, created_by=user)
+        ProjectMember.objects.get_or_create(project=project, user=user, defaults={'role': 'admin'})
+        column = Column.objects.create(name='To Do', board=Board.objects.create(name='Board', project=project), order=0)
+        for i in range(5):
+            Task.objects.create(title=f'Task {i}', column=column, order=i, created_by=user)
+        client = APIClient()
+        client.force_authenticate(user=user)
+        url = f'/api/v1/projects/{project.id}/tasks/'
+
+        whole = client.get(url)
+        self.assertFalse(whole.streaming)
+        with override_settings(STREAMING_LIST_THRESHOLD=2):
+            streamed = client.get(url)
+        self.assertTrue(streamed.streaming)
+        self.assertEqual(json.loads(b''.join(streamed.streaming_content)), whole.json())
+
+
+class TaskValuesSerializerTests(TestCase):
+    """Test cases for the values() fast path of task lists"""
+
+    def setUp(self):
+        self.owner = User.objects.create_user(
+            username='owner', email='owner@example.com', password='password123', first_name='Ada', last_name='Owner'
+        )
+        self.other = User.objects.create_user(
+            username='other', email='other@example.com', password='password123', job_title='Engineer',
+            profile_picture='profile_pictures/other.jpg',
+            avatar_variants={'source': 'profile_pictures/other.jpg', '64': 'profile_pictures/variants/other_64.webp'},
+        )
+        organization = Organization.objects.create(name='Values Org')
+        self.project = Project.objects.create(name='Values Project', organization=organization, created_by=self.owner)
+        board = Board.objects.create(name='Board', project=self.project)
+        todo = Column.objects.create(name='To Do', board=board, order=0)
+        done = Column.objects.create(name='Done', board=board, order=1)
+        bug = Label.objects.create(name='bug', color='#ff0000', project=self.project)
+        ui = Label.objects.create(name='ui', project=self.project)
+
+        first = Task.objects.create(
+            title='Overdue', description='Late', column=todo, order=0, created_by=self.owner, priority='urgent',
+            due_date=timezone.now() - timedelta(days=1), estimated_hours=decimal.Decimal('2.5'),
+        )
+        first.labels.add(bug, ui)
+        first.assignees.add(self.owner, self.other)
+        second = Task.objects.create(
+            title='Later', column=done, order=1, created_by=self.other,
+            due_date=timezone.now() + timedelta(days=3), actual_hours=decimal.Decimal('1.25'),
+        )
+        second.labels.add(bug)
+        second.assignees.add(self.other)
+        # No creator, labels or assignees
+        Task.objects.create(title='Orphan', column=todo, order=2)
+
+    def queryset(self):
+        return Task.objects.filter(column__board__project=self.project).select_related(
+            'column', 'column__board'
+        ).prefetch_related('labels', 'assignees')
+
+    def test_matches_task_serializer(self):
+        context = {'request': APIRequestFactory().get('/api/v1/tasks/')}
+        expected = JSONRenderer().render(TaskSerializer(self.queryset(), many=True, context=context).data)
+        with self.assertNumQueries(3):
+            data = TaskValuesSerializer(self.queryset(), context=context).data
+        self.assertEqual(JSONRenderer().render(data), expected)
+
+        orphan = data[-1]
+        self.assertNotIn('created_by_name', orphan)
+        self.assertEqual((orphan['labels'], orphan['assignees']), ([], []))
+        self.assertTrue(data[0]['is_overdue'])
+        avatars = {user['username']: user['avatar'] for user in data[0]['assignees']}
+        self.assertIsNone(avatars['owner'])
+        self.assertTrue(avatars['other'].endswith('other_64.webp'))
+
+    def test_task_list_uses_fast_path(self):
+        ProjectMember.objects.get_or_create(project=self.project, user=self.owner, defaults={'role': 'admin'})
+        client = APIClient()
+        client.force_authenticate(user=self.owner)
+        response = client.get(f'/api/v1/projects/{self.project.id}/tasks/')
+        self.assertEqual(response.status_code, 200)
+        request = response.wsgi_request
+        expected = TaskSerializer(self.queryset(), many=True, context={'request': request}).data
+        self.assertEqual(response.content, JSONRenderer().render(expected))
@@ -0,0 +1,45 @@
+"""
+DRF throttles backed by the shared rate limiter.
+
+DRF's own throttles keep a request history list in the cache and update it
+with a separate get and set, so each worker process (LocMemCache) counts on
+its own and concurrent requests can slip through. These keep the same
+scopes, rates and cache keys but take their tokens from
+projectmanagement.ratelimit.
+"""
+from rest_framework.throttling import (
+    AnonRateThrottle, ScopedRateThrottle, SimpleRateThrottle, UserRateThrottle,
+)
+
+from .ratelimit import get_limiter
+
+
+class SharedRateThrottle(SimpleRateThrottle):
+    """SimpleRateThrottle with the decision taken by the shared limiter"""
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        decision = get_limiter().hit(self.key, self.num_requests, self.duration)
+        self.retry_after = decision.retry_after
+        return decision.allowed
+
+    def wait(self):
+        return getattr(self, 'retry_after', None) or None
+
+
+class SharedAnonRateThrottle(AnonRateThrottle, SharedRateThrottle):
+    pass
+
+
+class SharedUserRateThrottle(UserRateThrottle, SharedRateThrottle):
+    pass
+
+
+class SharedScopedRateThrottle(ScopedRateThrottle, SharedRateThrottle):
+    pass
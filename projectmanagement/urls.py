@@ -37,7 +37,7 @@ from organizations.views import (
 from projects.views import project_detail_view, board_detail_view, project_delete_view, project_create_view
 from projects.views_edit import project_update_view
 from tasks.views import task_detail_view, task_create_view, task_update_view
-from .views import dashboard_view, activation_view, logout_view, serve_service_worker, profile_view
+from .views import dashboard_view, activation_view, logout_view, serve_service_worker, profile_view, metrics_view
 
 def health_check(request):
     """Health check endpoint for Docker that verifies database connection"""
@@ -86,6 +86,7 @@ urlpatterns = [
     # Health check for Docker and Render
     path('api/v1/health/', health_check, name='health_check'),
     path('api/health/', health_check, name='render_health_check'),
+    path('api/v1/_metrics', metrics_view, name='metrics'),
     
     # Frontend routes serving templates
     path('', TemplateView.as_view(template_name='dashboard/index.html'), name='home'),
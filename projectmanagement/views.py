@@ -8,17 +8,24 @@ from django.contrib.auth import logout
 import time
 import os
 from rest_framework import status
-from projects.models import Project, ProjectMember
+from projects.models import Project, ProjectMember, live_projects
 from organizations.models import Organization, OrganizationMember
 from django.conf import settings
 import logging
 
 logger = logging.getLogger(__name__)
-from activitylogs.models import ActivityLog
+from activitylogs.models import ActivityFeedEntry
 from tasks.models import Task
 from django.utils import timezone
 from django.db.models import Q
 import json
+import secrets
+from rest_framework.authentication import BaseAuthentication
+from rest_framework.decorators import api_view, authentication_classes, permission_classes, throttle_classes
+from rest_framework.permissions import BasePermission
+from rest_framework.settings import api_settings
+from django.contrib.auth.models import AnonymousUser
+from .metrics import get_registry
 
 logger = logging.getLogger(__name__)
 
@@ -29,23 +36,18 @@ def dashboard_view(request):
     """
     # Get organizations the user is a member of
     user_organizations = Organization.objects.filter(
-        members__user=request.user
+        members__user=request.user,
+        pending_delete=False
     ).distinct()
     
     # Get projects the user is a member of
     user_projects = Project.objects.filter(
-        members__user=request.user
+        live_projects(),
+        members__user=request.user,
     ).select_related('organization').order_by('-created_at')[:10]
     
-    # Get recent activity (limited to 10 items)
-    try:
-        recent_activity = ActivityLog.objects.filter(
-            Q(organization__in=user_organizations) |
-            Q(project__in=user_projects)
-        ).select_related('user', 'content_type').order_by('-timestamp')[:10]
-    except:
-        # ActivityLog might not be available or accessible
-        recent_activity = []
+    # Get recent activity (limited to 10 items) from the user's personal feed
+    recent_activity = ActivityFeedEntry.latest_for_user(request.user, limit=10)
     
     # Get upcoming tasks (limited to 5 items)
     try:
@@ -137,3 +139,31 @@ def serve_service_worker(request):
     logger.info(f"Serving service worker with Service-Worker-Allowed header from {file_path}")
     
     return response
+
+
+class MetricsTokenAuthentication(BaseAuthentication):
+    """``Authorization: Bearer <METRICS_TOKEN>``, for a Prometheus scraper"""
+
+    def authenticate(self, request):
+        token = getattr(settings, 'METRICS_TOKEN', '')
+        header = request.META.get('HTTP_AUTHORIZATION', '')
+        if token and header.startswith('Bearer ') and secrets.compare_digest(header[7:].encode(), token.encode()):
+            return (AnonymousUser(), 'metrics')
+        return None
+
+
+class CanReadMetrics(BasePermission):
+    def has_permission(self, request, view):
+        return request.auth == 'metrics' or request.user.is_staff
+
+
+@api_view(['GET'])
+@authentication_classes([MetricsTokenAuthentication, *api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+@permission_classes([CanReadMetrics])
+@throttle_classes([])
+def metrics_view(request):
+    """
+    Request, query and signal-handler metrics of all workers, in the
+    Prometheus text format
+    """
+    return HttpResponse(get_registry().render(), content_type='text/plain; version=0.0.4; charset=utf-8')
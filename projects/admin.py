@@ -1,13 +1,16 @@
 from django.contrib import admin
+import logging
 import sys
-print("Python path:", sys.path)
-print("Attempting to import from .models...")
-from .models import Project, ProjectMember, Board, Column, BoardViewer
+
+logger = logging.getLogger(__name__)
+logger.debug("Python path: %s", sys.path)
+logger.debug("Attempting to import from .models...")
+from .models import Project, ProjectMember, Board, Column, BoardViewer, DeletionJob
 
 @admin.register(Project)
 class ProjectAdmin(admin.ModelAdmin):
-    list_display = ('name', 'organization', 'created_by', 'start_date', 'end_date', 'is_active')
-    list_filter = ('is_active', 'organization', 'start_date')
+    list_display = ('name', 'organization', 'created_by', 'start_date', 'end_date', 'is_active', 'pending_delete')
+    list_filter = ('is_active', 'pending_delete', 'organization', 'start_date')
     search_fields = ('name', 'description')
     prepopulated_fields = {'slug': ('name',)}
     date_hierarchy = 'created_at'
@@ -39,3 +42,10 @@ class BoardViewerAdmin(admin.ModelAdmin):
     list_filter = ('joined_at', 'last_activity')
     search_fields = ('user__email', 'board__name')
     date_hierarchy = 'last_activity'
+
+@admin.register(DeletionJob)
+class DeletionJobAdmin(admin.ModelAdmin):
+    list_display = ('target_name', 'target_type', 'status', 'deleted_rows', 'total_rows', 'files_removed', 'created_at', 'finished_at')
+    list_filter = ('status', 'target_type')
+    search_fields = ('target_name', 'target_id')
+    readonly_fields = ('progress', 'error')
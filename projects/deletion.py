@@ -0,0 +1,244 @@
+"""
+Background deletion of projects and organizations.
+
+Calling ``.delete()`` on a large project makes Django's collector load
+every task, comment, attachment and log row into memory and send a
+post_delete signal per row (recomputing analytics for every task) while
+holding the database write lock. Instead, ``schedule_deletion`` flags the
+target as pending_delete, which hides it straight away, and records a
+DeletionJob. A background worker then purges the children table by table
+in chunks of DELETION_CHUNK_SIZE rows, each chunk in its own short
+transaction and deleted with a plain DELETE (no collector, no per-row
+signals), removes attachment files from storage, records progress on the
+job and finally deletes the now-empty target itself.
+
+The worker runs in a daemon thread inside the web process, woken when a
+job is committed, and can also be run with ``manage.py process_deletions``.
+Purging is idempotent, so a job interrupted part-way is simply run again.
+"""
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from activitylogs.models import ActivityFeedEntry, ActivityLog
+from analytics.models import ActivityLog as AnalyticsActivityLog, ProjectMetric, UserProductivity
+from notifications.models import DeadlineReminder
+from organizations.models import Organization, OrganizationInvitation, OrganizationMember
+from tasks.models import Attachment, Comment, Label, Task
+from .models import Board, BoardViewer, Column, DeletionJob, Project, ProjectMember
+
+logger = logging.getLogger(__name__)
+
+_wake = threading.Event()
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def schedule_deletion(target, requested_by=None):
+    """
+    Hide a Project or Organization and queue it for background deletion.
+
+    Returns the DeletionJob; asking twice for the same target returns the
+    job that is already queued.
+    """
+    target_type = DeletionJob.ORGANIZATION if isinstance(target, Organization) else DeletionJob.PROJECT
+    with transaction.atomic():
+        type(target)._base_manager.filter(pk=target.pk).update(pending_delete=True)
+        target.pending_delete = True
+        job = DeletionJob.objects.filter(
+            target_type=target_type, target_id=target.pk, status__in=[DeletionJob.PENDING, DeletionJob.RUNNING]
+        ).first()
+        if job is None:
+            job = DeletionJob.objects.create(
+                target_type=target_type,
+                target_id=target.pk,
+                target_name=target.name[:100],
+                requested_by=requested_by,
+            )
+            transaction.on_commit(wake)
+    return job
+
+
+def project_steps(project_id):
+    """
+    The querysets to purge for a project, children before parents, as
+    (label, queryset) pairs
+    """
+    in_project = {'task__column__board__project_id': project_id}
+    return [
+        ('tasks.Attachment', Attachment.objects.filter(**in_project)),
+        ('tasks.Comment', Comment.objects.filter(**in_project)),
+        ('tasks.Task_assignees', Task.assignees.through.objects.filter(**in_project)),
+        ('tasks.Task_labels', Task.labels.through.objects.filter(Q(**in_project) | Q(label__project_id=project_id))),
+        ('notifications.DeadlineReminder', DeadlineReminder.objects.filter(**in_project)),
+        ('tasks.Task', Task.objects.filter(column__board__project_id=project_id)),
+        ('tasks.Label', Label.objects.filter(project_id=project_id)),
+        ('projects.Column', Column.objects.filter(board__project_id=project_id)),
+        ('projects.BoardViewer', BoardViewer.objects.filter(board__project_id=project_id)),
+        ('projects.Board', Board.objects.filter(project_id=project_id)),
+        ('projects.ProjectMember', ProjectMember.objects.filter(project_id=project_id)),
+        ('analytics.ProjectMetric', ProjectMetric.objects.filter(project_id=project_id)),
+        ('analytics.UserProductivity', UserProductivity.objects.filter(project_id=project_id)),
+        ('analytics.ActivityLog', AnalyticsActivityLog.objects.filter(project_id=project_id)),
+        ('activitylogs.ActivityFeedEntry', ActivityFeedEntry.objects.filter(activity__project_id=project_id)),
+        ('activitylogs.ActivityLog', ActivityLog.objects.filter(project_id=project_id)),
+    ]
+
+
+def organization_steps(organization_id):
+    """The organization-level querysets to purge once its projects are gone"""
+    return [
+        ('organizations.OrganizationInvitation', OrganizationInvitation.objects.filter(organization_id=organization_id)),
+        ('organizations.OrganizationMember', OrganizationMember.objects.filter(organization_id=organization_id)),
+        ('analytics.ActivityLog', AnalyticsActivityLog.objects.filter(organization_id=organization_id)),
+    ]
+
+
+def run_job(job):
+    """Purge everything belonging to the job's target, then the target itself"""
+    if job.target_type == DeletionJob.ORGANIZATION:
+        project_ids = list(
+            Project._base_manager.filter(organization_id=job.target_id).values_list('id', flat=True)
+        )
+        steps = [step for project_id in project_ids for step in project_steps(project_id)]
+        steps += organization_steps(job.target_id)
+    else:
+        project_ids = [job.target_id]
+        steps = project_steps(job.target_id)
+
+    job.total_rows = sum(queryset.count() for _, queryset in steps) + len(project_ids)
+    job.save(update_fields=['total_rows', 'updated_at'])
+
+    chunk_size = _setting('DELETION_CHUNK_SIZE', 500)
+    pause = _setting('DELETION_CHUNK_PAUSE', 0)
+    for label, queryset in steps:
+        while True:
+            deleted, files = _purge_chunk(queryset, chunk_size)
+            if not deleted:
+                break
+            _record_progress(job, label, deleted, files)
+            if pause:
+                # Give other writers a turn at the database lock
+                time.sleep(pause)
+
+    # Only the (now empty) targets are left, so the regular delete is cheap
+    # and still sends the project's own delete signals
+    for project in Project._base_manager.filter(id__in=project_ids):
+        project.delete()
+        _record_progress(job, 'projects.Project', 1, 0)
+    if job.target_type == DeletionJob.ORGANIZATION:
+        Organization._base_manager.filter(id=job.target_id).delete()
+
+
+def _purge_chunk(queryset, chunk_size):
+    """
+    Delete up to ``chunk_size`` rows of ``queryset`` in one transaction.
+    Returns the number of rows and attachment files removed.
+    """
+    model = queryset.model
+    files = []
+    with transaction.atomic():
+        if model is Attachment:
+            rows = list(queryset.values_list('pk', 'file')[:chunk_size])
+            ids = [pk for pk, _ in rows]
+            files = [name for _, name in rows if name]
+        else:
+            ids = list(queryset.values_list('pk', flat=True)[:chunk_size])
+        if not ids:
+            return 0, 0
+        if model is Comment:
+            # Replies point at their parent; detach them so the chunk can go
+            Comment._base_manager.filter(parent_id__in=ids).update(parent=None)
+        deleted = model._base_manager.filter(pk__in=ids)._raw_delete(queryset.db)
+
+    removed = 0
+    storage = Attachment._meta.get_field('file').storage
+    for name in files:
+        try:
+            storage.delete(name)
+            removed += 1
+        except Exception as e:
+            logger.warning("Could not remove attachment file %s: %s", name, e)
+    return deleted, removed
+
+
+def _record_progress(job, label, deleted, files):
+    job.deleted_rows += deleted
+    job.files_removed += files
+    job.progress[label] = job.progress.get(label, 0) + deleted
+    job.save(update_fields=['deleted_rows', 'files_removed', 'progress', 'updated_at'])
+
+
+def process_pending():
+    """Run queued deletion jobs until none are left. Returns how many finished."""
+    _release_stale_jobs()
+    finished = 0
+    while True:
+        job = _claim_next_job()
+        if job is None:
+            return finished
+        try:
+            run_job(job)
+        except Exception as e:
+            logger.exception("Deletion of %s %s failed", job.target_type, job.target_id)
+            job.status = DeletionJob.FAILED
+            job.error = str(e)[:1000]
+        else:
+            job.status = DeletionJob.DONE
+            finished += 1
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'error', 'finished_at', 'updated_at'])
+
+
+def _claim_next_job():
+    for job_id in DeletionJob.objects.filter(status=DeletionJob.PENDING).values_list('id', flat=True)[:5]:
+        # Conditional update so two workers never run the same job
+        claimed = DeletionJob.objects.filter(id=job_id, status=DeletionJob.PENDING).update(
+            status=DeletionJob.RUNNING, started_at=timezone.now(), updated_at=timezone.now()
+        )
+        if claimed:
+            return DeletionJob.objects.get(id=job_id)
+    return None
+
+
+def _release_stale_jobs():
+    # A worker that died mid-job stops updating it; hand the job back
+    timeout = timedelta(seconds=_setting('DELETION_STALE_TIMEOUT', 600))
+    DeletionJob.objects.filter(
+        status=DeletionJob.RUNNING, updated_at__lt=timezone.now() - timeout
+    ).update(status=DeletionJob.PENDING)
+
+
+def wake():
+    """Start the background worker if needed and tell it there is work"""
+    if not _setting('DELETION_BACKGROUND_WORKER', True):
+        return
+    with _worker_lock:
+        global _worker
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_run, name='deletion-worker', daemon=True)
+            _worker.start()
+    _wake.set()
+
+
+def _run():
+    poll_interval = _setting('DELETION_POLL_INTERVAL', 60)
+    while True:
+        _wake.wait(poll_interval)
+        _wake.clear()
+        try:
+            process_pending()
+        except Exception:
+            logger.exception("Deletion worker failed")
+        finally:
+            close_old_connections()
@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from projects.deletion import process_pending
+from projects.models import DeletionJob
+
+
+class Command(BaseCommand):
+    help = 'Run queued project and organization deletions'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--retry-failed',
+            action='store_true',
+            help='Queue failed deletion jobs again before running.',
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep running and check for new jobs every --interval seconds.',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=60,
+            help='Seconds between checks when running with --loop (default: 60).',
+        )
+
+    def handle(self, *args, **options):
+        if options['retry_failed']:
+            requeued = DeletionJob.objects.filter(status=DeletionJob.FAILED).update(
+                status=DeletionJob.PENDING, error=None
+            )
+            self.stdout.write(f"Requeued {requeued} failed deletion jobs")
+
+        while True:
+            finished = process_pending()
+            if finished:
+                self.stdout.write(f"Finished {finished} deletion jobs")
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import Q
 from organizations.models import Organization
 from users.models import User
 from django.utils import timezone
@@ -13,6 +14,14 @@ def get_today():
     """
     return timezone.now().date()
 
+def live_projects(path=''):
+    """
+    Q for rows whose project, at ``path`` (or the projects themselves),
+    is not being deleted, alone or with its organization
+    """
+    prefix = f'{path}__' if path else ''
+    return Q(**{f'{prefix}pending_delete': False, f'{prefix}organization__pending_delete': False})
+
 class Project(models.Model):
     """Project model that belongs to an organization"""
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -27,9 +36,16 @@ class Project(models.Model):
     is_active = models.BooleanField(default=True)
     is_public = models.BooleanField(default=False)
     slug = models.SlugField(unique=True, blank=True)
+    # Set when deletion is requested; the row and its children are purged in the background
+    pending_delete = models.BooleanField(default=False)
     
     def __str__(self):
         return self.name
+    
+    @property
+    def is_pending_delete(self):
+        """Whether the project or its organization is waiting to be purged"""
+        return self.pending_delete or self.organization.pending_delete
         
     def save(self, *args, **kwargs):
         if not self.slug:
@@ -190,3 +206,65 @@ class BoardViewer(models.Model):
         Remove a viewer when they disconnect
         """
         cls.objects.filter(board_id=board_id, user_id=user_id).delete()
+
+
+class DeletionJob(models.Model):
+    """
+    Background deletion of a project or an organization
+    
+    The target is flagged pending_delete when the job is created and its
+    children are purged in bounded chunks by projects.deletion, which
+    records its progress here.
+    """
+    PROJECT = 'project'
+    ORGANIZATION = 'organization'
+    
+    TARGET_CHOICES = [
+        (PROJECT, 'Project'),
+        (ORGANIZATION, 'Organization'),
+    ]
+    
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    target_type = models.CharField(max_length=20, choices=TARGET_CHOICES)
+    target_id = models.UUIDField()
+    target_name = models.CharField(max_length=100)
+    requested_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='deletion_jobs')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING)
+    total_rows = models.PositiveIntegerField(default=0)
+    deleted_rows = models.PositiveIntegerField(default=0)
+    files_removed = models.PositiveIntegerField(default=0)
+    progress = models.JSONField(default=dict, blank=True)  # rows deleted per model
+    error = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+    
+    def __str__(self):
+        return f"Delete {self.target_type} '{self.target_name}' ({self.status})"
+    
+    @property
+    def percent_complete(self):
+        if self.status == self.DONE:
+            return 100
+        if not self.total_rows:
+            return 0
+        return min(99, int(self.deleted_rows * 100 / self.total_rows))
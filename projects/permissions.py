@@ -1,7 +1,65 @@
 from rest_framework import permissions
+from rest_framework.exceptions import NotFound
 from .models import ProjectMember, Project
 from organizations.models import OrganizationMember
 
+
+# The permission classes below often run for the same project several times
+# in one request (has_permission, then has_object_permission, and through
+# IsProjectAdminOrReadOnly), so their lookups are remembered on the request.
+
+def _request_cache(request, name):
+    cache = request.__dict__.setdefault('_permission_cache', {})
+    return cache.setdefault(name, {})
+
+
+def project_membership(request, project_id):
+    """The user's ProjectMember row for the project, or None"""
+    memberships = _request_cache(request, 'project_memberships')
+    key = str(project_id)
+    if key not in memberships:
+        memberships[key] = ProjectMember.objects.filter(project_id=project_id, user=request.user).first()
+    return memberships[key]
+
+
+def cached_project(request, project_id):
+    projects = _request_cache(request, 'projects')
+    key = str(project_id)
+    if key not in projects:
+        projects[key] = Project.objects.select_related('organization').filter(id=project_id).first()
+    return projects[key]
+
+
+def live_project(request, project_id):
+    """
+    The project, or None if there is none. While it or its organization
+    is being deleted it is not found, and neither is anything nested in it.
+    """
+    project = cached_project(request, project_id)
+    if project is not None and project.is_pending_delete:
+        raise NotFound()
+    return project
+
+
+def column_project_id(request, column_id):
+    """The id of the project the column belongs to, or None"""
+    from projects.models import Column
+    columns = _request_cache(request, 'column_projects')
+    key = str(column_id)
+    if key not in columns:
+        columns[key] = Column.objects.filter(id=column_id).values_list('board__project_id', flat=True).first()
+    return columns[key]
+
+
+def is_organization_member(request, organization_id):
+    organizations = _request_cache(request, 'organization_members')
+    key = str(organization_id)
+    if key not in organizations:
+        organizations[key] = OrganizationMember.objects.filter(
+            organization_id=organization_id, user=request.user
+        ).exists()
+    return organizations[key]
+
 class IsProjectMember(permissions.BasePermission):
     """
     Permission to only allow members of a project to access it
@@ -14,22 +72,16 @@ class IsProjectMember(permissions.BasePermission):
         if not project_id:
             column_id = view.kwargs.get('column_pk')
             if column_id:
-                from projects.models import Column
-                try:
-                    column = Column.objects.get(id=column_id)
-                    project_id = column.board.project_id
-                except Column.DoesNotExist:
+                project_id = column_project_id(request, column_id)
+                if project_id is None:
                     return False
             else:
                 # For task creation via /api/v1/tasks/, get project from column in request data
                 if hasattr(request, 'data') and 'column' in request.data:
                     column_id = request.data.get('column')
                     if column_id:
-                        from projects.models import Column
-                        try:
-                            column = Column.objects.get(id=column_id)
-                            project_id = column.board.project_id
-                        except Column.DoesNotExist:
+                        project_id = column_project_id(request, column_id)
+                        if project_id is None:
                             return False
                     else:
                         return False
@@ -50,22 +102,15 @@ class IsProjectMember(permissions.BasePermission):
                     return False
                 
         # Check if project is public
-        try:
-            project = Project.objects.get(id=project_id)
-            if project.is_public:
-                # For public projects, check if user is in the organization
-                return OrganizationMember.objects.filter(
-                    organization=project.organization,
-                    user=request.user
-                ).exists()
-        except Project.DoesNotExist:
+        project = live_project(request, project_id)
+        if project is None:
             return False
+        if project.is_public:
+            # For public projects, check if user is in the organization
+            return is_organization_member(request, project.organization_id)
         
         # For private projects, check project membership
-        return ProjectMember.objects.filter(
-            project_id=project_id,
-            user=request.user
-        ).exists()
+        return project_membership(request, project_id) is not None
     
     def has_object_permission(self, request, view, obj):
         # Check if project field exists on the object
@@ -81,16 +126,10 @@ class IsProjectMember(permissions.BasePermission):
             
         if project.is_public:
             # For public projects, check if user is in the organization
-            return OrganizationMember.objects.filter(
-                organization=project.organization,
-                user=request.user
-            ).exists()
+            return is_organization_member(request, project.organization_id)
             
         # For private projects, check project membership
-        return ProjectMember.objects.filter(
-            project=project,
-            user=request.user
-        ).exists()
+        return project_membership(request, project.id) is not None
 
 class IsProjectAdmin(permissions.BasePermission):
     """
@@ -104,22 +143,16 @@ class IsProjectAdmin(permissions.BasePermission):
         if not project_id:
             column_id = view.kwargs.get('column_pk')
             if column_id:
-                from projects.models import Column
-                try:
-                    column = Column.objects.get(id=column_id)
-                    project_id = column.board.project_id
-                except Column.DoesNotExist:
+                project_id = column_project_id(request, column_id)
+                if project_id is None:
                     return False
             else:
                 # For task creation via /api/v1/tasks/, get project from column in request data
                 if hasattr(request, 'data') and 'column' in request.data:
                     column_id = request.data.get('column')
                     if column_id:
-                        from projects.models import Column
-                        try:
-                            column = Column.objects.get(id=column_id)
-                            project_id = column.board.project_id
-                        except Column.DoesNotExist:
+                        project_id = column_project_id(request, column_id)
+                        if project_id is None:
                             return False
                     else:
                         return False
@@ -135,10 +168,9 @@ class IsProjectAdmin(permissions.BasePermission):
                     
                     return False
         
-        membership = ProjectMember.objects.filter(
-            project_id=project_id,
-            user=request.user
-        ).first()
+        if live_project(request, project_id) is None:
+            return False
+        membership = project_membership(request, project_id)
         
         if not membership:
             return False
@@ -157,10 +189,7 @@ class IsProjectAdmin(permissions.BasePermission):
         else:
             return False
         
-        membership = ProjectMember.objects.filter(
-            project=project,
-            user=request.user
-        ).first()
+        membership = project_membership(request, project.id)
         
         if not membership:
             return False
@@ -179,19 +208,15 @@ class IsProjectManager(permissions.BasePermission):
         if not project_id:
             column_id = view.kwargs.get('column_pk')
             if column_id:
-                from projects.models import Column
-                try:
-                    column = Column.objects.get(id=column_id)
-                    project_id = column.board.project_id
-                except Column.DoesNotExist:
+                project_id = column_project_id(request, column_id)
+                if project_id is None:
                     return False
             else:
                 return False
         
-        membership = ProjectMember.objects.filter(
-            project_id=project_id,
-            user=request.user
-        ).first()
+        if live_project(request, project_id) is None:
+            return False
+        membership = project_membership(request, project_id)
         
         if not membership:
             return False
@@ -210,10 +235,7 @@ class IsProjectManager(permissions.BasePermission):
         else:
             return False
         
-        membership = ProjectMember.objects.filter(
-            project=project,
-            user=request.user
-        ).first()
+        membership = project_membership(request, project.id)
         
         if not membership:
             return False
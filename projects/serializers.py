@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Project, ProjectMember, Board, Column, BoardViewer
+from .models import Project, ProjectMember, Board, Column, BoardViewer, DeletionJob
 from users.serializers import UserSerializer
 from organizations.serializers import OrganizationSerializer
 from organizations.models import Organization
@@ -264,3 +264,16 @@ class ProjectDetailSerializer(ProjectSerializer):
     
     def get_members_count(self, obj):
         return obj.members.count()
+
+
+class DeletionJobSerializer(serializers.ModelSerializer):
+    percent_complete = serializers.IntegerField(read_only=True)
+    
+    class Meta:
+        model = DeletionJob
+        fields = [
+            'id', 'target_type', 'target_id', 'target_name', 'status',
+            'total_rows', 'deleted_rows', 'files_removed', 'percent_complete',
+            'progress', 'error', 'created_at', 'started_at', 'finished_at'
+        ]
+        read_only_fields = fields
@@ -1,10 +1,23 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework.test import APIClient, APITestCase
 from rest_framework import status
 from django.contrib.auth import get_user_model
-from organizations.models import Organization
-from projects.models import Project, ProjectMember, Board, Column
+from activitylogs.models import ActivityLog
+from analytics.models import ProjectMetric
+from notifications.deadlines import scan_deadlines
+from notifications.models import DeadlineReminder
+from organizations.models import Organization, OrganizationMember
+from projects.deletion import process_pending, schedule_deletion
+from projects.models import Project, ProjectMember, Board, Column, DeletionJob
+from tasks.models import Task, Comment, Attachment, Label
 
 User = get_user_model()
 
@@ -221,3 +234,178 @@ class BoardAPITests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertEqual(response.data['name'], 'New Board')
         self.assertEqual(response.data['description'], 'New board description')
+
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, DELETION_BACKGROUND_WORKER=False, DELETION_CHUNK_SIZE=2)
+class BackgroundDeletionTests(APITestCase):
+    """Test cases for chunked background deletion of projects and organizations"""
+    
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='owner', email='owner@example.com', password='testpassword'
+        )
+        self.client.force_authenticate(user=self.user)
+        self.organization = Organization.objects.create(name='Test Organization')
+        OrganizationMember.objects.create(
+            organization=self.organization, user=self.user, role=OrganizationMember.ADMIN
+        )
+        self.project = self.create_project('Doomed Project')
+        self.other = self.create_project('Surviving Project')
+    
+    def create_project(self, name, tasks=3):
+        project = Project.objects.create(name=name, organization=self.organization, created_by=self.user)
+        ProjectMember.objects.get_or_create(project=project, user=self.user, defaults={'role': ProjectMember.OWNER})
+        board = Board.objects.create(name='Board', project=project, created_by=self.user)
+        column = Column.objects.create(name='To Do', board=board)
+        label = Label.objects.create(name='Bug', project=project)
+        for i in range(tasks):
+            task = Task.objects.create(title=f'{name} task {i}', column=column, created_by=self.user)
+            task.assignees.add(self.user)
+            task.labels.add(label)
+            parent = Comment.objects.create(task=task, author=self.user, content='Parent')
+            Comment.objects.create(task=task, author=self.user, content='Reply', parent=parent)
+            Attachment.objects.create(
+                task=task,
+                file=SimpleUploadedFile('notes.txt', b'attachment body'),
+                filename='notes.txt',
+                uploaded_by=self.user,
+                file_size=15,
+            )
+        return project
+    
+    def project_rows(self, project):
+        return {
+            'tasks': Task.objects.filter(column__board__project=project).count(),
+            'comments': Comment.objects.filter(task__column__board__project=project).count(),
+            'attachments': Attachment.objects.filter(task__column__board__project=project).count(),
+            'boards': Board.objects.filter(project=project).count(),
+            'labels': Label.objects.filter(project=project).count(),
+            'metrics': ProjectMetric.objects.filter(project=project).count(),
+        }
+    
+    def test_delete_hides_project_and_purges_in_background(self):
+        files = [attachment.file.path for attachment in Attachment.objects.filter(task__column__board__project=self.project)]
+        other_rows = self.project_rows(self.other)
+        
+        response = self.client.delete(f'/api/v1/projects/{self.project.id}/')
+        
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        job_id = response.data['id']
+        # Hidden immediately, but nothing has been deleted yet
+        self.assertEqual(self.client.get(f'/api/v1/projects/{self.project.id}/').status_code, status.HTTP_404_NOT_FOUND)
+        self.assertTrue(Task.objects.filter(column__board__project=self.project).exists())
+        
+        self.assertEqual(process_pending(), 1)
+        
+        self.assertFalse(Project.objects.filter(id=self.project.id).exists())
+        self.assertFalse(Task.objects.filter(title__startswith='Doomed').exists())
+        self.assertFalse(ActivityLog.objects.filter(project_id=self.project.id).exclude(action_type=ActivityLog.DELETED).exists())
+        self.assertTrue(all(not os.path.exists(path) for path in files))
+        self.assertEqual(self.project_rows(self.other), other_rows)
+        
+        status_response = self.client.get(f'/api/v1/projects/deletion-jobs/{job_id}/')
+        self.assertEqual(status_response.data['status'], DeletionJob.DONE)
+        self.assertEqual(status_response.data['percent_complete'], 100)
+        self.assertEqual(status_response.data['files_removed'], 3)
+        self.assertEqual(status_response.data['progress']['tasks.Comment'], 6)
+        self.assertEqual(status_response.data['deleted_rows'], status_response.data['total_rows'])
+    
+    def assert_project_tree_hidden(self, project):
+        board = Board.objects.get(project=project)
+        column = Column.objects.get(board=board)
+        task = Task.objects.filter(column=column).first()
+        label = Label.objects.get(project=project)
+        project_url = f'/api/v1/projects/{project.id}'
+        column_url = f'{project_url}/boards/{board.id}/columns/{column.id}'
+        analytics_url = f'/api/v1/analytics/projects/{project.id}'
+        
+        for url in [
+            f'{project_url}/',
+            f'{project_url}/boards/',
+            f'{project_url}/boards/{board.id}/',
+            f'{project_url}/boards/{board.id}/columns/',
+            f'{project_url}/boards/{board.id}/snapshot/',
+            f'{project_url}/tasks/',
+            f'{column_url}/tasks/',
+            f'/api/v1/tasks/{task.id}/',
+            f'/api/v1/tasks/projects/{project.id}/labels/',
+            f'/api/v1/tasks/projects/{project.id}/labels/{label.id}/',
+            f'{analytics_url}/metrics/',
+            f'{analytics_url}/metrics/summary/',
+            f'{analytics_url}/metrics/task-distribution/',
+            f'{analytics_url}/metrics/burndown/',
+            f'{analytics_url}/productivity/rankings/',
+        ]:
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND, url)
+        self.assertNotIn(str(project.id), [item['id'] for item in self.client.get('/api/v1/projects/').data['results']])
+        
+        # Nor do its deadlines show up on the dashboard or get reminded about
+        tasks = Task.objects.filter(column=column)
+        tasks.update(due_date=timezone.now() + timedelta(hours=2))
+        upcoming = [item['id'] for item in self.client.get('/api/v1/analytics/tasks/upcoming/').json()]
+        self.assertFalse({str(pk) for pk in tasks.values_list('id', flat=True)} & set(upcoming))
+        scan_deadlines(DeadlineReminder.APPROACHING)
+        self.assertFalse(DeadlineReminder.objects.filter(task__in=tasks).exists())
+        
+        # Nothing can be added to a tree that is being purged
+        task_count = Task.objects.count()
+        self.assertEqual(self.client.post(f'{column_url}/tasks/', {'title': 'Late'}).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(
+            self.client.post('/api/v1/tasks/', {'title': 'Late', 'column': str(column.id)}).status_code,
+            status.HTTP_404_NOT_FOUND
+        )
+        self.assertEqual(
+            self.client.post(f'{project_url}/boards/{board.id}/columns/', {'name': 'Late'}).status_code,
+            status.HTTP_404_NOT_FOUND
+        )
+        self.assertEqual(
+            self.client.patch(f'/api/v1/tasks/{task.id}/', {'title': 'Renamed'}).status_code,
+            status.HTTP_404_NOT_FOUND
+        )
+        self.assertEqual(Task.objects.count(), task_count)
+        self.assertEqual(Column.objects.filter(board=board).count(), 1)
+    
+    def test_children_of_a_pending_project_are_hidden(self):
+        schedule_deletion(self.project, requested_by=self.user)
+        
+        self.assert_project_tree_hidden(self.project)
+        self.assertEqual(self.client.get(f'/api/v1/projects/{self.other.id}/tasks/').status_code, status.HTTP_200_OK)
+    
+    def test_projects_of_a_pending_organization_are_hidden(self):
+        schedule_deletion(self.organization, requested_by=self.user)
+        
+        self.assert_project_tree_hidden(self.project)
+        self.assert_project_tree_hidden(self.other)
+        response = self.client.get(f'/api/v1/organizations/{self.organization.id}/projects/')
+        self.assertNotIn(str(self.project.id), [item['id'] for item in response.data])
+    
+    def test_deleting_twice_reuses_the_queued_job(self):
+        first = self.client.delete(f'/api/v1/projects/{self.project.id}/')
+        Project.objects.filter(id=self.project.id).update(pending_delete=False)
+        second = self.client.delete(f'/api/v1/projects/{self.project.id}/')
+        
+        self.assertEqual(first.data['id'], second.data['id'])
+        self.assertEqual(DeletionJob.objects.count(), 1)
+    
+    def test_organization_delete_view_removes_all_projects(self):
+        self.client.force_login(self.user)
+        
+        response = self.client.post(f'/organizations/{self.organization.id}/delete/')
+        
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(Organization.objects.get(id=self.organization.id).pending_delete)
+        
+        process_pending()
+        
+        self.assertFalse(Organization.objects.filter(id=self.organization.id).exists())
+        self.assertFalse(Project.objects.filter(organization_id=self.organization.id).exists())
+        self.assertFalse(Task.objects.exists())
+        self.assertEqual(DeletionJob.objects.get().status, DeletionJob.DONE)
@@ -1,7 +1,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from rest_framework_nested import routers
-from .views import ProjectViewSet, ProjectMemberViewSet, BoardViewSet, ColumnViewSet
+from .views import ProjectViewSet, ProjectMemberViewSet, BoardViewSet, ColumnViewSet, DeletionJobDetailView, board_snapshot
 
 # Import TaskViewSet from tasks app for nested routing
 from tasks.views import TaskViewSet
@@ -27,6 +27,8 @@ columns_router = routers.NestedSimpleRouter(boards_router, r'columns', lookup='c
 columns_router.register(r'tasks', TaskViewSet, basename='column-tasks')
 
 urlpatterns = [
+    path('deletion-jobs/<uuid:pk>/', DeletionJobDetailView.as_view(), name='deletion-job-detail'),
+    path('<uuid:project_pk>/boards/<uuid:board_pk>/snapshot/', board_snapshot, name='board-snapshot'),
     path('', include(router.urls)),
     path('', include(projects_router.urls)),
     path('', include(boards_router.urls)),
@@ -2,26 +2,41 @@ from rest_framework import viewsets, generics, permissions, status, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404, render, redirect
-from django.db.models import Q
+from django.db.models import Prefetch, Q
 from django_filters.rest_framework import DjangoFilterBackend
 
 from organizations.models import OrganizationMember
-from .models import Project, ProjectMember, Board, Column
+from .deletion import schedule_deletion
+from .models import Project, ProjectMember, Board, Column, DeletionJob, live_projects
 from .serializers import (
     ProjectSerializer, ProjectDetailSerializer,
     ProjectMemberSerializer, ProjectMemberCreateSerializer,
-    BoardSerializer, ColumnSerializer
+    BoardSerializer, ColumnSerializer, DeletionJobSerializer
 )
 from .permissions import (
-    IsProjectMember, IsProjectAdmin, IsProjectAdminOrReadOnly
+    IsProjectMember, IsProjectAdmin, IsProjectAdminOrReadOnly, live_project
 )
+from projectmanagement.asyncviews import APIJsonResponse, async_api_view
+from projectmanagement.conditional import ConditionalGetMixin
+from projectmanagement.querybudget import query_budget
+from tasks.models import Task
+from tasks.serializers import TaskSerializer
 
-class ProjectViewSet(viewsets.ModelViewSet):
+class ProjectViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     """
     API endpoint for projects
     """
     serializer_class = ProjectSerializer
     permission_classes = [permissions.IsAuthenticated]
+    query_budget = {'list': 6, 'retrieve': 8, 'members': 5, 'default': 50}
+    etag_fields = {
+        'list': ('updated_at', 'organization__updated_at'),
+        # The detail nests the boards with their columns and counts the members
+        'retrieve': (
+            'updated_at', 'organization__updated_at', 'boards__updated_at',
+            'boards__columns__updated_at', 'members__joined_at',
+        ),
+    }
     queryset = Project.objects.all()  # Add this line to fix the router issue
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['is_active', 'organization']
@@ -47,7 +62,7 @@ class ProjectViewSet(viewsets.ModelViewSet):
             Q(members__user=user) |
             # Public projects in organizations the user belongs to
             Q(organization_id__in=user_orgs, is_public=True)
-        ).distinct()
+        ).filter(live_projects()).distinct()
     
     def get_serializer_class(self):
         if self.action == 'retrieve':
@@ -61,11 +76,17 @@ class ProjectViewSet(viewsets.ModelViewSet):
             self.permission_classes = [permissions.IsAuthenticated]
         return super().get_permissions()
     
+    def destroy(self, request, *args, **kwargs):
+        """Hide the project now and delete it in the background"""
+        project = self.get_object()
+        job = schedule_deletion(project, request.user)
+        return Response(DeletionJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+    
     @action(detail=True, methods=['get'], permission_classes=[permissions.IsAuthenticated])
     def members(self, request, pk=None):
         """Get all members of a project"""
         project = self.get_object()
-        members = ProjectMember.objects.filter(project=project)
+        members = ProjectMember.objects.filter(project=project).select_related('user')
         serializer = ProjectMemberSerializer(members, many=True)
         return Response(serializer.data)
     
@@ -141,10 +162,13 @@ class ProjectMemberViewSet(viewsets.ModelViewSet):
     """
     serializer_class = ProjectMemberSerializer
     permission_classes = [permissions.IsAuthenticated]
+    query_budget = {'list': 5, 'retrieve': 5, 'default': 20}
     
     def get_queryset(self):
         project_id = self.kwargs.get('project_pk')
-        return ProjectMember.objects.filter(project_id=project_id)
+        return ProjectMember.objects.filter(
+            live_projects('project'), project_id=project_id
+        ).select_related('user')
     
     def get_permissions(self):
         # Fix 403 Forbidden error: Remove IsProjectMember check which might be failing
@@ -175,20 +199,24 @@ class ProjectMemberViewSet(viewsets.ModelViewSet):
         
         return super().destroy(request, *args, **kwargs)
 
-class BoardViewSet(viewsets.ModelViewSet):
+class BoardViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     """
     API endpoint for boards
     """
     serializer_class = BoardSerializer
     permission_classes = [permissions.IsAuthenticated]
+    query_budget = {'list': 6, 'retrieve': 5, 'default': 20}
+    etag_fields = ('updated_at', 'columns__updated_at')
     
     def get_queryset(self):
         project_id = self.kwargs.get('project_pk')
-        return Board.objects.filter(project_id=project_id)
+        # Not found at all while the project is being deleted
+        live_project(self.request, project_id)
+        return Board.objects.filter(live_projects('project'), project_id=project_id)
     
     def perform_create(self, serializer):
         project_id = self.kwargs.get('project_pk')
-        project = get_object_or_404(Project, id=project_id)
+        project = get_object_or_404(Project.objects.filter(live_projects()), id=project_id)
         serializer.save(project=project, created_by=self.request.user)
     
 
@@ -199,10 +227,11 @@ class ColumnViewSet(viewsets.ModelViewSet):
     """
     serializer_class = ColumnSerializer
     permission_classes = [permissions.IsAuthenticated, IsProjectMember]
+    query_budget = {'list': 7, 'retrieve': 6, 'default': 20}
     
     def get_queryset(self):
         board_id = self.kwargs.get('board_pk')
-        return Column.objects.filter(board_id=board_id)
+        return Column.objects.filter(live_projects('board__project'), board_id=board_id)
     
     def get_permissions(self):
         if self.action in ['create', 'update', 'partial_update', 'destroy']:
@@ -211,7 +240,7 @@ class ColumnViewSet(viewsets.ModelViewSet):
     
     def perform_create(self, serializer):
         board_id = self.kwargs.get('board_pk')
-        board = get_object_or_404(Board, id=board_id)
+        board = get_object_or_404(Board.objects.filter(live_projects('project')), id=board_id)
         
         # Set the order to be the last
         latest_column = Column.objects.filter(board=board).order_by('-order').first()
@@ -219,9 +248,38 @@ class ColumnViewSet(viewsets.ModelViewSet):
         
         serializer.save(board=board, order=next_order)
 
+@query_budget(8)
+@async_api_view()
+async def board_snapshot(request, project_pk, board_pk):
+    """
+    A board with its columns and every column's tasks in one response
+    
+    What the board page otherwise loads with a request per column. An
+    async view on the async ORM, so opening a board holds no worker
+    thread under ASGI; a fixed handful of queries however big the board.
+    """
+    tasks = Task.objects.select_related('column', 'created_by').prefetch_related('labels', 'assignees').order_by('order')
+    board = await Board.objects.filter(
+        live_projects('project'),
+        id=board_pk,
+        project_id=project_pk,
+        project__members__user=request.user,
+    ).prefetch_related(
+        Prefetch('columns', queryset=Column.objects.order_by('order').prefetch_related(Prefetch('tasks', queryset=tasks)))
+    ).afirst()
+    if board is None:
+        # Not a member looks the same as no such board
+        return APIJsonResponse({'detail': 'Not found.'}, status=404)
+    
+    context = {'request': request}
+    data = BoardSerializer(board, context=context).data
+    for column_data, column in zip(data['columns'], board.columns.all()):
+        column_data['tasks'] = TaskSerializer(column.tasks.all(), many=True, context=context).data
+    return APIJsonResponse(data)
+
 # View for rendering the project detail HTML page
 def project_detail_view(request, project_id):
-    project = get_object_or_404(Project, id=project_id)
+    project = get_object_or_404(Project.objects.filter(live_projects()), id=project_id)
     user = request.user
 
     # Permission check: 
@@ -252,7 +310,7 @@ def board_detail_view(request, project_id, board_id):
     """
     View function for rendering the board page with board object in context
     """
-    project = get_object_or_404(Project, id=project_id)
+    project = get_object_or_404(Project.objects.filter(live_projects()), id=project_id)
     board = get_object_or_404(Board, id=board_id, project=project)
     user = request.user
     
@@ -279,7 +337,7 @@ def project_delete_view(request, project_id):
     View function for handling project deletion
     Requires POST method and checks if user has admin permissions
     """
-    project = get_object_or_404(Project, id=project_id)
+    project = get_object_or_404(Project.objects.filter(live_projects()), id=project_id)
     user = request.user
     
     # Only allow POST requests for deletion
@@ -303,12 +361,12 @@ def project_delete_view(request, project_id):
     # Store project name for success message
     project_name = project.name
     
-    # Delete the project
-    project.delete()
+    # Hide the project now; its tasks, files and history are purged in the background
+    schedule_deletion(project, user)
     
     # Redirect to dashboard with success message
     from django.contrib import messages
-    messages.success(request, f'Project "{project_name}" has been successfully deleted.')
+    messages.success(request, f'Project "{project_name}" is being deleted.')
     
     return redirect('dashboard')
 
@@ -424,3 +482,16 @@ def project_create_view(request, org_id):
         'form_data': request.POST if request.method == 'POST' else None
     }
     return render(request, 'project/create.html', context)
+
+
+class DeletionJobDetailView(generics.RetrieveAPIView):
+    """
+    API endpoint for the progress of a project or organization deletion
+    """
+    serializer_class = DeletionJobSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get_queryset(self):
+        if getattr(self, 'swagger_fake_view', False):
+            return DeletionJob.objects.none()
+        return DeletionJob.objects.filter(requested_by=self.request.user)
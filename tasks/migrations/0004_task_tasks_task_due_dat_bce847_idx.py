@@ -0,0 +1,20 @@
+# Generated by Django 5.0.8 on 2026-10-19 07:51
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0005_board_one_default_board_per_project_and_more'),
+        ('tasks', '0003_alter_attachment_file_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['due_date'], name='tasks_task_due_dat_bce847_idx'),
+        ),
+    ]
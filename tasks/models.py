@@ -121,6 +121,10 @@ class Task(models.Model):
     
     class Meta:
         ordering = ['order']
+        indexes = [
+            # Lets the deadline scanner read only the tasks crossing a threshold
+            models.Index(fields=['due_date']),
+        ]
         constraints = [
             models.CheckConstraint(
                 check=models.Q(estimated_hours__gt=0) | models.Q(estimated_hours__isnull=True),
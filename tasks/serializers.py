@@ -1,8 +1,14 @@
+from django.db.models import Prefetch
 from rest_framework import serializers
 from .models import Label, Task, Comment, Attachment
+from django.contrib.auth import get_user_model
+from django.utils import timezone
 from users.serializers import UserSerializer
+from users.avatars import avatar_url, avatar_urls
 from projects.models import Column, ProjectMember
 
+User = get_user_model()
+
 class LabelSerializer(serializers.ModelSerializer):
     class Meta:
         model = Label
@@ -28,7 +34,7 @@ class AttachmentSerializer(serializers.ModelSerializer):
 
 class CommentSerializer(serializers.ModelSerializer):
     author_name = serializers.CharField(source='author.get_full_name', read_only=True)
-    author_picture = serializers.ImageField(source='author.profile_picture', read_only=True)
+    author_picture = serializers.SerializerMethodField()
     replies = serializers.SerializerMethodField()
     
     class Meta:
@@ -37,10 +43,15 @@ class CommentSerializer(serializers.ModelSerializer):
                   'created_at', 'updated_at', 'parent', 'replies']
         read_only_fields = ['author', 'created_at', 'updated_at']
     
+    def get_author_picture(self, obj):
+        """The author's 32 px WebP avatar"""
+        picture = obj.author.profile_picture.name if obj.author.profile_picture else None
+        return avatar_url(picture, obj.author.avatar_variants, 32, self.context.get('request'))
+    
     def get_replies(self, obj):
-        if obj.parent is None:  # Only get replies for top-level comments
-            replies = Comment.objects.filter(parent=obj)
-            return CommentSerializer(replies, many=True).data
+        if obj.parent_id is None:  # Only get replies for top-level comments
+            # replies.all() so a prefetch_related('replies__author') is used
+            return CommentSerializer(obj.replies.all(), many=True, context=self.context).data
         return []
     
     def create(self, validated_data):
@@ -150,8 +161,138 @@ class TaskDetailSerializer(TaskSerializer):
     
     def get_comments(self, obj):
         # Only get top-level comments (no parent)
-        comments = Comment.objects.filter(task=obj, parent=None)
-        return CommentSerializer(comments, many=True).data
+        comments = Comment.objects.filter(task=obj, parent=None).select_related('author').prefetch_related(
+            Prefetch('replies', queryset=Comment.objects.select_related('author'))
+        )
+        return CommentSerializer(comments, many=True, context=self.context).data
+
+class TaskValuesSerializer:
+    """
+    TaskSerializer's representation of a task list, read with ``values()``.
+
+    TaskSerializer builds a field tree and model instances for every task,
+    assignee and label. This reads the task columns in one ``values()``
+    query and the assignees and labels in one query each, like the
+    prefetches would, and renders each distinct user and label once. The
+    scalar fields go through TaskSerializer's own fields, so dates,
+    decimals and choices come out exactly as they do there. Read only;
+    ``data`` is the list TaskSerializer(queryset, many=True).data would be.
+    """
+    task_values = (
+        'id', 'title', 'description', 'column', 'column__name', 'order',
+        'created_by', 'created_by__first_name', 'created_by__last_name',
+        'created_at', 'updated_at', 'due_date', 'priority', 'estimated_hours', 'actual_hours',
+    )
+    user_values = (
+        'id', 'username', 'email', 'first_name', 'last_name', 'profile_picture', 'avatar_variants',
+        'phone_number', 'job_title', 'bio', 'date_joined', 'last_modified',
+    )
+
+    def __init__(self, queryset, context=None):
+        self.queryset = queryset
+        self.context = context or {}
+
+    @property
+    def data(self):
+        fields = TaskSerializer(context=self.context).fields
+        # Fields whose representation is not the column value itself
+        task_fields = self._converters(fields, (
+            'id', 'created_at', 'updated_at', 'due_date', 'priority', 'estimated_hours', 'actual_hours',
+        ))
+        priority_display = dict(Task.PRIORITY_CHOICES)
+        now = timezone.now()
+
+        rows = list(self.queryset.prefetch_related(None).values(*self.task_values))
+        ids = [row['id'] for row in rows]
+        assignees = self._assignees(ids, fields['assignees'].child.fields)
+        labels = self._labels(ids, fields['labels'].child.fields)
+
+        data = []
+        for row in rows:
+            pk, due_date = row['id'], row['due_date']
+            for name, to_representation in task_fields:
+                if row[name] is not None:
+                    row[name] = to_representation(row[name])
+            task = {
+                'id': row['id'],
+                'title': row['title'],
+                'description': row['description'],
+                'column': row['column'],
+                'column_name': row['column__name'],
+                'order': row['order'],
+                'created_by': row['created_by'],
+            }
+            if row['created_by'] is not None:
+                # Like get_full_name(); TaskSerializer leaves it out without a creator
+                task['created_by_name'] = f"{row['created_by__first_name']} {row['created_by__last_name']}".strip()
+            task.update({
+                'created_at': row['created_at'],
+                'updated_at': row['updated_at'],
+                'due_date': row['due_date'],
+                'priority': row['priority'],
+                'priority_display': priority_display.get(row['priority'], row['priority']),
+                'labels': labels.get(pk, []),
+                'assignees': assignees.get(pk, []),
+                'estimated_hours': row['estimated_hours'],
+                'actual_hours': row['actual_hours'],
+                'is_overdue': due_date is not None and now > due_date,
+            })
+            data.append(task)
+        return data
+
+    @staticmethod
+    def _converters(fields, names):
+        return [(name, fields[name].to_representation) for name in names]
+
+    def _assignees(self, ids, fields):
+        """``{task id: [user representation]}``, each user rendered once"""
+        request = self.context.get('request')
+        storage = User._meta.get_field('profile_picture').storage
+        converters = self._converters(fields, ('id', 'date_joined', 'last_modified'))
+        users = {}
+        assignees = {}
+        for row in User.objects.filter(assigned_tasks__in=ids).values('assigned_tasks', *self.user_values):
+            user = users.get(row['id'])
+            if user is None:
+                for name, to_representation in converters:
+                    if row[name] is not None:
+                        row[name] = to_representation(row[name])
+                picture = row['profile_picture'] or None
+                url = storage.url(picture) if picture else None
+                user = users[row['id']] = {
+                    'id': row['id'],
+                    'username': row['username'],
+                    'email': row['email'],
+                    'first_name': row['first_name'],
+                    'last_name': row['last_name'],
+                    'profile_picture': request.build_absolute_uri(url) if url and request is not None else url,
+                    'avatar': avatar_url(picture, row['avatar_variants'], 64, request),
+                    'avatar_urls': avatar_urls(picture, row['avatar_variants'], request),
+                    'phone_number': row['phone_number'],
+                    'job_title': row['job_title'],
+                    'bio': row['bio'],
+                    'date_joined': row['date_joined'],
+                    'last_modified': row['last_modified'],
+                }
+            assignees.setdefault(row['assigned_tasks'], []).append(user)
+        return assignees
+
+    def _labels(self, ids, fields):
+        """``{task id: [label representation]}``, each label rendered once"""
+        to_representation = fields['id'].to_representation
+        rendered = {}
+        labels = {}
+        for row in Label.objects.filter(tasks__in=ids).values('tasks', 'id', 'name', 'color', 'project'):
+            label = rendered.get(row['id'])
+            if label is None:
+                label = rendered[row['id']] = {
+                    'id': to_representation(row['id']),
+                    'name': row['name'],
+                    'color': row['color'],
+                    'project': row['project'],
+                }
+            labels.setdefault(row['tasks'], []).append(label)
+        return labels
 
 class TaskMoveSerializer(serializers.Serializer):
     column = serializers.UUIDField()
@@ -11,13 +11,6 @@ try:
 except ImportError:
     ACTIVITY_LOGS_ENABLED = False
 
-# Try to import notification utilities if available
-try:
-    from notifications.utils import send_task_assigned_notification, send_comment_notification
-    NOTIFICATIONS_ENABLED = True
-except ImportError:
-    NOTIFICATIONS_ENABLED = False
-
 @receiver(post_save, sender=Task)
 def task_created_handler(sender, instance, created, **kwargs):
     """Log when a new task is created"""
@@ -32,7 +25,7 @@ def task_created_handler(sender, instance, created, **kwargs):
 
 @receiver(m2m_changed, sender=Task.assignees.through)
 def task_assignees_changed(sender, instance, action, pk_set, **kwargs):
-    """Log when task assignees change and send notifications"""
+    """Log when task assignees change (notifications are sent by notifications.signals)"""
     if action == 'post_add' and pk_set and ACTIVITY_LOGS_ENABLED:
         from users.models import User
         
@@ -40,21 +33,7 @@ def task_assignees_changed(sender, instance, action, pk_set, **kwargs):
         assigned_by = getattr(instance, '_current_user', instance.created_by)
         
         # Log this activity
-        assignee_names = []
-        for user_id in pk_set:
-            try:
-                user = User.objects.get(id=user_id)
-                assignee_names.append(user.get_full_name())
-                
-                # Send notification to each assignee (synchronously)
-                if NOTIFICATIONS_ENABLED and assigned_by and user_id != assigned_by.id:
-                    send_task_assigned_notification(
-                        task_id=str(instance.id),
-                        user_id=user_id,
-                        assigned_by_id=assigned_by.id
-                    )
-            except User.DoesNotExist:
-                pass
+        assignee_names = [user.get_full_name() for user in User.objects.filter(id__in=pk_set)]
                 
         if assignee_names:
             ActivityLog.objects.create(
@@ -67,21 +46,16 @@ def task_assignees_changed(sender, instance, action, pk_set, **kwargs):
 
 @receiver(post_save, sender=Comment)
 def comment_created_handler(sender, instance, created, **kwargs):
-    """Log when a new comment is added and send notifications"""
-    if created:
-        if ACTIVITY_LOGS_ENABLED:
-            # Create activity log
-            ActivityLog.objects.create(
-                user=instance.author,
-                content_type=ContentType.objects.get_for_model(instance.task),
-                object_id=str(instance.task.id),
-                action_type=ActivityLog.UPDATED,
-                description=f"Comment added to task '{instance.task.title}'"
-            )
-        
-        # Send notification about the new comment
-        if NOTIFICATIONS_ENABLED:
-            send_comment_notification(instance.id)
+    """Log when a new comment is added (notifications are sent by notifications.signals)"""
+    if created and ACTIVITY_LOGS_ENABLED:
+        # Create activity log
+        ActivityLog.objects.create(
+            user=instance.author,
+            content_type=ContentType.objects.get_for_model(instance.task),
+            object_id=str(instance.task.id),
+            action_type=ActivityLog.UPDATED,
+            description=f"Comment added to task '{instance.task.title}'"
+        )
 
 @receiver(post_save, sender=Attachment)
 def attachment_created_handler(sender, instance, created, **kwargs):
@@ -93,4 +67,33 @@ def attachment_created_handler(sender, instance, created, **kwargs):
             object_id=str(instance.task.id),
             action_type=ActivityLog.UPDATED,
             description=f"File '{instance.filename}' attached to task '{instance.task.title}'"
-        ) 
\ No newline at end of file
+        ) 
+
+def touch_tasks(tasks):
+    """
+    Bump updated_at without save(), so ETags (projectmanagement.conditional)
+    change while no post_save receivers run
+    """
+    tasks.update(updated_at=timezone.now())
+
+@receiver(m2m_changed, sender=Task.assignees.through)
+@receiver(m2m_changed, sender=Task.labels.through)
+def touch_tasks_on_m2m_change(sender, instance, action, reverse, pk_set, **kwargs):
+    """A task's labels and assignees are part of it, so changing them updates the task"""
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            touch_tasks(Task.objects.filter(pk=instance.pk))
+    elif action in ('post_add', 'post_remove'):
+        touch_tasks(Task.objects.filter(pk__in=pk_set))
+    elif action == 'pre_clear':
+        # From the label or user side a clear has no pk_set; touch the
+        # tasks while they are still attached
+        field = 'labels' if sender is Task.labels.through else 'assignees'
+        touch_tasks(Task.objects.filter(**{field: instance}))
+
+@receiver(post_save, sender=Label)
+@receiver(pre_delete, sender=Label)
+def touch_tasks_on_label_change(sender, instance, **kwargs):
+    """Tasks show their labels' names and colours"""
+    if not kwargs.get('created'):
+        touch_tasks(Task.objects.filter(labels=instance))
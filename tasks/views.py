@@ -2,15 +2,17 @@ from rest_framework import viewsets, generics, permissions, status, filters
 from rest_framework import serializers
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from rest_framework.throttling import UserRateThrottle, ScopedRateThrottle
+from projectmanagement.conditional import ConditionalGetMixin
+from projectmanagement.renderers import StreamingListMixin
+from projectmanagement.throttling import SharedUserRateThrottle, SharedScopedRateThrottle
 from django.shortcuts import get_object_or_404, render
-from django.db.models import Q, F
+from django.db.models import Count, Q, F
 from django.utils import timezone
 from django_filters.rest_framework import DjangoFilterBackend
 # WebSocket functionality removed
 from django.contrib.contenttypes.models import ContentType
 
-from projects.models import Project, Column, ProjectMember
+from projects.models import Project, Column, ProjectMember, live_projects
 from projects.permissions import IsProjectMember, IsProjectAdmin
 from .models import Label, Task, Comment, Attachment
 from django.contrib.auth import get_user_model
@@ -33,7 +35,7 @@ User = get_user_model()
 
 # WebSocket functionality removed
 from .serializers import (
-    LabelSerializer, TaskSerializer, TaskDetailSerializer, 
+    LabelSerializer, TaskSerializer, TaskDetailSerializer, TaskValuesSerializer,
     CommentSerializer, AttachmentSerializer,
     TaskMoveSerializer, TaskAssignSerializer
 )
@@ -44,10 +46,11 @@ class LabelViewSet(viewsets.ModelViewSet):
     """
     serializer_class = LabelSerializer
     permission_classes = [permissions.IsAuthenticated, IsProjectMember]
+    query_budget = {'list': 7, 'retrieve': 6, 'default': 12}
     
     def get_queryset(self):
         project_id = self.kwargs.get('project_pk')
-        return Label.objects.filter(project_id=project_id)
+        return Label.objects.filter(live_projects('project'), project_id=project_id)
     
     def get_permissions(self):
         if self.action in ['create', 'update', 'partial_update', 'destroy']:
@@ -56,31 +59,44 @@ class LabelViewSet(viewsets.ModelViewSet):
     
     def perform_create(self, serializer):
         project_id = self.kwargs.get('project_pk')
-        project = get_object_or_404(Project, id=project_id)
+        project = get_object_or_404(Project.objects.filter(live_projects()), id=project_id)
         serializer.save(project=project)
 
-class CreateTaskRateThrottle(ScopedRateThrottle):
+class CreateTaskRateThrottle(SharedScopedRateThrottle):
     scope = 'create_task'
 
-class UpdateTaskRateThrottle(ScopedRateThrottle):
+class UpdateTaskRateThrottle(SharedScopedRateThrottle):
     scope = 'update_task'
 
-class CommentRateThrottle(ScopedRateThrottle):
+class CommentRateThrottle(SharedScopedRateThrottle):
     scope = 'comments'
 
-class TaskViewSet(viewsets.ModelViewSet):
+class TaskViewSet(ConditionalGetMixin, StreamingListMixin, viewsets.ModelViewSet):
     """
     API endpoint for tasks
     """
     serializer_class = TaskSerializer
     permission_classes = [permissions.IsAuthenticated, IsProjectMember]
+    query_budget = {'list': 8, 'retrieve': 12, 'default': 60}
+    # Label and assignee changes bump the task's updated_at (tasks.signals)
+    etag_fields = {
+        'list': ('updated_at', 'column__updated_at', 'created_by__last_modified', 'assignees__last_modified'),
+        'retrieve': (
+            'updated_at', 'column__updated_at', 'created_by__last_modified', 'assignees__last_modified',
+            'comments__updated_at', 'attachments__uploaded_at',
+        ),
+    }
     queryset = Task.objects.all()  # Default queryset for router registration
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['column', 'priority', 'assignees', 'labels']
     search_fields = ['title', 'description']
     ordering_fields = ['created_at', 'updated_at', 'due_date', 'priority', 'order']
     ordering = ['order']
-    throttle_classes = [UserRateThrottle]
+    throttle_classes = [SharedUserRateThrottle]
+    
+    def etag_aggregates(self):
+        # is_overdue flips when a due date passes, without any write
+        return {'overdue': Count('pk', filter=Q(due_date__lt=timezone.now()), distinct=True)}
     
     def _check_task_permission(self, task, user, require_admin=False):
         """
@@ -126,7 +142,7 @@ class TaskViewSet(viewsets.ModelViewSet):
         if project_pk:
             # If we're accessing tasks for a specific project
             return Task.objects.filter(
-                column__board__project_id=project_pk
+                live_projects('column__board__project'), column__board__project_id=project_pk
             ).select_related('column', 'column__board').prefetch_related('labels', 'assignees')
         
         # Get column_pk from URL parameters (for nested routes)
@@ -134,13 +150,13 @@ class TaskViewSet(viewsets.ModelViewSet):
         if column_pk:
             # If we're accessing tasks for a specific column
             return Task.objects.filter(
-                column_id=column_pk
+                live_projects('column__board__project'), column_id=column_pk
             ).select_related('column', 'column__board').prefetch_related('labels', 'assignees')
             
         # If no specific filters in URL, return tasks the user has access to
         user = self.request.user
         return Task.objects.filter(
-            column__board__project__members__user=user
+            live_projects('column__board__project'), column__board__project__members__user=user
         ).select_related('column', 'column__board').prefetch_related('labels', 'assignees').distinct()
         
     def list(self, request, *args, **kwargs):
@@ -160,9 +176,17 @@ class TaskViewSet(viewsets.ModelViewSet):
                 serializer = self.get_serializer(page, many=True)
                 return self.get_paginated_response(serializer.data)
         
-        # Otherwise return direct array response for frontend compatibility
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        # Otherwise return direct array response for frontend compatibility,
+        # streamed when it is long
+        return self.list_response(queryset)
+
+    def list_rows(self, queryset):
+        # Read through values() rather than TaskSerializer; the rows come
+        # out as their representation
+        return TaskValuesSerializer(queryset, context=self.get_serializer_context()).data
+
+    def serialize_rows(self, rows):
+        return rows
     
     @action(detail=False, methods=['post'], url_path=r'(?P<task_id>[^/.]+)/assign_task')
     def assign_task(self, request, column_pk=None, task_id=None):
@@ -410,11 +434,11 @@ class TaskViewSet(viewsets.ModelViewSet):
             
             # If we have a specific task ID and no column ID, return just that task
             if task_id and not column_id:
-                return Task.objects.filter(id=task_id)
+                return self._with_related(Task.objects.filter(id=task_id))
             
             # If we have a column ID, filter by column
             if column_id:
-                return Task.objects.filter(column_id=column_id)
+                return self._with_related(Task.objects.filter(column_id=column_id))
                 
             # Default case: return all tasks the user has access to
             # Get all projects the user is a member of
@@ -424,9 +448,9 @@ class TaskViewSet(viewsets.ModelViewSet):
                 )
                 
                 # Return all tasks in columns that belong to boards in those projects
-                return Task.objects.filter(
+                return self._with_related(Task.objects.filter(
                     column__board__project__in=user_projects
-                )
+                ))
             else:
                 # Fallback for unauthenticated requests
                 return self.queryset
@@ -434,6 +458,12 @@ class TaskViewSet(viewsets.ModelViewSet):
             # Catch any unexpected errors during routing inspection
             return self.queryset
     
+    def _with_related(self, queryset):
+        """Load what TaskSerializer reads for every task up front"""
+        # Tasks of projects being deleted are gone as far as the API goes
+        queryset = queryset.filter(live_projects('column__board__project'))
+        return queryset.select_related('column', 'created_by').prefetch_related('labels', 'assignees')
+    
     def get_serializer_class(self):
         if self.action == 'retrieve':
             return TaskDetailSerializer
@@ -449,7 +479,7 @@ class TaskViewSet(viewsets.ModelViewSet):
         elif self.action in ['update', 'partial_update', 'move', 'add_labels', 'remove_labels']:
             self.throttle_scope = 'update_task'
             return [UpdateTaskRateThrottle()]
-        return [UserRateThrottle()]
+        return [SharedUserRateThrottle()]
     
     def perform_create(self, serializer):
         column_id = self.kwargs.get('column_pk')
@@ -462,7 +492,7 @@ class TaskViewSet(viewsets.ModelViewSet):
             # column is already a Column object from PrimaryKeyRelatedField
         else:
             # Nested route case
-            column = get_object_or_404(Column, id=column_id)
+            column = get_object_or_404(Column.objects.filter(live_projects('board__project')), id=column_id)
         
         # Verify the user has access to this column's project
         project = column.board.project
@@ -485,19 +515,19 @@ class TaskViewSet(viewsets.ModelViewSet):
 # Template-based views for non-API access
 def task_detail_view(request, task_id, project_id=None):
     """Display task details"""
-    task = get_object_or_404(Task, id=task_id)
+    task = get_object_or_404(Task.objects.filter(live_projects('column__board__project')), id=task_id)
     return render(request, 'tasks/task_detail.html', {'task': task})
 
 
 def task_create_view(request, project_id):
     """Create a new task"""
-    project = get_object_or_404(Project, id=project_id)
+    project = get_object_or_404(Project.objects.filter(live_projects()), id=project_id)
     return render(request, 'tasks/task_create.html', {'project': project})
 
 
 def task_update_view(request, task_id, project_id):
     """Update a task"""
-    task = get_object_or_404(Task, id=task_id)
+    task = get_object_or_404(Task.objects.filter(live_projects('column__board__project')), id=task_id)
     return render(request, 'tasks/task_update.html', {'task': task})
 
 
@@ -507,11 +537,11 @@ class CommentViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated, IsProjectMember]
 
     def get_queryset(self):
-        return Comment.objects.all()
+        return Comment.objects.filter(live_projects('task__column__board__project'))
 
     def perform_create(self, serializer):
         task_id = self.kwargs.get('task_pk')
-        task = get_object_or_404(Task, id=task_id)
+        task = get_object_or_404(Task.objects.filter(live_projects('column__board__project')), id=task_id)
         serializer.save(task=task, author=self.request.user)
 
 
@@ -521,9 +551,9 @@ class AttachmentViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated, IsProjectMember]
 
     def get_queryset(self):
-        return Attachment.objects.all()
+        return Attachment.objects.filter(live_projects('task__column__board__project'))
 
     def perform_create(self, serializer):
         task_id = self.kwargs.get('task_pk')
-        task = get_object_or_404(Task, id=task_id)
+        task = get_object_or_404(Task.objects.filter(live_projects('column__board__project')), id=task_id)
         serializer.save(task=task, uploaded_by=self.request.user)
@@ -0,0 +1,169 @@
+"""
+Profile picture variants.
+
+Uploads may be up to 2 MB and 4096x4096, but avatars are shown at a few
+dozen pixels. When a user's profile_picture changes, the picture is
+rendered once into square WebP variants (AVATAR_SIZES, 32/64/128 px by
+default) stored next to it under ``profile_pictures/variants/``, and their
+names are kept in ``User.avatar_variants``. Rendering runs in a small
+thread pool after the upload commits, so the request does not wait for
+Pillow; with AVATAR_WORKERS = 0 it runs inline.
+
+``avatar_url`` picks the variant for a size and falls back to the original
+while the variants are not ready yet. ``manage.py generate_avatar_variants``
+backfills existing users.
+"""
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+
+try:
+    from PIL import Image, ImageOps
+    HAS_PIL = True
+except ImportError:
+    HAS_PIL = False
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+VARIANT_DIR = 'profile_pictures/variants'
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def avatar_sizes():
+    return tuple(_setting('AVATAR_SIZES', (32, 64, 128)))
+
+
+def avatar_url(picture, variants, size, request=None):
+    """
+    URL of the ``size`` px variant of ``picture`` (a stored file name),
+    or of the original if that variant has not been rendered
+    """
+    if not picture:
+        return None
+    variants = variants or {}
+    name = picture
+    if variants.get('source') == picture and variants.get(str(size)):
+        name = variants[str(size)]
+    url = User._meta.get_field('profile_picture').storage.url(name)
+    return request.build_absolute_uri(url) if request is not None else url
+
+
+def avatar_urls(picture, variants, request=None):
+    """``{size: url}`` for every configured size, or None without a picture"""
+    if not picture:
+        return None
+    return {str(size): avatar_url(picture, variants, size, request) for size in avatar_sizes()}
+
+
+def needs_variants(user):
+    """Whether the stored variants were not made from the current picture"""
+    source = user.profile_picture.name if user.profile_picture else ''
+    return (user.avatar_variants or {}).get('source', '') != source
+
+
+def schedule_variants(user_id):
+    """Render the user's variants once the current transaction commits"""
+    transaction.on_commit(lambda: _submit(user_id))
+
+
+def _submit(user_id):
+    workers = _setting('AVATAR_WORKERS', 2)
+    if not workers:
+        generate_variants(user_id)
+        return
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='avatar')
+    _executor.submit(_run, user_id)
+
+
+def _run(user_id):
+    try:
+        generate_variants(user_id)
+    except Exception:
+        logger.exception("Rendering avatar variants for user %s failed", user_id)
+    finally:
+        close_old_connections()
+
+
+def render_variants(source, sizes, quality):
+    """Render the image file ``source`` into ``{size: webp bytes}``"""
+    with Image.open(source) as image:
+        # Let the JPEG decoder skip detail we are about to throw away
+        largest = max(sizes)
+        image.draft('RGB', (largest * 2, largest * 2))
+        image = ImageOps.exif_transpose(image)
+        has_alpha = image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+        # Crop to a square once at the largest size and scale down from there
+        square = ImageOps.fit(image, (largest, largest), Image.Resampling.LANCZOS)
+
+    rendered = {}
+    for size in sizes:
+        variant = square if size == largest else square.resize((size, size), Image.Resampling.LANCZOS)
+        buffer = BytesIO()
+        variant.save(buffer, 'WEBP', quality=quality, method=4)
+        rendered[size] = buffer.getvalue()
+    return rendered
+
+
+def generate_variants(user_id, force=False):
+    """
+    Render and store the variants of a user's current profile picture,
+    removing the previous ones. Returns True if anything changed.
+    """
+    user = User.objects.filter(pk=user_id).only('id', 'profile_picture', 'avatar_variants').first()
+    if user is None or not (force or needs_variants(user)):
+        return False
+
+    storage = User._meta.get_field('profile_picture').storage
+    source = user.profile_picture.name if user.profile_picture else ''
+    old = user.avatar_variants or {}
+    variants = {}
+    if source:
+        variants['source'] = source
+        if HAS_PIL:
+            try:
+                with storage.open(source) as f:
+                    rendered = render_variants(f, avatar_sizes(), _setting('AVATAR_WEBP_QUALITY', 80))
+            except Exception as e:
+                # Unreadable images keep serving the original
+                logger.warning("Could not render avatar variants for %s: %s", source, e)
+                rendered = {}
+            stem = os.path.splitext(os.path.basename(source))[0]
+            for size, data in rendered.items():
+                variants[str(size)] = storage.save(f"{VARIANT_DIR}/{stem}_{size}.webp", ContentFile(data))
+
+    # update() skips post_save; only record the variants if the picture has
+    # not been replaced again while they were rendering
+    if User.objects.filter(pk=user_id, profile_picture=source).update(avatar_variants=variants):
+        _delete_files(storage, old, keep=variants)
+        return True
+    _delete_files(storage, variants, keep=old)
+    return False
+
+
+def _delete_files(storage, variants, keep):
+    kept = set(keep.values())
+    for key, name in variants.items():
+        if key != 'source' and name not in kept:
+            try:
+                storage.delete(name)
+            except Exception as e:
+                logger.warning("Could not remove avatar variant %s: %s", name, e)
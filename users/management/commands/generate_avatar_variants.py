@@ -0,0 +1,48 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from users.avatars import generate_variants
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Render the WebP avatar variants for users whose profile picture has none yet'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Re-render variants that already exist (e.g. after changing AVATAR_SIZES)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Number of images rendered in parallel',
+        )
+
+    def handle(self, *args, **options):
+        force = options['force']
+        user_ids = list(
+            User.objects.exclude(profile_picture='').exclude(profile_picture__isnull=True)
+            .values_list('id', flat=True)
+        )
+
+        if options['workers'] <= 1:
+            rendered = sum(generate_variants(user_id, force=force) for user_id in user_ids)
+        else:
+            def render(user_id):
+                try:
+                    return generate_variants(user_id, force=force)
+                finally:
+                    connections.close_all()
+
+            with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+                rendered = sum(executor.map(render, user_ids))
+        self.stdout.write(self.style.SUCCESS(
+            f'Rendered avatar variants for {rendered} of {len(user_ids)} users with a profile picture'
+        ))
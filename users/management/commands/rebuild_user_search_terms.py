@@ -0,0 +1,17 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from users.search import sync_search_terms
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the prefix index used by the user autocomplete endpoint'
+
+    def handle(self, *args, **options):
+        count = 0
+        for user in User.objects.only('id', 'first_name', 'last_name', 'username', 'email').iterator():
+            sync_search_terms(user)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt search terms for {count} users'))
@@ -0,0 +1,67 @@
+# Generated by Django 5.0.8 on 2026-10-19 08:04
+
+import re
+import unicodedata
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# A copy of users.search.search_terms as it was when this migration was
+# written, so later changes to it do not change what the migration does
+MAX_TERM_LENGTH = 254
+WORD_SPLIT = re.compile(r"[\s._+\-@,']+")
+
+
+def normalize(text):
+    text = unicodedata.normalize('NFKD', text or '')
+    return ''.join(char for char in text if not unicodedata.combining(char)).casefold().strip()
+
+
+def search_terms(first_name, last_name, username, email):
+    terms = set()
+    for value in (first_name, last_name, username):
+        terms.update(WORD_SPLIT.split(normalize(value)))
+    email = normalize(email)
+    if email:
+        terms.add(email)
+        terms.update(WORD_SPLIT.split(email.split('@', 1)[0]))
+    return {term[:MAX_TERM_LENGTH] for term in terms if term}
+
+
+def build_search_terms(apps, schema_editor):
+    User = apps.get_model('users', 'User')
+    UserSearchTerm = apps.get_model('users', 'UserSearchTerm')
+    rows = []
+    for user in User.objects.only('id', 'first_name', 'last_name', 'username', 'email').iterator():
+        rows.extend(
+            UserSearchTerm(user_id=user.id, term=term)
+            for term in search_terms(user.first_name, user.last_name, user.username, user.email)
+        )
+    UserSearchTerm.objects.bulk_create(rows, batch_size=500, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_alter_user_groups_alter_user_user_permissions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserSearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=254)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['term', 'user'], name='user_search_term_prefix_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='usersearchterm',
+            constraint=models.UniqueConstraint(fields=('user', 'term'), name='unique_user_search_term'),
+        ),
+        migrations.RunPython(build_search_terms, migrations.RunPython.noop),
+    ]
@@ -79,6 +79,8 @@ class User(AbstractUser):
         blank=True,
         validators=[validate_image_file]
     )
+    # Names of the WebP renditions of profile_picture by size (see users/avatars.py)
+    avatar_variants = models.JSONField(default=dict, blank=True, editable=False)
     phone_number = models.CharField(
         max_length=15, 
         null=True, 
@@ -130,6 +132,11 @@ class User(AbstractUser):
         if self.profile_picture and hasattr(self.profile_picture, 'url'):
             return self.profile_picture.url
         return None
+    
+    def get_avatar_url(self, size=64):
+        """Return the URL of the ``size`` px avatar, falling back to the original picture"""
+        from .avatars import avatar_url
+        return avatar_url(self.profile_picture.name if self.profile_picture else None, self.avatar_variants, size)
 
 class UserPreference(models.Model):
     """User preferences model to store user-specific settings"""
@@ -147,3 +154,23 @@ class UserPreference(models.Model):
     
     def __str__(self):
         return f"{self.user.email}'s preferences"
+
+
+class UserSearchTerm(models.Model):
+    """
+    One normalized word of a user's name, username or email, indexed for
+    prefix lookups by the autocomplete endpoint (see users/search.py)
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='search_terms')
+    term = models.CharField(max_length=254)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'term'], name='unique_user_search_term'),
+        ]
+        indexes = [
+            models.Index(fields=['term', 'user'], name='user_search_term_prefix_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.term} -> {self.user_id}"
@@ -0,0 +1,114 @@
+"""
+Prefix search over users for the autocomplete pickers.
+
+Every user has a few rows in UserSearchTerm: the normalized (case-folded,
+accent-stripped) words of their first name, last name and username, their
+full email address and the pieces of its local part. A query word is
+matched as a range scan over the term index (``term >= q`` and
+``term < q + U+FFFF``), which SQLite can answer from the index, unlike
+``LIKE``/``istartswith``. Results are limited to users the caller shares
+an organization with, using a subquery rather than loading the member ids
+into Python.
+"""
+import re
+import unicodedata
+
+from django.contrib.auth import get_user_model
+from django.db.models import Q
+
+from .models import UserSearchTerm
+
+User = get_user_model()
+
+# Terms longer than this are cut; nobody types that far into a picker
+MAX_TERM_LENGTH = UserSearchTerm._meta.get_field('term').max_length
+
+_WORD_SPLIT = re.compile(r"[\s._+\-@,']+")
+_PREFIX_END = '\uffff'
+
+
+def normalize(text):
+    """Lowercase ``text`` and strip accents, so "Zoë" is found by "zoe" """
+    text = unicodedata.normalize('NFKD', text or '')
+    return ''.join(char for char in text if not unicodedata.combining(char)).casefold().strip()
+
+
+def search_terms(first_name='', last_name='', username='', email=''):
+    """The set of index terms for a user with the given fields"""
+    terms = set()
+    for value in (first_name, last_name, username):
+        terms.update(_WORD_SPLIT.split(normalize(value)))
+    email = normalize(email)
+    if email:
+        terms.add(email)
+        terms.update(_WORD_SPLIT.split(email.split('@', 1)[0]))
+    return {term[:MAX_TERM_LENGTH] for term in terms if term}
+
+
+def sync_search_terms(user):
+    """Bring the user's index rows in line with their current fields"""
+    wanted = search_terms(user.first_name, user.last_name, user.username, user.email)
+    existing = set(UserSearchTerm.objects.filter(user=user).values_list('term', flat=True))
+    if existing - wanted:
+        UserSearchTerm.objects.filter(user=user, term__in=existing - wanted).delete()
+    if wanted - existing:
+        UserSearchTerm.objects.bulk_create(
+            [UserSearchTerm(user=user, term=term) for term in wanted - existing],
+            ignore_conflicts=True,
+        )
+
+
+def visible_users(user):
+    """
+    The users ``user`` may look up: everyone for staff, otherwise
+    themselves and the members of their organizations.
+    """
+    if user.is_staff or user.is_superuser:
+        return User.objects.all()
+    try:
+        from organizations.models import OrganizationMember
+    except ImportError:
+        # Organizations app not available, only include the current user
+        return User.objects.filter(id=user.id)
+
+    organization_ids = OrganizationMember.objects.filter(
+        user=user, organization__pending_delete=False
+    ).values('organization_id')
+    member_ids = OrganizationMember.objects.filter(organization_id__in=organization_ids).values('user_id')
+    return User.objects.filter(Q(id=user.id) | Q(id__in=member_ids))
+
+
+def matching_users(query, queryset):
+    """
+    Narrow ``queryset`` to users with a term starting with each word of
+    ``query``. Returns ``queryset.none()`` for a blank query.
+    """
+    words = [word for word in _WORD_SPLIT.split(normalize(query)) if word]
+    if '@' in query:
+        # An address being typed in full matches the stored email term
+        words = [normalize(query)]
+    if not words:
+        return queryset.none()
+    for word in words:
+        word = word[:MAX_TERM_LENGTH]
+        queryset = queryset.filter(id__in=UserSearchTerm.objects.filter(
+            term__gte=word, term__lt=word + _PREFIX_END
+        ).values('user_id'))
+    return queryset
+
+
+def autocomplete(user, query, limit, organization_id=None):
+    """
+    At most ``limit`` users visible to ``user`` matching ``query``, as
+    value dicts ordered by name.
+    """
+    queryset = matching_users(query, visible_users(user))
+    if organization_id:
+        from organizations.models import OrganizationMember
+        queryset = queryset.filter(id__in=OrganizationMember.objects.filter(
+            organization_id=organization_id
+        ).values('user_id'))
+    return list(
+        queryset.order_by('first_name', 'last_name', 'email')
+        .values('id', 'first_name', 'last_name', 'email', 'profile_picture', 'avatar_variants')[:limit]
+    )
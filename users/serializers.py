@@ -2,6 +2,7 @@ from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError
+from .avatars import avatar_url, avatar_urls
 from .models import UserPreference
 import logging
 
@@ -16,14 +17,25 @@ class UserPreferenceSerializer(serializers.ModelSerializer):
 
 class UserSerializer(serializers.ModelSerializer):
     preferences = UserPreferenceSerializer(read_only=True)
+    avatar = serializers.SerializerMethodField()
+    avatar_urls = serializers.SerializerMethodField()
     
     class Meta:
         model = User
         fields = ['id', 'username', 'email', 'first_name', 'last_name', 
-                  'profile_picture', 'phone_number', 'job_title', 'bio', 
+                  'profile_picture', 'avatar', 'avatar_urls', 'phone_number', 'job_title', 'bio', 
                   'date_joined', 'last_modified', 'preferences']
         read_only_fields = ['date_joined', 'last_modified']
         ref_name = 'ProjectUser'
+    
+    def get_avatar(self, obj):
+        """The 64 px WebP avatar, for lists and nested users"""
+        picture = obj.profile_picture.name if obj.profile_picture else None
+        return avatar_url(picture, obj.avatar_variants, 64, self.context.get('request'))
+    
+    def get_avatar_urls(self, obj):
+        picture = obj.profile_picture.name if obj.profile_picture else None
+        return avatar_urls(picture, obj.avatar_variants, self.context.get('request'))
 
 class UserDetailSerializer(UserSerializer):
     class Meta(UserSerializer.Meta):
@@ -3,6 +3,8 @@ from django.dispatch import receiver
 from django.contrib.auth import get_user_model
 from django.contrib.contenttypes.models import ContentType
 from .models import UserPreference
+from .avatars import needs_variants, schedule_variants
+from .search import sync_search_terms
 
 User = get_user_model()
 
@@ -31,6 +33,25 @@ def create_user_preferences(sender, instance, created, **kwargs):
                 description=f"User account for {instance.email} was created"
             )
 
+# Saves that touch none of these (e.g. last_login) leave the search index alone
+SEARCH_FIELDS = {'first_name', 'last_name', 'username', 'email'}
+
+@receiver(post_save, sender=User)
+def update_user_search_terms(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Keep the autocomplete index in step with the user's name and email
+    """
+    if created or update_fields is None or SEARCH_FIELDS & set(update_fields):
+        sync_search_terms(instance)
+
+@receiver(post_save, sender=User)
+def update_avatar_variants(sender, instance, **kwargs):
+    """
+    Render the small WebP avatars when the profile picture changes
+    """
+    if needs_variants(instance):
+        schedule_variants(instance.pk)
+
 @receiver(post_save, sender=UserPreference)
 def log_preference_update(sender, instance, created, **kwargs):
     """
@@ -1,3 +1,177 @@
-from django.test import TestCase
+import shutil
+import tempfile
+from io import BytesIO, StringIO
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework.test import APITestCase
+from rest_framework import status
+
+from organizations.models import Organization, OrganizationMember
+from users.avatars import generate_variants
+from users.models import UserSearchTerm
+
+User = get_user_model()
+
+
+class UserAutocompleteTests(APITestCase):
+    """Test cases for the user autocomplete endpoint and its prefix index"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='owner', email='owner@example.com', password='testpassword',
+            first_name='Olivia', last_name='Owner'
+        )
+        self.colleague = User.objects.create_user(
+            username='zoe.m', email='zoe.martin@example.com', password='testpassword',
+            first_name='Zoë', last_name='Martin'
+        )
+        self.other = User.objects.create_user(
+            username='mark', email='mark@elsewhere.com', password='testpassword',
+            first_name='Mark', last_name='Martinez'
+        )
+        self.organization = Organization.objects.create(name='Test Organization')
+        OrganizationMember.objects.create(organization=self.organization, user=self.user, role=OrganizationMember.ADMIN)
+        OrganizationMember.objects.create(organization=self.organization, user=self.colleague)
+        other_organization = Organization.objects.create(name='Other Organization')
+        OrganizationMember.objects.create(organization=other_organization, user=self.other)
+        self.url = '/api/v1/users/autocomplete/'
+        self.client.force_authenticate(user=self.user)
+
+    def search(self, q, **params):
+        response = self.client.get(self.url, {'q': q, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [row['email'] for row in response.data['results']]
+
+    def test_matches_name_username_and_email_prefixes(self):
+        self.assertEqual(self.search('mart'), ['zoe.martin@example.com'])
+        self.assertEqual(self.search('ZOE'), ['zoe.martin@example.com'])
+        self.assertEqual(self.search('zoe.martin@ex'), ['zoe.martin@example.com'])
+        self.assertEqual(self.search('zoe mar'), ['zoe.martin@example.com'])
+        self.assertEqual(self.search('zoe owner'), [])
+        self.assertEqual(self.search(''), [])
+
+    def test_only_users_sharing_an_organization_are_returned(self):
+        self.assertEqual(self.search('mark'), [])
+        self.assertEqual(self.search('o'), ['owner@example.com'])
+
+    def test_compact_rows_and_limit(self):
+        oscar = User.objects.create_user(
+            username='oscar', email='oscar@example.com', password='testpassword', first_name='Oscar'
+        )
+        OrganizationMember.objects.create(organization=self.organization, user=oscar)
+        self.assertEqual(self.search('o'), ['owner@example.com', 'oscar@example.com'])
+
+        response = self.client.get(self.url, {'q': 'o', 'limit': 1})
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(set(response.data['results'][0]), {'id', 'name', 'email', 'avatar_url'})
+        self.assertEqual(response.data['results'][0]['name'], 'Olivia Owner')
+
+        response = self.client.get(self.url, {'q': 'o', 'limit': 'many'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_organization_filter(self):
+        self.assertEqual(self.search('mar', organization=self.organization.id), ['zoe.martin@example.com'])
+        response = self.client.get(self.url, {'q': 'mar', 'organization': 'not-a-uuid'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_index_follows_profile_changes(self):
+        self.colleague.last_name = 'Dupont'
+        self.colleague.email = 'zoe.dupont@example.com'
+        self.colleague.save()
+        self.assertEqual(self.search('mart'), [])
+        self.assertEqual(self.search('dup'), ['zoe.dupont@example.com'])
+
+        # Saves that only touch other fields leave the index alone
+        UserSearchTerm.objects.filter(user=self.colleague).delete()
+        self.colleague.save(update_fields=['last_login'])
+        self.assertFalse(UserSearchTerm.objects.filter(user=self.colleague).exists())
+
+    def test_single_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.search('zoe')
+        self.assertEqual(len(queries), 1)
+
+    def test_user_list_scoped_to_organizations(self):
+        response = self.client.get('/api/v1/users/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            sorted(row['email'] for row in response.data['results']),
+            ['owner@example.com', 'zoe.martin@example.com']
+        )
+
+
+def make_image(name='avatar.png', size=(600, 400), color=(200, 30, 30)):
+    buffer = BytesIO()
+    Image.new('RGB', size, color).save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+
+@override_settings(AVATAR_WORKERS=0)
+class AvatarVariantTests(APITestCase):
+    """Test cases for the WebP profile picture variants"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        self.user = User.objects.create_user(
+            username='owner', email='owner@example.com', password='testpassword',
+            first_name='Olivia', last_name='Owner'
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def upload(self, image):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(f'/api/v1/users/{self.user.id}/', {
+                'first_name': 'Olivia', 'last_name': 'Owner', 'profile_picture': image,
+            }, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+
+    def test_upload_renders_square_webp_variants(self):
+        self.upload(make_image())
+
+        variants = self.user.avatar_variants
+        self.assertEqual(variants['source'], self.user.profile_picture.name)
+        storage = User._meta.get_field('profile_picture').storage
+        for size in (32, 64, 128):
+            with storage.open(variants[str(size)]) as f, Image.open(f) as image:
+                self.assertEqual(image.format, 'WEBP')
+                self.assertEqual(image.size, (size, size))
+
+        response = self.client.get(f'/api/v1/users/{self.user.id}/')
+        self.assertTrue(response.data['avatar'].endswith('_64.webp'))
+        self.assertEqual(set(response.data['avatar_urls']), {'32', '64', '128'})
+        self.assertTrue(response.data['profile_picture'].endswith('.png'))
+
+    def test_replacing_the_picture_removes_old_variants(self):
+        self.upload(make_image())
+        old_variants = dict(self.user.avatar_variants)
+        self.upload(make_image('second.png', color=(0, 0, 255)))
+
+        storage = User._meta.get_field('profile_picture').storage
+        self.assertNotEqual(self.user.avatar_variants['64'], old_variants['64'])
+        self.assertFalse(storage.exists(old_variants['64']))
+        self.assertTrue(storage.exists(self.user.avatar_variants['64']))
+
+    def test_original_is_served_until_variants_exist(self):
+        storage = User._meta.get_field('profile_picture').storage
+        name = storage.save('profile_pictures/legacy.png', make_image())
+        User.objects.filter(pk=self.user.pk).update(profile_picture=name)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.get_avatar_url(32).endswith('legacy.png'))
+
+        call_command('generate_avatar_variants', workers=1, stdout=StringIO())
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.get_avatar_url(32).endswith('_32.webp'))
+        self.assertFalse(generate_variants(self.user.pk))
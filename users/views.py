@@ -20,7 +20,10 @@ from django.template.loader import render_to_string
 from django.utils.html import strip_tags
 from django.conf import settings
 from .email import send_password_reset_email
+from .avatars import avatar_url
+from .search import autocomplete as autocomplete_users, visible_users
 import logging
+import uuid
 
 # Try to import ActivityLog model if available
 try:
@@ -40,6 +43,7 @@ class UserViewSet(viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAuthenticated]
+    query_budget = {'list': 4, 'retrieve': 3, 'default': 12}
     
     def get_queryset(self):
         # Admin can see all users, regular users only see themselves and users from their organizations
@@ -48,24 +52,9 @@ class UserViewSet(viewsets.ModelViewSet):
         # Check if this is a schema generation request for Swagger
         if getattr(self, 'swagger_fake_view', False):
             return User.objects.none()
-            
-        if user.is_staff or user.is_superuser:
-            return User.objects.all()
         
-        # Always include the current user in the queryset
-        user_ids = {user.id}
-            
-        # Get organizations the user is a member of
-        try:
-            from organizations.models import OrganizationMember
-            user_orgs = OrganizationMember.objects.filter(user=user).values_list('organization_id', flat=True)
-            org_users = OrganizationMember.objects.filter(organization_id__in=user_orgs).values_list('user_id', flat=True)
-            user_ids.update(org_users)
-        except ImportError:
-            # Organizations app not available, only include the current user
-            pass
-            
-        return User.objects.filter(id__in=list(user_ids))
+        # Themselves plus the members of their organizations, as a subquery
+        return visible_users(user)
     
     def get_serializer_class(self):
         if self.action == 'create':
@@ -98,6 +87,43 @@ class UserViewSet(viewsets.ModelViewSet):
                 description=f"User profile updated"
             )
     
+    @action(detail=False, methods=['get'])
+    def autocomplete(self, request):
+        """
+        Users matching a typed prefix, for the assignee and member pickers
+        
+        ``?q=`` is matched word by word against the prefix index over name,
+        username and email; ``?organization=`` narrows the results to one
+        organization's members and ``?limit=`` caps them (at most
+        USER_AUTOCOMPLETE_MAX_RESULTS). Only users sharing an organization
+        with the caller are returned.
+        """
+        max_results = getattr(settings, 'USER_AUTOCOMPLETE_MAX_RESULTS', 20)
+        try:
+            limit = min(int(request.query_params.get('limit', 10)), max_results)
+        except ValueError:
+            return Response({"detail": "limit must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+        
+        organization_id = request.query_params.get('organization') or None
+        if organization_id:
+            try:
+                uuid.UUID(organization_id)
+            except ValueError:
+                return Response({"detail": "Invalid organization id."}, status=status.HTTP_400_BAD_REQUEST)
+        
+        rows = autocomplete_users(request.user, request.query_params.get('q', ''), max(limit, 0), organization_id)
+        return Response({
+            'results': [
+                {
+                    'id': row['id'],
+                    'name': f"{row['first_name']} {row['last_name']}".strip() or row['email'],
+                    'email': row['email'],
+                    'avatar_url': avatar_url(row['profile_picture'], row['avatar_variants'], 32, request),
+                }
+                for row in rows
+            ]
+        })
+    
     @action(detail=True, methods=['post'], permission_classes=[IsUserOwner])
     def change_password(self, request, pk=None):
         user = self.get_object()